@@ -0,0 +1,172 @@
+"""
+Motor de Alertas
+Reglas de umbral y duración evaluadas en cada lectura sobre toda la flota
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import numpy as np
+
+from stations import LocationRegistry
+
+
+class AlertRule:
+    """
+    Regla de alerta: se dispara cuando `variable` alcanza `threshold` durante
+    `duration` lecturas consecutivas y se desactiva en cuanto deja de cumplirse.
+    """
+
+    def __init__(
+        self,
+        rule_id: str,
+        variable: str,
+        threshold: float,
+        duration: int,
+        type: str,
+        severity: str,
+        title: str,
+        description: str,
+        recommendations: List[str],
+        icon: str,
+        color: str,
+        expected_hours: int = 1
+    ):
+        self.id = rule_id
+        self.variable = variable
+        self.threshold = threshold
+        self.duration = duration
+        self.type = type
+        self.severity = severity
+        self.title = title
+        self.description = description
+        self.recommendations = recommendations
+        self.icon = icon
+        self.color = color
+        self.expected_hours = expected_hours
+
+
+# Variables de SimulatorFleet.current; la duración se cuenta en lecturas (ticks de 30 s)
+DEFAULT_RULES: List[AlertRule] = [
+    AlertRule(
+        "rain", "precipCurrent", 2.0, 2,
+        type="rain", severity="warning", title="Lluvia Intensa",
+        description="Precipitación sostenida de {value:.1f} mm/h.",
+        recommendations=[
+            "Evite circular por zonas bajas propensas a inundaciones",
+            "Tenga precaución al conducir"
+        ],
+        icon="cloud-rain", color="chart-2", expected_hours=2
+    ),
+    AlertRule(
+        "wind", "gust", 45.0, 2,
+        type="wind", severity="watch", title="Vientos Fuertes",
+        description="Ráfagas sostenidas de {value:.1f} km/h.",
+        recommendations=[
+            "Asegure objetos que puedan ser movidos por el viento",
+            "Evite actividades al aire libre"
+        ],
+        icon="wind", color="chart-3", expected_hours=6
+    ),
+    AlertRule(
+        "uv", "uvIndex", 7, 2,
+        type="uv", severity="info", title="Radiación UV Alta",
+        description="Índice UV de {value:.0f}. Riesgo elevado de daño solar.",
+        recommendations=[
+            "Use protector solar FPS 50+",
+            "Busque sombra entre 12:00 y 16:00",
+            "Use ropa protectora"
+        ],
+        icon="sun", color="chart-4", expected_hours=4
+    ),
+    AlertRule(
+        "pm25", "pm25", 24.0, 2,
+        type="air_quality", severity="watch", title="Material Particulado Elevado",
+        description="PM2.5 sostenido de {value:.1f} µg/m³.",
+        recommendations=[
+            "Reduzca la actividad física intensa al aire libre",
+            "Mantenga las ventanas cerradas"
+        ],
+        icon="alert-triangle", color="chart-5", expected_hours=3
+    ),
+]
+
+
+class AlertEngine:
+    """
+    Evalúa las reglas de forma incremental: el estado (lecturas consecutivas en
+    infracción y alertas activas) es una matriz estaciones × reglas que se actualiza
+    con comparaciones vectorizadas en cada tick. Las alertas activas se guardan en un
+    índice por estación, por lo que consultarlas cuesta O(alertas activas).
+    """
+
+    def __init__(self, registry: LocationRegistry, rules: Optional[List[AlertRule]] = None):
+        self.registry = registry
+        self.rules = rules if rules is not None else DEFAULT_RULES
+        self._thresholds = np.array([rule.threshold for rule in self.rules], dtype=np.float64)
+        self._durations = np.array([rule.duration for rule in self.rules], dtype=np.int64)
+        self._streak = np.zeros((0, len(self.rules)), dtype=np.int64)
+        self._active = np.zeros((0, len(self.rules)), dtype=bool)
+        self._index: Dict[str, Dict[str, Dict]] = {}
+        self._sequence = 0
+
+    def _resize(self, stations: int) -> None:
+        """Agrega filas de estado para estaciones registradas después del arranque"""
+        extra = stations - len(self._streak)
+        if extra > 0:
+            self._streak = np.vstack([self._streak, np.zeros((extra, len(self.rules)), dtype=np.int64)])
+            self._active = np.vstack([self._active, np.zeros((extra, len(self.rules)), dtype=bool)])
+
+    def evaluate(self, current: Dict[str, np.ndarray], now: Optional[datetime] = None) -> Dict[str, List[Dict]]:
+        """
+        Incorpora una lectura de toda la flota. Devuelve las alertas que se
+        dispararon en este tick, agrupadas por estación.
+        """
+        now = now or datetime.now()
+        values = np.column_stack([current[rule.variable] for rule in self.rules]).astype(np.float64)
+        self._resize(len(values))
+
+        breach = values >= self._thresholds
+        self._streak = np.where(breach, self._streak + 1, 0)
+        active = self._streak >= self._durations
+
+        # Solo se tocan las celdas que cambiaron de estado
+        for row, r in zip(*np.nonzero(self._active & ~active)):
+            location_id = self.registry.locations[row].id
+            alerts = self._index.get(location_id)
+            if alerts is not None:
+                alerts.pop(self.rules[r].id, None)
+                if not alerts:
+                    del self._index[location_id]
+
+        fired: Dict[str, List[Dict]] = {}
+        for row, r in zip(*np.nonzero(active & ~self._active)):
+            location = self.registry.locations[row]
+            alert = self._build_alert(self.rules[r], location.name, float(values[row, r]), now)
+            self._index.setdefault(location.id, {})[self.rules[r].id] = alert
+            fired.setdefault(location.id, []).append(alert)
+
+        self._active = active
+        return fired
+
+    def _build_alert(self, rule: AlertRule, area: str, value: float, now: datetime) -> Dict:
+        """Alerta con el formato del modelo Alert"""
+        self._sequence += 1
+        return {
+            "id": f"alert_{self._sequence:06d}",
+            "type": rule.type,
+            "severity": rule.severity,
+            "title": rule.title,
+            "description": rule.description.format(value=value),
+            "startTime": now.isoformat() + "Z",
+            "endTime": (now + timedelta(hours=rule.expected_hours)).isoformat() + "Z",
+            "affectedAreas": [area],
+            "recommendations": rule.recommendations,
+            "icon": rule.icon,
+            "color": rule.color,
+            "isActive": True,
+            "createdAt": now.isoformat() + "Z"
+        }
+
+    def active(self, location_id: str) -> List[Dict]:
+        """Alertas activas de una estación"""
+        return list(self._index.get(location_id, {}).values())
@@ -0,0 +1,196 @@
+"""
+Detección de Anomalías en Línea
+EWMA y z-scores robustos por estación y variable, actualizados en cada lectura de la flota
+"""
+
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+import numpy as np
+
+from stations import LocationRegistry
+from timeseries import FIELD_SPECS
+
+
+# Variable de HistoricalDataPoint -> variable de SimulatorFleet.current. La precipitación
+# queda fuera: es cero la mayor parte del tiempo y cualquier lluvia daría un z alto (las
+# lluvias intensas ya las cubre AlertEngine)
+ANOMALY_VARIABLES: Dict[str, str] = {
+    "temperature": "air",
+    "humidity": "relative",
+    "windSpeed": "speed",
+    "gust": "gust",
+    "pressure": "pressure",
+    "pm25": "pm25",
+    "pm10": "pm10",
+    "co2": "co2",
+    "o3": "o3",
+}
+
+DEFAULT_HALFLIFE = 120      # Lecturas (1 hora con ticks de 30 s)
+DEFAULT_THRESHOLD = 4.0     # |z robusto| a partir del cual una lectura es anómala
+DEFAULT_WARMUP = 20         # Lecturas antes de empezar a marcar anomalías
+DEFAULT_HISTORY = 50        # Anomalías recientes guardadas por estación
+
+# Los residuos que actualizan la línea base se recortan a HUBER_K escalas: una anomalía
+# solo la desplaza un poco y no enmascara a las siguientes
+HUBER_K = 3.0
+
+# Desviación estándar de una normal a partir de su desviación absoluta media: σ = √(π/2)·E|x - μ|
+MEAN_ABSOLUTE_TO_STD = np.sqrt(np.pi / 2)
+
+
+class AnomalyDetector:
+    """
+    Detector en línea de lecturas inusuales, O(1) por estación y variable.
+
+    Por cada celda (estación × variable) mantiene:
+    - media y varianza con pesos exponenciales (EWMA), para el z-score clásico;
+    - un centro y una escala robustos: EWMA de residuos recortados (Huber) y desviación
+      absoluta media de esos residuos, para el z-score robusto que decide la anomalía.
+
+    Los z-scores de cada lectura se calculan contra el estado anterior (la lectura no
+    se compara consigo misma). Como en AlertEngine, el estado son matrices estaciones ×
+    variables que se actualizan con operaciones vectorizadas, así que el costo por tick
+    crece con las estaciones y no con el historial. Se registra una anomalía cuando una
+    celda entra en estado anómalo.
+    """
+
+    def __init__(
+        self,
+        registry: LocationRegistry,
+        halflife: float = DEFAULT_HALFLIFE,
+        threshold: float = DEFAULT_THRESHOLD,
+        warmup: int = DEFAULT_WARMUP,
+        history: int = DEFAULT_HISTORY
+    ):
+        self.registry = registry
+        self.variables = list(ANOMALY_VARIABLES)
+        self.alpha = 1 - 0.5 ** (1 / halflife)
+        self.threshold = threshold
+        self.warmup = warmup
+        self.history = history
+        # Escala mínima: la resolución declarada de cada variable (evita z enormes en series casi constantes)
+        self._min_scale = np.array([10.0 ** -FIELD_SPECS[name][1] for name in self.variables])
+
+        shape = (0, len(self.variables))
+        self.count = np.zeros(0, dtype=np.int64)
+        self.mean = np.zeros(shape)
+        self.variance = np.zeros(shape)
+        self.center = np.zeros(shape)
+        self.scale = np.zeros(shape)
+        self.last = np.zeros(shape)
+        self.z = np.zeros(shape)
+        self.robust_z = np.zeros(shape)
+        self._anomalous = np.zeros(shape, dtype=bool)
+        self._index: Dict[str, Deque[Dict]] = {}
+        self._sequence = 0
+
+    def _resize(self, stations: int) -> None:
+        """Agrega filas de estado para estaciones registradas después del arranque"""
+        extra = stations - len(self.count)
+        if extra > 0:
+            self.count = np.concatenate([self.count, np.zeros(extra, dtype=np.int64)])
+            for name in ("mean", "variance", "center", "scale", "last", "z", "robust_z"):
+                setattr(self, name, np.vstack([getattr(self, name), np.zeros((extra, len(self.variables)))]))
+            self._anomalous = np.vstack([self._anomalous, np.zeros((extra, len(self.variables)), dtype=bool)])
+
+    def update(self, current: Dict[str, np.ndarray], now: Optional[datetime] = None) -> Dict[str, List[Dict]]:
+        """
+        Incorpora una lectura de toda la flota. Devuelve las anomalías nuevas de este
+        tick, agrupadas por estación.
+        """
+        now = now or datetime.now()
+        values = np.column_stack([current[source] for source in ANOMALY_VARIABLES.values()]).astype(np.float64)
+        self._resize(len(values))
+
+        # Primera lectura de cada estación: inicializa el estado sin puntuar
+        first = self.count == 0
+        self.mean[first] = self.center[first] = self.last[first] = values[first]
+        self.variance[first] = self.scale[first] = 0.0
+
+        # Z-scores contra el estado anterior
+        deviation = values - self.mean
+        residual = values - self.center
+        std, robust_std = self._spread(self.count)
+        self.z = deviation / std
+        self.robust_z = residual / robust_std
+        self.count += 1
+        self.last = values
+        anomalous = (np.abs(self.robust_z) >= self.threshold) & (self.count > self.warmup)[:, None]
+        anomalous[first] = False
+
+        # Solo se construyen las celdas que entran en estado anómalo
+        fired: Dict[str, List[Dict]] = {}
+        for row, v in zip(*np.nonzero(anomalous & ~self._anomalous)):
+            location_id = self.registry.locations[row].id
+            anomaly = self._build_anomaly(row, v, float(self.center[row, v]), now)
+            recent = self._index.get(location_id)
+            if recent is None:
+                recent = self._index[location_id] = deque(maxlen=self.history)
+            recent.appendleft(anomaly)
+            fired.setdefault(location_id, []).append(anomaly)
+        self._anomalous = anomalous
+
+        # EWMA de media y varianza
+        alpha = self.alpha
+        self.mean += alpha * deviation
+        self.variance = (1 - alpha) * (self.variance + alpha * deviation ** 2)
+
+        # Centro y escala robustos con residuos recortados
+        bound = HUBER_K * robust_std
+        clipped = np.clip(residual, -bound, bound)
+        self.center += alpha * clipped
+        self.scale = (1 - alpha) * self.scale + alpha * np.abs(clipped)
+        return fired
+
+    def _spread(self, count: np.ndarray) -> tuple:
+        """
+        Desviación estándar EWMA y robusta tras `count` lecturas. Varianza y escala
+        parten de 0, así que se corrigen por el peso acumulado 1 - (1 - α)^count
+        (sin esto, las primeras horas tendrían z-scores inflados).
+        """
+        weight = (1 - (1 - self.alpha) ** np.maximum(count, 1))[:, None]
+        std = np.maximum(np.sqrt(self.variance / weight), self._min_scale)
+        robust_std = np.maximum(MEAN_ABSOLUTE_TO_STD * self.scale / weight, self._min_scale)
+        return std, robust_std
+
+    def _build_anomaly(self, row: int, v: int, expected: float, now: datetime) -> Dict:
+        """Anomalía con el formato del modelo Anomaly"""
+        self._sequence += 1
+        robust_z = float(self.robust_z[row, v])
+        return {
+            "id": f"anomaly_{self._sequence:06d}",
+            "variable": self.variables[v],
+            "value": float(self.last[row, v]),
+            "expected": round(expected, 2),
+            "zScore": round(float(self.z[row, v]), 2),
+            "robustZScore": round(robust_z, 2),
+            "direction": "high" if robust_z > 0 else "low",
+            "severity": "critical" if abs(robust_z) >= 2 * self.threshold else "warning",
+            "timestamp": now.isoformat() + "Z"
+        }
+
+    def recent(self, location_id: str, limit: Optional[int] = None) -> List[Dict]:
+        """Anomalías recientes de una estación (la más nueva primero)"""
+        anomalies = list(self._index.get(location_id, ()))
+        return anomalies if limit is None else anomalies[:limit]
+
+    def scores(self, location_id: str) -> Dict[str, Dict]:
+        """Estado actual de cada variable de una estación (vacío si aún no tiene lecturas)"""
+        row = self.registry.row(location_id)
+        if row >= len(self.count) or self.count[row] == 0:
+            return {}
+        std = self._spread(self.count[row:row + 1])[0][0]
+        scored = self.count[row] > 1
+        return {
+            name: {
+                "value": float(self.last[row, v]),
+                "mean": round(float(self.mean[row, v]), 2),
+                "stdDev": round(float(std[v]), 2),
+                "zScore": round(float(self.z[row, v]), 2) if scored else None,
+                "robustZScore": round(float(self.robust_z[row, v]), 2) if scored else None,
+                "anomalous": bool(self._anomalous[row, v])
+            }
+            for v, name in enumerate(self.variables)
+        }
@@ -0,0 +1,136 @@
+"""
+Archivo Histórico en Disco
+Segmentos .npy mensuales por estación y variable, leídos con np.memmap
+"""
+
+import os
+from typing import Dict, List, Optional
+import numpy as np
+
+from timeseries import FIELD_SPECS, INDEX_DTYPE, TimeSeriesFrame
+
+
+VALID_SEGMENT = "_valid"
+
+
+def _month_bounds(month: np.datetime64) -> tuple:
+    """Primera hora del mes y número de horas que contiene"""
+    first = month.astype("datetime64[h]")
+    hours = int(((month + 1).astype("datetime64[h]") - first) / np.timedelta64(1, "h"))
+    return first, hours
+
+
+class StationArchive:
+    """
+    Archivo append-only de lecturas horarias.
+
+    Cada estación tiene un directorio por mes con un segmento `<variable>.npy` de
+    tamaño fijo (una posición por hora del mes) y un segmento `_valid.npy` que marca
+    las horas escritas. Las lecturas abren los segmentos con np.memmap, de modo que
+    una consulta solo toca las páginas del rango pedido.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _month_dir(self, location_id: str, month: np.datetime64) -> str:
+        return os.path.join(self.root, location_id, str(month))
+
+    def _open_month(self, location_id: str, month: np.datetime64, writable: bool) -> Optional[Dict[str, np.ndarray]]:
+        """Abre (o crea, si writable) los segmentos de un mes como memmaps"""
+        directory = self._month_dir(location_id, month)
+        valid_path = os.path.join(directory, VALID_SEGMENT + ".npy")
+
+        if not os.path.exists(valid_path):
+            if not writable:
+                return None
+            os.makedirs(directory, exist_ok=True)
+            _, hours = _month_bounds(month)
+            segments = {}
+            for name, (dtype, _) in FIELD_SPECS.items():
+                segments[name] = np.lib.format.open_memmap(
+                    os.path.join(directory, name + ".npy"), mode="w+", dtype=dtype, shape=(hours,)
+                )
+            # El segmento de validez se crea al final: su existencia indica que el mes está listo
+            segments[VALID_SEGMENT] = np.lib.format.open_memmap(
+                valid_path, mode="w+", dtype=np.bool_, shape=(hours,)
+            )
+            return segments
+
+        mode = "r+" if writable else "r"
+        return {
+            name: np.load(os.path.join(directory, name + ".npy"), mmap_mode=mode)
+            for name in list(FIELD_SPECS) + [VALID_SEGMENT]
+        }
+
+    def first_hour(self, location_id: str) -> Optional[np.datetime64]:
+        """Primera hora del mes más antiguo archivado (None si no hay datos)"""
+        directory = os.path.join(self.root, location_id)
+        if not os.path.isdir(directory):
+            return None
+        months = sorted(
+            name for name in os.listdir(directory)
+            if os.path.exists(os.path.join(directory, name, VALID_SEGMENT + ".npy"))
+        )
+        return np.datetime64(months[0], "M").astype("datetime64[h]") if months else None
+
+    def append(self, location_id: str, frame: TimeSeriesFrame, overwrite: bool = False) -> int:
+        """
+        Escribe las horas del frame que aún no estén archivadas; con `overwrite`
+        (lecturas reales ingeridas) reemplaza también las ya archivadas.
+        Devuelve el número de horas escritas.
+        """
+        if len(frame) == 0:
+            return 0
+
+        hours = frame.index.astype("datetime64[h]")
+        months = hours.astype("datetime64[M]")
+        written = 0
+
+        for month in np.unique(months):
+            rows = np.nonzero(months == month)[0]
+            first, _ = _month_bounds(month)
+            offsets = ((hours[rows] - first) / np.timedelta64(1, "h")).astype(np.int64)
+
+            segments = self._open_month(location_id, month, writable=True)
+            fresh = np.ones(len(offsets), dtype=bool) if overwrite else ~segments[VALID_SEGMENT][offsets]
+            if not fresh.any():
+                continue
+
+            rows, offsets = rows[fresh], offsets[fresh]
+            for name in FIELD_SPECS:
+                segments[name][offsets] = frame[name][rows]
+            segments[VALID_SEGMENT][offsets] = True
+            for segment in segments.values():
+                segment.flush()
+            written += len(rows)
+
+        return written
+
+    def read(self, location_id: str, start: np.datetime64, end: np.datetime64) -> TimeSeriesFrame:
+        """Horas archivadas en [start, end), leyendo solo los meses que tocan el rango"""
+        start = np.datetime64(start, "h")
+        end = np.datetime64(end, "h")
+        index_parts: List[np.ndarray] = []
+        column_parts: Dict[str, List[np.ndarray]] = {name: [] for name in FIELD_SPECS}
+
+        month = start.astype("datetime64[M]")
+        while month.astype("datetime64[h]") < end:
+            segments = self._open_month(location_id, month, writable=False)
+            if segments is not None:
+                first, hours = _month_bounds(month)
+                lo = max(0, int((start - first) / np.timedelta64(1, "h")))
+                hi = min(hours, int((end - first) / np.timedelta64(1, "h")))
+                valid = np.nonzero(segments[VALID_SEGMENT][lo:hi])[0] + lo
+                index_parts.append((first + valid).astype(INDEX_DTYPE))
+                for name in FIELD_SPECS:
+                    column_parts[name].append(np.asarray(segments[name][valid]))
+            month += 1
+
+        if not index_parts:
+            return TimeSeriesFrame.empty()
+
+        return TimeSeriesFrame(
+            np.concatenate(index_parts),
+            {name: np.concatenate(parts) for name, parts in column_parts.items()}
+        )
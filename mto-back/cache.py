@@ -0,0 +1,74 @@
+"""
+Caché de Respuestas por Época
+Resultados y JSON pre-serializado válidos hasta el próximo tick de actualización
+"""
+
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+import json
+
+from fastapi.encoders import jsonable_encoder
+
+
+class CacheEntry:
+    """Resultado calculado y su JSON serializado, etiquetados con la época"""
+
+    __slots__ = ("epoch", "result", "body")
+
+    def __init__(self, epoch: int, result: Any, body: bytes):
+        self.epoch = epoch
+        self.result = result
+        self.body = body
+
+
+def serialize(result: Any) -> bytes:
+    """Serializa igual que JSONResponse de FastAPI"""
+    return json.dumps(
+        jsonable_encoder(result),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+
+class EpochCache:
+    """
+    Caché LRU acotada por (ubicación, endpoint, parámetros).
+
+    Cada tick de periodic_update avanza la época; las entradas de épocas anteriores
+    dejan de ser válidas y se descartan al consultarlas o por desalojo LRU.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.epoch = 0
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def advance(self) -> int:
+        """Avanza la época (invalida todas las entradas actuales)"""
+        self.epoch += 1
+        return self.epoch
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        """Entrada vigente para la clave (None si no existe o es de otra época)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.epoch != self.epoch:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: Hashable, result: Any, body: Optional[bytes] = None) -> CacheEntry:
+        """Guarda un resultado junto con su JSON (se serializa aquí si no viene ya serializado)"""
+        entry = CacheEntry(self.epoch, result, serialize(result) if body is None else body)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
@@ -0,0 +1,117 @@
+"""
+Ejecutores de Analítica
+Pool de procesos y de hilos para sacar del event loop el cálculo pesado de los endpoints
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+DEFAULT_PROCESS_WORKERS = min(4, os.cpu_count() or 1)
+DEFAULT_THREAD_WORKERS = 4
+DEFAULT_MAX_PENDING = 32
+DEFAULT_TIMEOUT_SECONDS = 30.0
+
+
+class ExecutorBusy(Exception):
+    """Se alcanzó el máximo de tareas en curso o en cola"""
+
+
+def _preload() -> None:
+    """Inicializador de los procesos: importa de antemano los módulos de cálculo"""
+    import numpy  # noqa: F401
+    import scipy.stats  # noqa: F401
+    import statistics  # noqa: F401
+
+
+def _ready() -> bool:
+    return True
+
+
+class AnalyticsExecutor:
+    """
+    Despacho de cálculo pesado fuera del event loop.
+
+    - `run_process`: pool de procesos (contexto spawn, workers precargados) para el
+      trabajo que retiene el GIL, como los bucles en Python puro.
+    - `run_thread`: pool de hilos para NumPy/SciPy, que liberan el GIL en sus bucles.
+
+    Ambos comparten un máximo de tareas en curso (ExecutorBusy al superarlo) y un
+    timeout por tarea (asyncio.TimeoutError). Una tarea que vence sigue ocupando su
+    lugar hasta terminar, así que los timeouts no agrandan la cola. Sin procesos
+    (process_workers=0) todo corre en el pool de hilos.
+    """
+
+    def __init__(
+        self,
+        process_workers: int = DEFAULT_PROCESS_WORKERS,
+        thread_workers: int = DEFAULT_THREAD_WORKERS,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        timeout: float = DEFAULT_TIMEOUT_SECONDS
+    ):
+        self.process_workers = process_workers
+        self.thread_workers = thread_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._threads: Optional[ThreadPoolExecutor] = None
+
+    def start(self) -> None:
+        """Crea los pools y arranca todos los procesos (la primera consulta no paga el arranque)"""
+        self._threads = ThreadPoolExecutor(self.thread_workers, thread_name_prefix="mto-analytics")
+        if self.process_workers > 0:
+            self._processes = ProcessPoolExecutor(
+                self.process_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_preload
+            )
+            for future in [self._processes.submit(_ready) for _ in range(self.process_workers)]:
+                future.result()
+
+    def shutdown(self) -> None:
+        """Cierra los pools cancelando lo que siga en cola"""
+        for pool in (self._processes, self._threads):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._processes = self._threads = None
+
+    def _release(self, future: Future) -> None:
+        with self._lock:
+            self.pending -= 1
+
+    async def _run(self, pool: Executor, fn: Callable, *args: Any) -> Any:
+        with self._lock:
+            if self.pending >= self.max_pending:
+                raise ExecutorBusy()
+            self.pending += 1
+        try:
+            future = pool.submit(fn, *args)
+        except BaseException:
+            with self._lock:
+                self.pending -= 1
+            raise
+        future.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            future.cancel()  # Libera el lugar si aún no empezó
+            raise
+
+    async def run_process(self, fn: Callable, *args: Any) -> Any:
+        """Ejecuta fn(*args) en el pool de procesos (argumentos y resultado se serializan)"""
+        if self._threads is None:
+            self.start()
+        return await self._run(self._processes or self._threads, fn, *args)
+
+    async def run_thread(self, fn: Callable, *args: Any) -> Any:
+        """Ejecuta fn(*args) en el pool de hilos"""
+        if self._threads is None:
+            self.start()
+        return await self._run(self._threads, fn, *args)
@@ -0,0 +1,302 @@
+"""
+Pronóstico por Lotes de la Flota
+Tendencia y armónicos diurnos ajustados a la vez para todas las estaciones y variables
+"""
+
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from scipy.special import ndtr
+
+from statistics import LinearRegressionPredictor, hour_number
+from timeseries import HISTORICAL_FIELDS, TimeSeriesFrame
+
+
+# La dirección del viento (circular) se ajusta como vector unitario: componentes este y norte
+FORECAST_VARIABLES = tuple(name for name in HISTORICAL_FIELDS if name != "windDirection") + ("windEast", "windNorth")
+
+DEFAULT_TRAINING_HOURS = 168
+DEFAULT_HORIZON_HOURS = 72
+DEFAULT_CHUNK_STATIONS = 512
+
+# Armónicos del ciclo diario (24 h, 12 h, ...)
+DEFAULT_HARMONICS = 2
+
+# Suma de cuadrados por debajo de la cual una serie se considera constante
+CONSTANT_SERIES_TOLERANCE = 1e-6
+
+# Lluvia mínima (mm) para contar una hora como lluviosa en la probabilidad de precipitación
+RAIN_THRESHOLD_MM = 0.05
+
+ONE_HOUR = np.timedelta64(1, "h")
+
+
+def wind_direction(east: np.ndarray, north: np.ndarray) -> np.ndarray:
+    """Dirección en grados (0-359, desde el norte) a partir de las componentes del vector unitario"""
+    return np.rint(np.degrees(np.arctan2(east, north))).astype(np.int64) % 360
+
+
+class ForecastDesign:
+    """
+    Matriz de diseño compartida por todas las series que terminan en la misma hora:
+    [1, i, cos(2πk·h/24), sin(2πk·h/24)] para k = 1..armónicos, con i la posición en la
+    ventana y h la hora absoluta. Su pseudoinversa y el apalancamiento de cada hora del
+    horizonte se calculan una sola vez por hora emitida.
+    """
+
+    def __init__(self, issued: np.datetime64, training_hours: int, horizon_hours: int, harmonics: int):
+        self.issued = issued
+        first = hour_number(issued) - (training_hours - 1)
+        hours = first + np.arange(training_hours + horizon_hours, dtype=np.float64)
+        columns = [np.ones_like(hours), hours - first]
+        for k in range(1, harmonics + 1):
+            angle = 2 * np.pi * k * hours / 24
+            columns.extend([np.cos(angle), np.sin(angle)])
+        full = np.column_stack(columns)
+
+        self.X = full[:training_hours]
+        self.future = full[training_hours:]
+        self.pinv = np.linalg.pinv(self.X)
+        # Varianza relativa de la predicción en cada hora: 1 + x (X'X)^-1 x'
+        self.leverage = 1 + np.einsum("hp,hp->h", self.future @ self.pinv, self.future @ self.pinv)
+        self.dof = max(training_hours - self.X.shape[1], 1)
+
+
+class ForecastTable:
+    """
+    Pronósticos vigentes de la flota para una hora emitida (la última lectura usada).
+    Se guarda por bloques de estaciones tal como salen del ajuste; `_rows` ubica cada
+    estación en su bloque.
+    """
+
+    def __init__(self, design: ForecastDesign):
+        self.design = design
+        self.issued = design.issued
+        self._blocks: List[Dict[str, np.ndarray]] = []
+        self._rows: Dict[str, Tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, location_id: str) -> bool:
+        return location_id in self._rows
+
+    @property
+    def horizon_hours(self) -> int:
+        return len(self.design.future)
+
+    def add(self, location_ids: List[str], block: Dict[str, np.ndarray]) -> None:
+        """Incorpora un bloque ajustado (filas en el orden de `location_ids`)"""
+        self._blocks.append(block)
+        for row, location_id in enumerate(location_ids):
+            self._rows[location_id] = (len(self._blocks) - 1, row)
+
+    def station(self, location_id: str) -> Dict[str, np.ndarray]:
+        """Ajuste y pronóstico de una estación (una entrada por campo del bloque)"""
+        block, row = self._rows[location_id]
+        return {name: values[row] for name, values in self._blocks[block].items()}
+
+    def spread(self, forecast: Dict[str, np.ndarray], hours: int) -> np.ndarray:
+        """Desviación estándar de la predicción en las primeras `hours` horas (horas × variables)"""
+        return np.sqrt(self.design.leverage[:hours, None]) * forecast["sigma"][None, :]
+
+    def hourly(self, location_id: str, hours: int) -> List[Dict]:
+        """Pronóstico horario en el formato de /forecast/hourly"""
+        forecast = self.station(location_id)
+        predicted = forecast["predicted"][:hours].astype(np.float64)
+        column = {name: predicted[:, j] for j, name in enumerate(FORECAST_VARIABLES)}
+        spread = self.spread(forecast, hours)[:, FORECAST_VARIABLES.index("precipitation")]
+
+        # Probabilidad de lluvia: P(lluvia > umbral) con la predicción y su error normal
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = (column["precipitation"] - RAIN_THRESHOLD_MM) / spread
+        probability = np.round(100 * ndtr(np.nan_to_num(z, nan=-np.inf)))
+        humidity = np.clip(column["humidity"], 0, 100)
+
+        icon = np.where(probability >= 60, "cloud-rain", np.where(probability >= 30, "cloud-drizzle",
+                        np.where(humidity < 75, "partly-cloudy", "cloud")))
+        description = np.where(probability >= 60, "Lluvia", np.where(probability >= 30, "Lluvia ligera",
+                               np.where(humidity < 75, "Parcialmente nublado", "Nublado")))
+
+        times = self.issued + np.arange(1, hours + 1) * ONE_HOUR
+        rows = zip(
+            np.char.add(np.datetime_as_string(times.astype("datetime64[s]")), "Z").tolist(),
+            np.round(column["temperature"], 1).tolist(),
+            np.round(column["feels"], 1).tolist(),
+            np.round(humidity, 1).tolist(),
+            np.round(np.maximum(column["windSpeed"], 0), 1).tolist(),
+            wind_direction(column["windEast"], column["windNorth"]).tolist(),
+            probability.tolist(),
+            np.round(np.maximum(column["precipitation"], 0), 1).tolist(),
+            icon.tolist(),
+            description.tolist(),
+            np.clip(np.rint(column["uvIndex"]), 0, 11).astype(np.int64).tolist()
+        )
+        return [
+            {
+                "datetime": stamp,
+                "temperature": temperature,
+                "feelsLike": feels,
+                "humidity": humidity,
+                "windSpeed": speed,
+                "windDirection": direction,
+                "precipitation": {"probability": chance, "amount": amount},
+                "conditions": {"icon": icon, "description": description},
+                "uvIndex": uv
+            }
+            for stamp, temperature, feels, humidity, speed, direction, chance, amount, icon, description, uv in rows
+        ]
+
+    def regression(self, location_id: str, variables: List[str], hours_ahead: int) -> Dict[str, Dict]:
+        """
+        Resultados por variable en el formato de `LinearRegressionPredictor.predict_from_fit`
+        (predicciones en columnas), para `regression_response`.
+        """
+        forecast = self.station(location_id)
+        horizon = LinearRegressionPredictor.horizon(hours_ahead, base_time=self.issued.astype(datetime))
+        half = 1.96 * self.spread(forecast, hours_ahead)
+        results = {}
+        for variable in variables:
+            j = FORECAST_VARIABLES.index(variable)
+            predicted = forecast["predicted"][:hours_ahead, j].astype(np.float64)
+            results[variable] = {
+                "variable": variable,
+                "model": {
+                    "type": "harmonic_regression",
+                    "coefficient": round(float(forecast["coefficient"][j]), 4),
+                    "intercept": round(float(forecast["intercept"][j]), 2),
+                    "r2": round(float(forecast["r2"][j]), 4),
+                    "rmse": round(float(forecast["rmse"][j]), 2),
+                    "mae": round(float(forecast["mae"][j]), 2),
+                    "mse": round(float(forecast["mse"][j]), 2)
+                },
+                "forecast": {
+                    **horizon,
+                    "predicted": np.round(predicted, 2),
+                    "lowerBound": np.round(predicted - half[:, j], 2),
+                    "upperBound": np.round(predicted + half[:, j], 2)
+                },
+                "dataPoints": len(self.design.X),
+                "hoursAhead": hours_ahead
+            }
+        return results
+
+
+class BatchForecaster:
+    """
+    Ajuste por lotes de tendencia lineal más armónicos diurnos para todas las series
+    (estaciones × variables) de la flota.
+
+    Las series que terminan en la misma hora comparten la matriz de diseño, así que
+    el ajuste de un bloque de estaciones es un solo producto con la pseudoinversa sobre
+    el tensor tiempo × (estaciones · variables), y el pronóstico otro. Los bloques de
+    `chunk_stations` estaciones acotan la memoria. La tabla vigente se reemplaza en
+    cada hora nueva; las estaciones que aún no figuran se ajustan a pedido.
+    """
+
+    def __init__(
+        self,
+        training_hours: int = DEFAULT_TRAINING_HOURS,
+        horizon_hours: int = DEFAULT_HORIZON_HOURS,
+        harmonics: int = DEFAULT_HARMONICS,
+        chunk_stations: int = DEFAULT_CHUNK_STATIONS
+    ):
+        self.training_hours = training_hours
+        self.horizon_hours = horizon_hours
+        self.harmonics = harmonics
+        self.chunk_stations = chunk_stations
+        self.table: Optional[ForecastTable] = None
+        self._design: Optional[ForecastDesign] = None
+
+    def design(self, issued: np.datetime64) -> ForecastDesign:
+        """Matriz de diseño de la hora emitida (se reutiliza mientras no cambie la hora)"""
+        if self._design is None or self._design.issued != issued:
+            self._design = ForecastDesign(issued, self.training_hours, self.horizon_hours, self.harmonics)
+        return self._design
+
+    def stale(self, issued: np.datetime64) -> bool:
+        """Indica si la tabla vigente es de una hora anterior a `issued`"""
+        return self.table is None or self.table.issued < issued
+
+    def chunks(self, location_ids: List[str]) -> Iterator[List[str]]:
+        """Estaciones en bloques de `chunk_stations`"""
+        for start in range(0, len(location_ids), self.chunk_stations):
+            yield location_ids[start:start + self.chunk_stations]
+
+    def gather(self, frames: List[TimeSeriesFrame]) -> np.ndarray:
+        """
+        Tensor tiempo × estaciones × variables (FORECAST_VARIABLES) de las ventanas dadas.
+        Copia las columnas tal como están almacenadas (el redondeo a la resolución de
+        `values()` no cambia el ajuste y duplicaría el costo de la lectura).
+        """
+        tensor = np.empty((self.training_hours, len(frames), len(FORECAST_VARIABLES)))
+        for s, frame in enumerate(frames):
+            for j, name in enumerate(FORECAST_VARIABLES[:-2]):
+                tensor[:, s, j] = frame.columns[name]
+            radians = np.radians(frame.columns["windDirection"])
+            tensor[:, s, -2] = np.sin(radians)
+            tensor[:, s, -1] = np.cos(radians)
+        return tensor
+
+    def fit(self, tensor: np.ndarray, design: ForecastDesign) -> Dict[str, np.ndarray]:
+        """
+        Ajusta y pronostica todas las series del tensor. Devuelve arreglos por estación:
+        predicted (horizonte × variables, float32) y las métricas por variable.
+        """
+        hours, stations, variables = tensor.shape
+        Y = tensor.reshape(hours, stations * variables)
+        B = design.pinv @ Y
+        residuals = Y - design.X @ B
+
+        sse = np.einsum("tn,tn->n", residuals, residuals)
+        sst = ((Y - Y.mean(axis=0)) ** 2).sum(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r2 = np.where(sst > CONSTANT_SERIES_TOLERANCE, 1 - sse / sst, 1.0)
+        mse = sse / hours
+        predicted = (design.future @ B).reshape(len(design.future), stations, variables)
+
+        def per_station(values: np.ndarray) -> np.ndarray:
+            return values.reshape(stations, variables)
+
+        return {
+            "predicted": predicted.transpose(1, 0, 2).astype(np.float32),
+            "intercept": per_station(B[0]),
+            "coefficient": per_station(B[1]),
+            "r2": per_station(r2),
+            "mse": per_station(mse),
+            "rmse": per_station(np.sqrt(mse)),
+            "mae": per_station(np.abs(residuals).mean(axis=0)),
+            "sigma": per_station(np.sqrt(sse / design.dof))
+        }
+
+    def install(self, table: ForecastTable) -> None:
+        """Reemplaza la tabla vigente si la nueva no es más antigua"""
+        if self.table is None or table.issued >= self.table.issued:
+            self.table = table
+
+    def prepare(self, location_id: str, frame: TimeSeriesFrame) -> Tuple[ForecastTable, bool]:
+        """
+        Tabla que debe tener el pronóstico de la estación y si falta ajustarla: `station`
+        sin el ajuste, para que quien llama lo corra fuera del event loop.
+        """
+        issued = frame.index[-1].astype("datetime64[h]")
+        table = self.table
+        if table is not None and table.issued == issued and location_id in table:
+            return table, False
+        if table is None or table.issued < issued:
+            table = ForecastTable(self.design(issued))
+            self.install(table)
+        elif table.issued > issued:
+            # Ventana atrasada respecto de la tabla: se ajusta sola, sin instalarla
+            table = ForecastTable(ForecastDesign(issued, self.training_hours, self.horizon_hours, self.harmonics))
+        return table, True
+
+    def station(self, location_id: str, frame: TimeSeriesFrame) -> ForecastTable:
+        """
+        Tabla con el pronóstico de la estación, ajustándola a pedido si falta o si su
+        ventana (`frame`) es más reciente que la tabla vigente.
+        """
+        table, missing = self.prepare(location_id, frame)
+        if missing:
+            table.add([location_id], self.fit(self.gather([frame]), table.design))
+        return table
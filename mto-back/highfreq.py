@@ -0,0 +1,252 @@
+"""
+Sensores de Alta Frecuencia (1 Hz)
+Bloques de muestras por segundo agregados al vuelo en buckets de minuto y hora
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+
+from stations import LocationRegistry
+
+
+# Variables muestreadas a 1 Hz y parámetros de su ruido AR(1): (phi, sigma)
+# La ráfaga de un minuto es el máximo de windSpeed en ese minuto.
+HIGHFREQ_VARIABLES = ["temperature", "humidity", "windSpeed", "windDirection", "pressure"]
+_AR_PARAMS = np.array([
+    (0.999, 0.045),   # temperature: desvío estacionario ~1 °C
+    (0.999, 0.13),    # humidity: ~3 %
+    (0.9, 1.3),       # windSpeed: ~3 km/h, con variación rápida (ráfagas)
+    (0.99, 2.8),      # windDirection: ~20°
+    (0.9995, 0.063),  # pressure: ~2 hPa
+])
+
+# Columna de la dirección del viento: se promedia como vector unitario y no tiene mín/máx
+DIRECTION = HIGHFREQ_VARIABLES.index("windDirection")
+
+# Dirección predominante (sudeste) alrededor de la cual oscila el viento
+PREVAILING_WIND_DIRECTION = 135
+
+# Máximo de segundos generados por bloque (acota phi^-t en la recursión AR(1))
+MAX_BLOCK_SECONDS = 600
+
+DEFAULT_RAW_SECONDS = 300
+DEFAULT_MINUTE_BUCKETS = 24 * 60
+DEFAULT_HOUR_BUCKETS = 24 * 7
+
+
+class RawSampleBuffer:
+    """Ventana corta de muestras crudas: slot = segundo % capacidad"""
+
+    def __init__(self, seconds: int):
+        self.capacity = seconds
+        self.keys = np.full(seconds, np.datetime64("NaT"), dtype="datetime64[s]")
+        self.values = np.zeros((seconds, len(HIGHFREQ_VARIABLES)), dtype=np.float32)
+        self.latest: Optional[np.datetime64] = None
+
+    def write(self, timestamps: np.ndarray, values: np.ndarray) -> None:
+        """Guarda las últimas `capacity` muestras del bloque"""
+        timestamps, values = timestamps[-self.capacity:], values[-self.capacity:]
+        slots = timestamps.astype(np.int64) % self.capacity
+        self.keys[slots] = timestamps
+        self.values[slots] = values
+        self.latest = timestamps[-1]
+
+    def rows(self, limit: int) -> Dict[str, np.ndarray]:
+        """Últimas `limit` muestras en orden cronológico"""
+        if self.latest is None:
+            return {"keys": self.keys[:0], "values": self.values[:0]}
+        expected = self.latest - np.arange(min(limit, self.capacity))[::-1]
+        slots = expected.astype(np.int64) % self.capacity
+        present = self.keys[slots] == expected
+        return {"keys": expected[present], "values": self.values[slots[present]]}
+
+
+class StreamingAggregates:
+    """
+    Agregados por bucket de duración fija (minuto u hora) en un buffer circular:
+    count, suma, mínimo, máximo y último valor de cada variable. La dirección del
+    viento se acumula como suma de senos y cosenos (media vectorial: 350° y 10°
+    promedian 0°, no 180°) y su mínimo y máximo quedan en NaN.
+
+    Cada bloque de muestras se reduce por bucket con ufunc.reduceat y se combina
+    con el bucket existente; nunca se vuelve a recorrer una muestra.
+    """
+
+    def __init__(self, unit: str, capacity: int):
+        self.unit = unit
+        self.capacity = capacity
+        shape = (capacity, len(HIGHFREQ_VARIABLES))
+        self.keys = np.full(capacity, np.datetime64("NaT"), dtype=f"datetime64[{unit}]")
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.sum = np.zeros(shape)
+        self.min = np.zeros(shape)
+        self.max = np.zeros(shape)
+        self.last = np.zeros(shape)
+        self.east = np.zeros(capacity)
+        self.north = np.zeros(capacity)
+        self.latest: Optional[np.datetime64] = None
+
+    def fold(self, timestamps: np.ndarray, values: np.ndarray) -> None:
+        """Incorpora un bloque de muestras ordenadas por tiempo"""
+        buckets = timestamps.astype(f"datetime64[{self.unit}]")
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        ends = np.r_[starts[1:], len(buckets)]
+        keys = buckets[starts]
+
+        count = ends - starts
+        sums = np.add.reduceat(values, starts, axis=0)
+        mins = np.minimum.reduceat(values, starts, axis=0)
+        maxs = np.maximum.reduceat(values, starts, axis=0)
+        radians = np.radians(values[:, DIRECTION])
+        east = np.add.reduceat(np.sin(radians), starts)
+        north = np.add.reduceat(np.cos(radians), starts)
+
+        slots = keys.astype(np.int64) % self.capacity
+        same = (self.keys[slots] == keys)[:, None]
+        self.count[slots] = np.where(same[:, 0], self.count[slots], 0) + count
+        self.sum[slots] = np.where(same, self.sum[slots], 0.0) + sums
+        self.min[slots] = np.where(same, np.minimum(self.min[slots], mins), mins)
+        self.max[slots] = np.where(same, np.maximum(self.max[slots], maxs), maxs)
+        self.east[slots] = np.where(same[:, 0], self.east[slots], 0.0) + east
+        self.north[slots] = np.where(same[:, 0], self.north[slots], 0.0) + north
+        self.last[slots] = values[ends - 1]
+        self.keys[slots] = keys
+        self.latest = keys[-1]
+
+    def rows(self, limit: int) -> Dict[str, np.ndarray]:
+        """Últimos `limit` buckets en orden cronológico"""
+        if self.latest is None:
+            empty = np.zeros((0, len(HIGHFREQ_VARIABLES)))
+            return {"keys": self.keys[:0], "count": self.count[:0],
+                    "mean": empty, "min": empty, "max": empty, "last": empty}
+        expected = self.latest - np.arange(min(limit, self.capacity))[::-1]
+        slots = expected.astype(np.int64) % self.capacity
+        slots = slots[self.keys[slots] == expected]
+        mean = self.sum[slots] / self.count[slots, None]
+        mean[:, DIRECTION] = np.rint(np.degrees(np.arctan2(self.east[slots], self.north[slots]))) % 360
+        mins, maxs = self.min[slots], self.max[slots]
+        mins[:, DIRECTION] = maxs[:, DIRECTION] = np.nan
+        return {
+            "keys": self.keys[slots],
+            "count": self.count[slots],
+            "mean": mean,
+            "min": mins,
+            "max": maxs,
+            "last": self.last[slots]
+        }
+
+
+class HighFrequencyStream:
+    """Muestras de 1 Hz de una estación: ventana cruda y agregados por minuto y hora"""
+
+    def __init__(
+        self,
+        raw_seconds: int = DEFAULT_RAW_SECONDS,
+        minute_buckets: int = DEFAULT_MINUTE_BUCKETS,
+        hour_buckets: int = DEFAULT_HOUR_BUCKETS
+    ):
+        self.raw = RawSampleBuffer(raw_seconds)
+        self.minutes = StreamingAggregates("m", minute_buckets)
+        self.hours = StreamingAggregates("h", hour_buckets)
+        self.last_sample: Optional[np.datetime64] = None
+        self.noise = np.zeros(len(HIGHFREQ_VARIABLES))
+
+    def fold(self, timestamps: np.ndarray, values: np.ndarray) -> None:
+        """Incorpora un bloque de muestras a la ventana cruda y a los agregados"""
+        self.raw.write(timestamps, values)
+        self.minutes.fold(timestamps, values)
+        self.hours.fold(timestamps, values)
+        self.last_sample = timestamps[-1]
+
+
+class HighFrequencyStore:
+    """
+    Modo de alta frecuencia: en cada tick genera, para todas las estaciones
+    seguidas, las muestras de 1 Hz desde la última generada hasta ahora (un único
+    bloque vectorizado estaciones × segundos × variables) y las agrega al vuelo.
+    """
+
+    def __init__(
+        self,
+        registry: LocationRegistry,
+        raw_seconds: int = DEFAULT_RAW_SECONDS,
+        minute_buckets: int = DEFAULT_MINUTE_BUCKETS,
+        hour_buckets: int = DEFAULT_HOUR_BUCKETS
+    ):
+        self.registry = registry
+        self.raw_seconds = raw_seconds
+        self.minute_buckets = minute_buckets
+        self.hour_buckets = hour_buckets
+        self.rng = np.random.default_rng(registry.seed)
+        self._streams: Dict[str, HighFrequencyStream] = {}
+
+    def __contains__(self, location_id: str) -> bool:
+        return location_id in self._streams
+
+    def location_ids(self) -> List[str]:
+        """Estaciones con muestreo de alta frecuencia activo"""
+        return list(self._streams)
+
+    def stream(self, location_id: str) -> Optional[HighFrequencyStream]:
+        """Stream de la estación (None si no se sigue)"""
+        return self._streams.get(location_id)
+
+    def update(self, location_ids: List[str], now: Optional[datetime] = None) -> None:
+        """Genera y agrega las muestras pendientes hasta `now` de las estaciones dadas"""
+        end = np.datetime64(now or datetime.now(), "s")
+
+        # Las estaciones nuevas arrancan con la ventana cruda ya llena
+        pending: Dict[np.datetime64, List[str]] = {}
+        for location_id in location_ids:
+            stream = self._streams.get(location_id)
+            if stream is None:
+                stream = HighFrequencyStream(self.raw_seconds, self.minute_buckets, self.hour_buckets)
+                self._streams[location_id] = stream
+                start = end - self.raw_seconds + 1
+            else:
+                # Tras una pausa larga solo se rellena lo que cabe en los buckets de minuto
+                start = max(stream.last_sample + 1, end - 60 * self.minute_buckets + 1)
+            if start <= end:
+                pending.setdefault(start, []).append(location_id)
+
+        # Estaciones con el mismo inicio se generan juntas
+        for start, group in pending.items():
+            while start <= end:
+                stop = min(end + 1, start + MAX_BLOCK_SECONDS)
+                self._generate(group, start, stop)
+                start = stop
+
+    def _generate(self, location_ids: List[str], start: np.datetime64, stop: np.datetime64) -> None:
+        """Bloque [start, stop) de muestras de 1 Hz para un grupo de estaciones"""
+        timestamps = np.arange(start, stop, dtype="datetime64[s]")
+        seconds = len(timestamps)
+        streams = [self._streams[location_id] for location_id in location_ids]
+        rows = np.array([self.registry.row(location_id) for location_id in location_ids])
+        base_temp = self.registry.params["base_temp"][rows, None]
+        base_humidity = self.registry.params["base_humidity"][rows, None]
+
+        # Perfil diurno continuo (misma forma que el historial horario)
+        hour = (timestamps - timestamps.astype("datetime64[D]")) / np.timedelta64(1, "h")
+        daytime = (hour >= 6) & (hour <= 18)
+        time_factor = np.where(daytime, np.sin((hour - 6) * np.pi / 12), -0.3)[None, :]
+
+        # Ruido AR(1) x_t = phi x_{t-1} + e_t resuelto en forma cerrada:
+        # x_t = phi^t (x_0 + sum_k phi^-k e_k)
+        phi, sigma = _AR_PARAMS[:, 0], _AR_PARAMS[:, 1]
+        e = self.rng.standard_normal((len(streams), seconds, len(HIGHFREQ_VARIABLES))) * sigma
+        decay = phi ** np.arange(1, seconds + 1)[:, None]
+        x0 = np.array([stream.noise for stream in streams])[:, None, :]
+        noise = decay * (x0 + np.cumsum(e / decay, axis=1))
+
+        values = np.empty_like(noise)
+        values[..., 0] = base_temp + time_factor * 8 + noise[..., 0]
+        values[..., 1] = np.clip(base_humidity - time_factor * 2 + noise[..., 1], 0, 100)
+        values[..., 2] = np.maximum(0, 12 + time_factor * 8 + noise[..., 2])
+        values[..., 3] = np.mod(PREVAILING_WIND_DIRECTION + noise[..., 3], 360)
+        values[..., 4] = 1013 + noise[..., 4]
+        values = np.round(values, 1)
+
+        for i, stream in enumerate(streams):
+            stream.noise = noise[i, -1]
+            stream.fold(timestamps, values[i])
@@ -0,0 +1,303 @@
+"""
+Ingesta Masiva de Lecturas
+Carga de archivos CSV o Parquet por bloques, con validación vectorizada
+
+Uso desde la línea de comandos (escribe directamente en el archivo histórico):
+
+    python ingest.py loc_001 lecturas.csv --archive /var/lib/mto/archive
+    MTO_ARCHIVE_DIR=/var/lib/mto/archive python ingest.py loc_001 lecturas.parquet
+"""
+
+import argparse
+import csv
+import io
+import itertools
+import os
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Union
+import numpy as np
+
+from timeseries import FIELD_SPECS, INDEX_DTYPE, TimeSeriesFrame
+
+
+# Filas por bloque: acota la memoria sin importar el tamaño del archivo
+CHUNK_ROWS = 100_000
+
+# Campos obligatorios de HistoricalDataPoint; los opcionales ausentes se cargan como 0
+REQUIRED_FIELDS = ("temperature", "humidity", "windSpeed", "windDirection", "pressure", "precipitation")
+
+# Rangos físicamente plausibles por variable (inclusive)
+VALID_RANGES: Dict[str, tuple] = {
+    "temperature": (-90, 60),
+    "humidity": (0, 100),
+    "windSpeed": (0, 400),
+    "windDirection": (0, 360),
+    "pressure": (800, 1100),
+    "precipitation": (0, 500),
+    "solarRadiation": (0, 1500),
+    "uvIndex": (0, 20),
+    "pm25": (0, 1000),
+    "pm10": (0, 2000),
+    "co2": (0, 5000),
+    "o3": (0, 1000),
+    "feels": (-100, 70),
+    "soil": (-50, 70),
+    "soilHumidity": (0, 100),
+    "gust": (0, 400),
+}
+
+# Máximo de errores detallados en el reporte
+MAX_REPORTED_ERRORS = 20
+
+
+class IngestError(ValueError):
+    """Archivo que no se puede ingerir (formato o columnas inválidas)"""
+
+
+def _to_float(values: np.ndarray) -> np.ndarray:
+    """Convierte una columna de texto a float64; los valores no numéricos quedan en NaN"""
+    try:
+        return values.astype(np.float64)
+    except (TypeError, ValueError):
+        result = np.full(len(values), np.nan)
+        for i, value in enumerate(values):
+            try:
+                result[i] = float(value)
+            except (TypeError, ValueError):
+                pass
+        return result
+
+
+def _to_timestamps(values: np.ndarray) -> np.ndarray:
+    """Convierte una columna de texto ISO 8601 a datetime64 (UTC); las inválidas quedan en NaT"""
+    try:
+        return np.char.rstrip(values.astype(np.str_), "Z").astype(INDEX_DTYPE)
+    except (TypeError, ValueError):
+        result = np.full(len(values), np.datetime64("NaT"), dtype=INDEX_DTYPE)
+        for i, value in enumerate(values):
+            try:
+                moment = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+            except ValueError:
+                continue
+            if moment.tzinfo is not None:
+                moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+            result[i] = np.datetime64(moment, "us")
+        return result
+
+
+def read_csv_chunks(source: Union[str, BinaryIO], chunk_rows: int = CHUNK_ROWS) -> Iterator[Dict[str, np.ndarray]]:
+    """Lee un CSV con encabezado en bloques de `chunk_rows` líneas"""
+    if isinstance(source, str):
+        stream = open(source, encoding="utf-8", newline="")
+    else:
+        stream = io.TextIOWrapper(source, encoding="utf-8", newline="")
+
+    with stream:
+        header = next(csv.reader([stream.readline()]), None)
+        if not header:
+            return
+        header = [name.strip() for name in header]
+
+        while True:
+            lines = [line for line in itertools.islice(stream, chunk_rows) if line.strip()]
+            if not lines:
+                break
+            yield _csv_columns(header, lines)
+
+
+def _csv_columns(header: List[str], lines: List[str]) -> Dict[str, np.ndarray]:
+    """
+    Convierte un bloque de líneas CSV en columnas. El camino rápido es el parser en C
+    de np.loadtxt; si el bloque tiene celdas vacías o inválidas se usa el módulo csv
+    y la validación se encarga de las filas defectuosas.
+    """
+    numeric = [i for i, name in enumerate(header) if name in FIELD_SPECS]
+    try:
+        columns = {}
+        if "timestamp" in header:
+            columns["timestamp"] = np.loadtxt(
+                [line.replace("Z", "") for line in lines], delimiter=",", quotechar='"',
+                usecols=[header.index("timestamp")], dtype=INDEX_DTYPE, ndmin=1
+            )
+        if numeric:
+            values = np.loadtxt(lines, delimiter=",", quotechar='"', usecols=numeric, dtype=np.float64, ndmin=2)
+            columns.update({header[i]: values[:, j] for j, i in enumerate(numeric)})
+        return columns
+    except ValueError:
+        pass
+
+    width = len(header)
+    rows = [row + [""] * (width - len(row)) if len(row) < width else row[:width] for row in csv.reader(lines)]
+    return {name: np.array(column) for name, column in zip(header, zip(*rows))}
+
+
+def read_parquet_chunks(source: Union[str, BinaryIO], chunk_rows: int = CHUNK_ROWS) -> Iterator[Dict[str, np.ndarray]]:
+    """Lee un archivo Parquet por lotes (requiere pyarrow)"""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise IngestError("La lectura de Parquet requiere pyarrow (pip install pyarrow)")
+
+    parquet = pq.ParquetFile(source)
+    names = [name for name in parquet.schema_arrow.names if name == "timestamp" or name in FIELD_SPECS]
+    for batch in parquet.iter_batches(batch_size=chunk_rows, columns=names):
+        yield {
+            name: batch.column(i).to_numpy(zero_copy_only=False)
+            for i, name in enumerate(batch.schema.names)
+        }
+
+
+def validate_chunk(columns: Dict[str, np.ndarray], first_row: int, before: np.datetime64) -> Dict:
+    """
+    Valida un bloque de columnas sin construir objetos por fila.
+
+    Descarta las filas con timestamp inválido o no anterior a `before`, y las que
+    tienen valores faltantes o fuera de rango. Varias lecturas de una misma hora se
+    reducen a la última. Devuelve el frame horario válido, ordenado, y los errores.
+    """
+    if "timestamp" not in columns:
+        raise IngestError("Falta la columna obligatoria: timestamp")
+    missing = [name for name in REQUIRED_FIELDS if name not in columns]
+    if missing:
+        raise IngestError(f"Faltan columnas obligatorias: {', '.join(missing)}")
+
+    raw_index = columns["timestamp"]
+    if np.issubdtype(raw_index.dtype, np.datetime64):
+        index = raw_index.astype(INDEX_DTYPE)
+    else:
+        index = _to_timestamps(raw_index)
+    n = len(index)
+
+    valid = ~np.isnat(index)
+    errors = [(int(i), "timestamp inválido") for i in np.nonzero(~valid)[0][:MAX_REPORTED_ERRORS]]
+    late = valid & (index >= before)
+    errors += [(int(i), "timestamp no anterior a la hora en curso") for i in np.nonzero(late)[0][:MAX_REPORTED_ERRORS]]
+    valid &= ~late
+
+    values: Dict[str, np.ndarray] = {}
+    for name in FIELD_SPECS:
+        if name not in columns:
+            values[name] = np.zeros(n)
+            continue
+        column = columns[name]
+        column = column.astype(np.float64) if column.dtype.kind in "iuf" else _to_float(column)
+        low, high = VALID_RANGES[name]
+        bad = ~((column >= low) & (column <= high))  # NaN también es inválido
+        errors += [(int(i), f"{name} faltante o fuera de rango") for i in np.nonzero(bad & valid)[0][:MAX_REPORTED_ERRORS]]
+        valid &= ~bad
+        values[name] = column
+
+    # Una fila por hora: se ordena por tiempo y se conserva la última lectura de cada hora
+    rows = np.nonzero(valid)[0]
+    hours = index[rows].astype("datetime64[h]")
+    order = np.argsort(hours, kind="stable")
+    rows, hours = rows[order], hours[order]
+    last = np.r_[hours[1:] != hours[:-1], True] if len(hours) else np.zeros(0, dtype=bool)
+    rows, hours = rows[last], hours[last]
+
+    frame = TimeSeriesFrame.from_arrays(
+        hours.astype(INDEX_DTYPE),
+        {name: np.round(column[rows], FIELD_SPECS[name][1]) for name, column in values.items()}
+    )
+    errors.sort()
+    return {
+        "frame": frame,
+        "rejected": int(n - valid.sum()),
+        "errors": [f"Fila {first_row + i}: {message}" for i, message in errors[:MAX_REPORTED_ERRORS]]
+    }
+
+
+def ingest_chunks(
+    chunks: Iterator[Dict[str, np.ndarray]],
+    write: Callable[[TimeSeriesFrame], int],
+    now: Optional[datetime] = None,
+    stop: Optional[threading.Event] = None
+) -> Dict:
+    """
+    Valida y escribe bloque por bloque; devuelve el reporte de la carga.
+
+    La última hora de cada bloque se retiene hasta el siguiente, ya que sus
+    lecturas pueden continuar allí (en archivos ordenados por tiempo). Si `stop`
+    se activa, la carga termina antes del siguiente bloque sin escribir nada más.
+    """
+    before = np.datetime64(now or datetime.now(), "h").astype(INDEX_DTYPE)
+    report = {"received": 0, "accepted": 0, "rejected": 0, "hoursWritten": 0, "errors": []}
+    carry: Optional[TimeSeriesFrame] = None
+
+    for chunk in chunks:
+        if stop is not None and stop.is_set():
+            return report
+        rows = len(next(iter(chunk.values()))) if chunk else 0
+        result = validate_chunk(chunk, first_row=report["received"] + 1, before=before)
+        report["received"] += rows
+        report["rejected"] += result["rejected"]
+        report["accepted"] += rows - result["rejected"]
+        report["errors"].extend(result["errors"][:MAX_REPORTED_ERRORS - len(report["errors"])])
+
+        frame = result["frame"]
+        if len(frame) == 0:
+            continue
+        if carry is not None and carry.index[0] not in frame.index:
+            frame = TimeSeriesFrame.concat([carry, frame])
+        report["hoursWritten"] += write(frame.slice(0, len(frame) - 1))
+        carry = frame.slice(len(frame) - 1, len(frame))
+
+    if carry is not None and not (stop is not None and stop.is_set()):
+        report["hoursWritten"] += write(carry)
+    return report
+
+
+def read_chunks(source: Union[str, BinaryIO], format: str, chunk_rows: int = CHUNK_ROWS) -> Iterator[Dict[str, np.ndarray]]:
+    """Lector por bloques según el formato ("csv" o "parquet")"""
+    if format == "csv":
+        return read_csv_chunks(source, chunk_rows)
+    if format == "parquet":
+        return read_parquet_chunks(source, chunk_rows)
+    raise IngestError("Formato inválido. Valores válidos: csv, parquet")
+
+
+def detect_format(filename: str) -> str:
+    """Formato a partir de la extensión del archivo"""
+    return "parquet" if filename.lower().endswith((".parquet", ".pq")) else "csv"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Carga un archivo de lecturas en el archivo histórico de una estación"""
+    from archive import StationArchive
+
+    default_archive = os.getenv("MTO_ARCHIVE_DIR", "")
+    parser = argparse.ArgumentParser(description="Ingesta masiva de lecturas horarias")
+    parser.add_argument("location_id", help="Id de la estación (p. ej. loc_001)")
+    parser.add_argument("path", help="Archivo CSV o Parquet")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="Formato (por defecto, según la extensión)")
+    parser.add_argument("--archive", default=default_archive, help="Directorio del archivo histórico")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="Filas por bloque")
+    args = parser.parse_args(argv)
+
+    if not args.archive:
+        print("Se requiere un directorio de archivo (--archive o MTO_ARCHIVE_DIR)", file=sys.stderr)
+        return 2
+
+    archive = StationArchive(args.archive)
+    try:
+        report = ingest_chunks(
+            read_chunks(args.path, args.format or detect_format(args.path), args.chunk_rows),
+            lambda frame: archive.append(args.location_id, frame, overwrite=True)
+        )
+    except IngestError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    print(
+        f"✅ {report['received']} filas leídas, {report['accepted']} aceptadas, "
+        f"{report['rejected']} rechazadas, {report['hoursWritten']} horas escritas"
+    )
+    for error in report["errors"]:
+        print(f"  - {error}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,36 +3,52 @@ Backend MTOs - FastAPI
 Sistema de simulación meteorológica con API REST
 """
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from contextlib import asynccontextmanager
 import asyncio
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Any, Callable, Dict, List, Tuple
 import json
+import os
 import random
+import threading
+import numpy as np
 
-from sensors import WeatherSimulator
-from statistics import DescriptiveStatistics, LinearRegressionPredictor, CorrelationAnalysis
+from alerts import AlertEngine
+from anomalies import AnomalyDetector
+from archive import StationArchive
+from cache import EpochCache, serialize
+from executors import AnalyticsExecutor, ExecutorBusy
+from forecasting import BatchForecaster, ForecastTable
+from highfreq import HIGHFREQ_VARIABLES, HighFrequencyStore
+from ingest import IngestError, detect_format, ingest_chunks, read_chunks
+from sketches import k_for_error
+from stations import LocationRegistry, SimulatorFleet
+from storage import HistoryStore
+from timeseries import HISTORICAL_FIELDS, RESAMPLE_INTERVALS, TimeSeriesFrame
+from statistics import (
+    STATISTICS_VARIABLES, ROLLING_AGGREGATES, DescriptiveStatistics, RollingQuantiles, RollingAggregates,
+    LinearRegressionPredictor, SlidingRegression, CorrelationAnalysis
+)
 from models import (
     CurrentWeatherResponse,
     ForecastResponse,
     AlertsResponse,
+    AnomaliesResponse,
     PredictionsResponse,
     HistoricalResponse,
     AnalyticsResponse,
     StatisticsResponse,
+    OnlineStatisticsResponse,
+    RollingStatisticsResponse,
+    RollingAggregatesResponse,
     RegressionResponse,
     CorrelationMatrixResponse,
     Location
 )
 
-# Estado global
-weather_state: Dict = {}
-simulator = WeatherSimulator(base_temp=24.0, base_humidity=68.0)
-active_connections: List[WebSocket] = []
-
 # Ubicación por defecto
 DEFAULT_LOCATION = Location(
     id="loc_001",
@@ -44,6 +60,92 @@ DEFAULT_LOCATION = Location(
     elevation=2500
 )
 
+# Semilla opcional: con ella el historial es reproducible entre reinicios y workers
+SIMULATION_SEED = os.getenv("MTO_SIMULATION_SEED")
+
+# Máximo rango (en horas) que puede pedirse a /historical con startDate/endDate
+MAX_HISTORICAL_RANGE_HOURS = 24 * 366
+
+# Archivo en disco del historial: desactivado salvo que se indique un directorio
+ARCHIVE_DIR = os.getenv("MTO_ARCHIVE_DIR", "")
+
+# Capacidad del buffer en memoria y máximo período analizable (con archivo, 5 años)
+HISTORY_CAPACITY_HOURS = 720
+MAX_ANALYSIS_HOURS = 24 * 365 * 5 if ARCHIVE_DIR else HISTORY_CAPACITY_HOURS
+
+# Desfase máximo (horas) de la correlación cruzada en /correlation
+MAX_CORRELATION_LAG = 48
+
+# Error de rango de los sketches de cuantiles usados en /statistics sobre rangos largos
+SKETCH_ERROR = float(os.getenv("MTO_SKETCH_ERROR", "0.01"))
+
+# Ejecutores de analítica: procesos, hilos, tareas en curso máximas y timeout (segundos)
+ANALYTICS_PROCESSES = int(os.getenv("MTO_ANALYTICS_PROCESSES", str(min(4, os.cpu_count() or 1))))
+ANALYTICS_THREADS = int(os.getenv("MTO_ANALYTICS_THREADS", "4"))
+ANALYTICS_MAX_PENDING = int(os.getenv("MTO_ANALYTICS_MAX_PENDING", "32"))
+ANALYTICS_TIMEOUT = float(os.getenv("MTO_ANALYTICS_TIMEOUT", "30"))
+
+# Estaciones adicionales: archivo JSON y/o estaciones sintéticas para pruebas de carga
+STATIONS_FILE = os.getenv("MTO_STATIONS_FILE")
+SYNTHETIC_STATIONS = int(os.getenv("MTO_SYNTHETIC_STATIONS", "0"))
+
+# Entradas máximas de la caché de pronósticos (se invalida en cada actualización)
+FORECAST_CACHE_SIZE = int(os.getenv("MTO_FORECAST_CACHE_SIZE", "1024"))
+
+# Detección de anomalías: vida media (en lecturas de 30 s), umbral de |z robusto| y
+# lecturas de calentamiento antes de marcar anomalías
+ANOMALY_HALFLIFE = float(os.getenv("MTO_ANOMALY_HALFLIFE", "120"))
+ANOMALY_THRESHOLD = float(os.getenv("MTO_ANOMALY_THRESHOLD", "4"))
+ANOMALY_WARMUP = int(os.getenv("MTO_ANOMALY_WARMUP", "20"))
+
+# Pronóstico por lotes de la flota: horas de entrenamiento (a lo sumo el buffer en
+# memoria), horizonte en horas y estaciones por bloque de ajuste
+FORECAST_TRAINING_HOURS = min(int(os.getenv("MTO_FORECAST_TRAINING_HOURS", "168")), HISTORY_CAPACITY_HOURS)
+FORECAST_HORIZON_HOURS = int(os.getenv("MTO_FORECAST_HORIZON_HOURS", "72"))
+FORECAST_CHUNK_STATIONS = int(os.getenv("MTO_FORECAST_CHUNK_STATIONS", "512"))
+
+# Modo de alta frecuencia (muestras de 1 Hz) y ventana de muestras crudas en segundos
+HIGHFREQ_ENABLED = os.getenv("MTO_HIGHFREQ", "0") == "1"
+HIGHFREQ_RAW_SECONDS = int(os.getenv("MTO_HIGHFREQ_RAW_SECONDS", "300"))
+
+# Estado global
+registry = LocationRegistry(seed=int(SIMULATION_SEED) if SIMULATION_SEED else None)
+registry.add(DEFAULT_LOCATION, base_temp=24.0, base_humidity=68.0)
+if STATIONS_FILE:
+    registry.load_file(STATIONS_FILE)
+if SYNTHETIC_STATIONS > 0:
+    registry.add_synthetic(SYNTHETIC_STATIONS, around=DEFAULT_LOCATION)
+
+fleet = SimulatorFleet(registry)
+history = HistoryStore(
+    capacity=HISTORY_CAPACITY_HOURS,
+    simulator_for=registry.simulator,
+    archive=StationArchive(ARCHIVE_DIR) if ARCHIVE_DIR else None,
+    backfill_hours=24 * 180,  # Seis meses para /analytics en el primer arranque
+    sketch_k=k_for_error(SKETCH_ERROR)
+)
+alert_engine = AlertEngine(registry)
+anomaly_detector = AnomalyDetector(
+    registry,
+    halflife=ANOMALY_HALFLIFE,
+    threshold=ANOMALY_THRESHOLD,
+    warmup=ANOMALY_WARMUP
+)
+highfreq = HighFrequencyStore(registry, raw_seconds=HIGHFREQ_RAW_SECONDS) if HIGHFREQ_ENABLED else None
+forecast_cache = EpochCache(max_entries=FORECAST_CACHE_SIZE)
+forecaster = BatchForecaster(
+    training_hours=FORECAST_TRAINING_HOURS,
+    horizon_hours=FORECAST_HORIZON_HOURS,
+    chunk_stations=FORECAST_CHUNK_STATIONS
+)
+analytics = AnalyticsExecutor(
+    process_workers=ANALYTICS_PROCESSES,
+    thread_workers=ANALYTICS_THREADS,
+    max_pending=ANALYTICS_MAX_PENDING,
+    timeout=ANALYTICS_TIMEOUT
+)
+active_connections: Dict[str, List[WebSocket]] = {}
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -51,6 +153,7 @@ async def lifespan(app: FastAPI):
     # Inicialización
     print("🚀 Iniciando backend MTOs...")
     update_weather_state()
+    analytics.start()
     
     # Iniciar tarea de actualización automática
     task = asyncio.create_task(periodic_update())
@@ -60,6 +163,7 @@ async def lifespan(app: FastAPI):
     # Limpieza
     print("🛑 Deteniendo backend MTOs...")
     task.cancel()
+    analytics.shutdown()
 
 
 app = FastAPI(
@@ -79,47 +183,260 @@ app.add_middleware(
 )
 
 
-def update_weather_state():
-    """Actualiza el estado global con nuevos datos simulados"""
-    global weather_state
-    
-    current = simulator.generate_current_weather()
-    weather_state = {
-        "location": DEFAULT_LOCATION.dict(),
+def update_weather_state() -> Tuple[Dict[str, List[Dict]], Dict[str, List[Dict]]]:
+    """
+    Actualiza toda la flota en un paso y el historial de las estaciones en uso.
+    Devuelve las alertas disparadas y las anomalías detectadas en esta lectura, por estación.
+    """
+    fleet.tick()
+    for location_id in history.location_ids():
+        history.update(location_id)
+    if highfreq is not None:
+        highfreq.update(highfreq.location_ids(), fleet.updated_at)
+    forecast_cache.advance()
+    fired_alerts = alert_engine.evaluate(fleet.current, fleet.updated_at)
+    return fired_alerts, anomaly_detector.update(fleet.current, fleet.updated_at)
+
+
+def current_state(location: Location) -> Dict:
+    """Estado actual de una estación (se construye solo cuando se consulta)"""
+    updated = fleet.updated_at.isoformat() + "Z"
+    return {
+        "location": location.dict(),
         "current": {
-            "locationId": DEFAULT_LOCATION.id,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
-            **current
+            "locationId": location.id,
+            "timestamp": updated,
+            **fleet.current_weather(location.id)
         },
-        "lastUpdated": datetime.utcnow().isoformat() + "Z"
+        "lastUpdated": updated
     }
 
 
+def get_location(location_id: str) -> Location:
+    """Busca la estación o responde 404"""
+    location = registry.get(location_id)
+    if location is None:
+        raise HTTPException(status_code=404, detail="Ubicación no encontrada")
+    return location
+
+
+async def cached_response(endpoint: str, location_id: str, params: tuple, build: Callable[[], Any]) -> Response:
+    """
+    Respuesta JSON desde la caché de pronósticos: dentro de un mismo ciclo de
+    actualización, las consultas repetidas devuelven los bytes ya serializados.
+    En un fallo, `build` y la serialización corren en el pool de hilos; si mientras
+    tanto avanzó la época, el resultado se responde pero no se guarda.
+    """
+    key = (location_id, endpoint, params)
+    entry = forecast_cache.get(key)
+    if entry is not None:
+        return Response(content=entry.body, media_type="application/json")
+    
+    def compute() -> Tuple[Any, bytes]:
+        result = build()
+        return result, serialize(result)
+    
+    epoch = forecast_cache.epoch
+    result, body = await offload(analytics.run_thread, compute)
+    if forecast_cache.epoch == epoch:
+        forecast_cache.put(key, result, body)
+    return Response(content=body, media_type="application/json")
+
+
+def json_response(model: Any) -> Response:
+    """Respuesta JSON ya serializada (para construirla fuera del event loop)"""
+    return Response(content=serialize(model), media_type="application/json")
+
+
+def regression_response(location: Location, results: Dict[str, Dict], hours_ahead: int) -> Response:
+    """
+    RegressionResponse serializado una sola vez; los puntos del horizonte salen de
+    las columnas de cada predicción (prediction_rows).
+    """
+    variables = {}
+    for name, result in results.items():
+        if "error" in result:
+            variables[name] = {
+                "variable": name,
+                "model": {"type": "linear_regression", "coefficient": 0, "intercept": 0,
+                          "r2": 0, "rmse": 0, "mae": 0, "mse": 0},
+                "predictions": [],
+                "dataPoints": 0,
+                "hoursAhead": hours_ahead,
+                "error": result["error"]
+            }
+        else:
+            variables[name] = {
+                "variable": name,
+                "model": result["model"],
+                "predictions": LinearRegressionPredictor.prediction_rows(result["forecast"]),
+                "dataPoints": result["dataPoints"],
+                "hoursAhead": result["hoursAhead"],
+                "error": None
+            }
+    
+    return json_response({
+        "location": location,
+        "variables": variables,
+        "lastUpdated": datetime.utcnow().isoformat() + "Z"
+    })
+
+
+def validate_regression_model(model: str, hours_ahead: int) -> None:
+    """Valida el modelo de /predictions/regression y su horizonte"""
+    if model not in ("linear", "harmonic"):
+        raise HTTPException(status_code=400, detail="Modelo inválido. Valores válidos: linear, harmonic")
+    if model == "harmonic" and hours_ahead > FORECAST_HORIZON_HOURS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El máximo de horas a predecir con el modelo harmonic es {FORECAST_HORIZON_HOURS}"
+        )
+
+
+async def regression_predictions(
+    location: Location,
+    variables: List[str],
+    hours: int,
+    hours_ahead: int,
+    model: str
+) -> Response:
+    """
+    Predicciones de /predictions/regression. El ajuste se lee en el event loop (estado
+    compartido) y el horizonte y la serialización corren en el pool de hilos:
+    - linear: regresión deslizante por estación y ventana (solo incorpora lecturas
+      nuevas); el MAE, que necesita todos los residuos, se calcula en el hilo
+      sobre una copia de la ventana
+    - harmonic: fila de la estación en la tabla de pronósticos de la flota
+    """
+    if model == "harmonic":
+        table = await station_forecast(location.id)
+        
+        def build() -> Response:
+            return regression_response(location, table.regression(location.id, variables, hours_ahead), hours_ahead)
+        
+        return await offload(analytics.run_thread, build)
+    
+    sliding = history.regression(location.id, hours)
+    if sliding.n < 2:
+        raise HTTPException(status_code=400, detail="Datos insuficientes para realizar predicción")
+    fit, n = sliding.fit(), sliding.n
+    window = history.window(location.id, n).copy()
+    
+    def build() -> Response:
+        matrix = np.column_stack([window.values(name) for name in STATISTICS_VARIABLES])
+        fit["mae"] = SlidingRegression.mean_absolute_error(fit, matrix)
+        predictions = LinearRegressionPredictor.predict_from_fit(
+            fit,
+            STATISTICS_VARIABLES,
+            variables,
+            n,
+            hours_ahead
+        )
+        return regression_response(location, predictions, hours_ahead)
+    
+    return await offload(analytics.run_thread, build)
+
+
+async def offload(run: Callable, fn: Callable, *args: Any) -> Any:
+    """
+    Ejecuta fn(*args) en un pool de analítica (`analytics.run_process` o
+    `analytics.run_thread`) sin bloquear el event loop; 503 si los pools están
+    saturados y 504 si la tarea supera el timeout.
+    """
+    try:
+        return await run(fn, *args)
+    except ExecutorBusy:
+        raise HTTPException(status_code=503, detail="Servidor ocupado con otros análisis, intente nuevamente")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="El análisis superó el tiempo máximo de ejecución")
+
+
+async def station_forecast(location_id: str) -> ForecastTable:
+    """
+    Tabla de pronósticos que incluye a la estación. Si aún no figura, la ventana se
+    lee aquí y el ajuste corre en el pool de hilos, como en refresh_forecasts.
+    """
+    frame = history.window(location_id, FORECAST_TRAINING_HOURS)
+    table, missing = forecaster.prepare(location_id, frame)
+    if missing:
+        block = await offload(analytics.run_thread, forecaster.fit, forecaster.gather([frame]), table.design)
+        table.add([location_id], block)
+    return table
+
+
+async def refresh_forecasts() -> None:
+    """
+    Reajusta en una hora nueva los pronósticos de todas las estaciones con historial:
+    cada bloque se lee del historial aquí y se ajusta en el pool de hilos.
+    """
+    location_ids = history.location_ids()
+    if not location_ids:
+        return
+    issued = history.window(location_ids[0], 1).index[-1].astype("datetime64[h]")
+    if not forecaster.stale(issued):
+        return
+    
+    design = forecaster.design(issued)
+    table = ForecastTable(design)
+    for chunk in forecaster.chunks(location_ids):
+        frames = [history.window(location_id, FORECAST_TRAINING_HOURS) for location_id in chunk]
+        current = [i for i, frame in enumerate(frames) if frame.index[-1] == issued]
+        if not current:
+            continue
+        tensor = forecaster.gather([frames[i] for i in current])
+        block = await analytics.run_thread(forecaster.fit, tensor, design)
+        table.add([chunk[i] for i in current], block)
+    forecaster.install(table)
+
+
 async def periodic_update():
     """Tarea periódica que actualiza los datos cada 30 segundos"""
     while True:
         try:
             await asyncio.sleep(30)  # Actualizar cada 30 segundos
-            update_weather_state()
+            fired_alerts, anomalies = update_weather_state()
             
-            # Notificar clientes WebSocket
-            if active_connections:
-                message = {
+            # Notificar clientes WebSocket (un mensaje por estación suscrita)
+            for location_id, connections in active_connections.items():
+                if not connections:
+                    continue
+                timestamp = datetime.utcnow().isoformat() + "Z"
+                messages = [{
                     "type": "current_weather_update",
-                    "locationId": DEFAULT_LOCATION.id,
-                    "data": weather_state["current"],
-                    "timestamp": datetime.utcnow().isoformat() + "Z"
-                }
+                    "locationId": location_id,
+                    "data": current_state(registry.get(location_id))["current"],
+                    "timestamp": timestamp
+                }]
+                # Alertas nuevas: se envían en el mismo tick en que se disparan
+                for alert in fired_alerts.get(location_id, []):
+                    messages.append({
+                        "type": "alert",
+                        "locationId": location_id,
+                        "data": alert,
+                        "timestamp": timestamp
+                    })
+                # Anomalías detectadas en esta lectura
+                for anomaly in anomalies.get(location_id, []):
+                    messages.append({
+                        "type": "anomaly",
+                        "locationId": location_id,
+                        "data": anomaly,
+                        "timestamp": timestamp
+                    })
                 disconnected = []
-                for connection in active_connections:
+                for connection in connections:
                     try:
-                        await connection.send_json(message)
+                        for message in messages:
+                            await connection.send_json(message)
                     except:
                         disconnected.append(connection)
                 
                 # Remover conexiones desconectadas
                 for conn in disconnected:
-                    active_connections.remove(conn)
+                    connections.remove(conn)
+            
+            # Pronósticos de la flota: se reajustan una vez por hora
+            await refresh_forecasts()
                     
         except asyncio.CancelledError:
             break
@@ -127,6 +444,42 @@ async def periodic_update():
             print(f"Error en actualización periódica: {e}")
 
 
+def _chart_data(frame: TimeSeriesFrame, label: str, fields: Dict[str, str]) -> List[Dict]:
+    """Construye los puntos de un gráfico directamente desde las columnas del historial"""
+    stamps = np.datetime_as_string(frame.index, unit="m").tolist()
+    if label == "hour":
+        labels = [stamp[11:13] + "h" for stamp in stamps]
+    else:
+        labels = [stamp[11:16] for stamp in stamps]
+    
+    keys = list(fields)
+    rows = zip(*(frame.to_python(fields[key]) for key in keys))
+    return [{label: value, **dict(zip(keys, row))} for value, row in zip(labels, rows)]
+
+
+def _parse_date_param(value: str, end_of_day: bool = False) -> np.datetime64:
+    """Convierte startDate/endDate (fecha o fecha-hora ISO) a datetime64 horario"""
+    try:
+        parsed = np.datetime64(value.strip().rstrip("Z"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Formato de fecha inválido: {value}")
+    
+    # Una fecha sin hora como endDate incluye el día completo
+    if end_of_day and parsed.dtype == np.dtype("datetime64[D]"):
+        parsed = parsed + np.timedelta64(1, "D")
+    return parsed.astype("datetime64[h]")
+
+
+def _history_range(location_id: str, start: np.datetime64, end: np.datetime64) -> TimeSeriesFrame:
+    """Horas en [start, end): del buffer si las contiene, o generadas si el simulador es determinista"""
+    start = start.astype("datetime64[us]")
+    end = end.astype("datetime64[us]")
+    simulator = registry.simulator(location_id)
+    if simulator.deterministic and not history.covers(location_id, start):
+        return simulator.generate_hour_range(start, end)
+    return history.range(location_id, start, end)
+
+
 # ==================== ENDPOINTS ====================
 
 @app.get("/")
@@ -150,127 +503,171 @@ async def root():
 
 
 @app.get("/api/v1/locations")
-async def get_locations():
+async def get_locations(offset: int = 0, limit: int = None):
     """Obtener todas las ubicaciones disponibles"""
+    end = None if limit is None else offset + limit
     return {
-        "locations": [DEFAULT_LOCATION.dict()]
+        "locations": [location.dict() for location in registry.locations[offset:end]],
+        "total": len(registry)
     }
 
 
 @app.get("/api/v1/locations/{location_id}/current", response_model=CurrentWeatherResponse)
 async def get_current_weather(location_id: str):
     """Obtener condiciones meteorológicas actuales"""
-    if location_id != DEFAULT_LOCATION.id:
-        raise HTTPException(status_code=404, detail="Ubicación no encontrada")
+    location = get_location(location_id)
     
-    return CurrentWeatherResponse(**weather_state)
+    return CurrentWeatherResponse(**current_state(location))
 
 
 @app.get("/api/v1/locations/{location_id}/forecast/daily", response_model=ForecastResponse)
 async def get_daily_forecast(location_id: str, days: int = 7):
     """Obtener pronóstico diario"""
-    if location_id != DEFAULT_LOCATION.id:
-        raise HTTPException(status_code=404, detail="Ubicación no encontrada")
-    
-    forecast = simulator.generate_daily_forecast(days=days)
+    location = get_location(location_id)
+    
+    def build():
+        forecast = registry.simulator(location.id).generate_daily_forecast(days=days)
+        return ForecastResponse(
+            location=location,
+            forecast=forecast,
+            lastUpdated=datetime.utcnow().isoformat() + "Z"
+        )
     
-    return ForecastResponse(
-        location=DEFAULT_LOCATION,
-        forecast=forecast,
-        lastUpdated=datetime.utcnow().isoformat() + "Z"
-    )
+    return await cached_response("forecast/daily", location.id, (days,), build)
 
 
 @app.get("/api/v1/locations/{location_id}/forecast/hourly")
 async def get_hourly_forecast(location_id: str, hours: int = 24):
-    """Obtener pronóstico horario"""
-    if location_id != DEFAULT_LOCATION.id:
-        raise HTTPException(status_code=404, detail="Ubicación no encontrada")
+    """
+    Obtener pronóstico horario
     
-    forecast = simulator.generate_hourly_forecast(hours=hours)
+    - **hours**: Horas a pronosticar (mínimo: 1, máximo: MTO_FORECAST_HORIZON_HOURS, default: 24)
     
-    return {
-        "location": DEFAULT_LOCATION.dict(),
-        "forecast": forecast,
-        "lastUpdated": datetime.utcnow().isoformat() + "Z"
-    }
+    Sale de la tabla de pronósticos de la flota: tendencia más armónicos diurnos
+    ajustados sobre las últimas MTO_FORECAST_TRAINING_HOURS horas del historial.
+    """
+    location = get_location(location_id)
+    
+    if not 1 <= hours <= FORECAST_HORIZON_HOURS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Las horas de pronóstico deben estar entre 1 y {FORECAST_HORIZON_HOURS}"
+        )
+    
+    table = await station_forecast(location.id)
+    
+    def build():
+        forecast = table.hourly(location.id, hours)
+        return {
+            "location": location.dict(),
+            "forecast": forecast,
+            "lastUpdated": datetime.utcnow().isoformat() + "Z"
+        }
+    
+    return await cached_response("forecast/hourly", location.id, (hours,), build)
 
 
 @app.get("/api/v1/locations/{location_id}/alerts", response_model=AlertsResponse)
 async def get_alerts(location_id: str):
     """Obtener alertas meteorológicas activas"""
-    if location_id != DEFAULT_LOCATION.id:
-        raise HTTPException(status_code=404, detail="Ubicación no encontrada")
-    
-    alerts = simulator.generate_alerts()
+    location = get_location(location_id)
     
     return AlertsResponse(
-        location=DEFAULT_LOCATION,
-        alerts=alerts,
-        lastUpdated=datetime.utcnow().isoformat() + "Z"
+        location=location,
+        alerts=alert_engine.active(location.id),
+        lastUpdated=fleet.updated_at.isoformat() + "Z"
+    )
+
+
+@app.get("/api/v1/locations/{location_id}/anomalies", response_model=AnomaliesResponse)
+async def get_anomalies(location_id: str, limit: int = 50):
+    """
+    Obtener anomalías recientes y el estado del detector por variable
+    
+    - **limit**: Máximo de anomalías recientes (la más nueva primero)
+    
+    Cada lectura de la flota se compara con una línea base EWMA por estación y variable;
+    es anómala cuando su z-score robusto supera MTO_ANOMALY_THRESHOLD. Las anomalías
+    nuevas también se envían por WebSocket con `type: "anomaly"`.
+    """
+    location = get_location(location_id)
+    
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="El límite mínimo es 1")
+    
+    return AnomaliesResponse(
+        location=location,
+        threshold=anomaly_detector.threshold,
+        scores=anomaly_detector.scores(location.id),
+        anomalies=anomaly_detector.recent(location.id, limit),
+        lastUpdated=fleet.updated_at.isoformat() + "Z"
     )
 
 
 @app.get("/api/v1/locations/{location_id}/predictions")
 async def get_predictions(location_id: str, days: int = 7, model: str = "hybrid"):
     """Obtener predicciones avanzadas con modelos ML"""
-    if location_id != DEFAULT_LOCATION.id:
-        raise HTTPException(status_code=404, detail="Ubicación no encontrada")
-    
-    predictions = simulator.generate_predictions(days=days)
+    location = get_location(location_id)
+    
+    def build():
+        predictions = registry.simulator(location.id).generate_predictions(days=days)
+    
+        model_metrics = {
+            "ml": {
+                "accuracy": 94.2,
+                "rmse": 1.2,
+                "mae": 0.9,
+                "lastUpdated": datetime.utcnow().isoformat() + "Z"
+            },
+            "statistical": {
+                "accuracy": 91.5,
+                "rmse": 1.5,
+                "mae": 1.2,
+                "lastUpdated": datetime.utcnow().isoformat() + "Z"
+            },
+            "hybrid": {
+                "accuracy": 95.8,
+                "rmse": 0.9,
+                "mae": 0.7,
+                "lastUpdated": datetime.utcnow().isoformat() + "Z"
+            }
+        }
     
-    model_metrics = {
-        "ml": {
-            "accuracy": 94.2,
-            "rmse": 1.2,
-            "mae": 0.9,
-            "lastUpdated": datetime.utcnow().isoformat() + "Z"
-        },
-        "statistical": {
-            "accuracy": 91.5,
-            "rmse": 1.5,
-            "mae": 1.2,
-            "lastUpdated": datetime.utcnow().isoformat() + "Z"
-        },
-        "hybrid": {
-            "accuracy": 95.8,
-            "rmse": 0.9,
-            "mae": 0.7,
+        return {
+            "location": location.dict(),
+            "predictions": predictions,
+            "modelMetrics": model_metrics,
             "lastUpdated": datetime.utcnow().isoformat() + "Z"
         }
-    }
     
-    return {
-        "location": DEFAULT_LOCATION.dict(),
-        "predictions": predictions,
-        "modelMetrics": model_metrics,
-        "lastUpdated": datetime.utcnow().isoformat() + "Z"
-    }
+    return await cached_response("predictions", location.id, (days, model), build)
 
 
 @app.get("/api/v1/locations/{location_id}/predictions/heatmap")
 async def get_heatmap(location_id: str):
     """Obtener heatmap de temperatura para la próxima semana"""
-    if location_id != DEFAULT_LOCATION.id:
-        raise HTTPException(status_code=404, detail="Ubicación no encontrada")
-    
-    # Generar heatmap simplificado
-    hours = ["00h", "06h", "12h", "18h"]
-    days = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
-    heatmap = []
-    
-    for hour in hours:
-        row = {"hour": hour}
-        for day in days:
-            temp = simulator.base_temp + random.uniform(-3, 5)
-            row[day] = round(temp, 1)
-        heatmap.append(row)
+    location = get_location(location_id)
+    
+    def build():
+        # Generar heatmap simplificado
+        hours = ["00h", "06h", "12h", "18h"]
+        days = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+        heatmap = []
+    
+        for hour in hours:
+            row = {"hour": hour}
+            for day in days:
+                temp = registry.simulator(location.id).base_temp + random.uniform(-3, 5)
+                row[day] = round(temp, 1)
+            heatmap.append(row)
+    
+        return {
+            "location": location.dict(),
+            "heatmap": heatmap,
+            "lastUpdated": datetime.utcnow().isoformat() + "Z"
+        }
     
-    return {
-        "location": DEFAULT_LOCATION.dict(),
-        "heatmap": heatmap,
-        "lastUpdated": datetime.utcnow().isoformat() + "Z"
-    }
+    return await cached_response("predictions/heatmap", location.id, (), build)
 
 
 @app.get("/api/v1/locations/{location_id}/historical", response_model=HistoricalResponse)
@@ -281,16 +678,51 @@ async def get_historical_data(
     interval: str = "hourly",
     hours: int = 24
 ):
-    """Obtener datos históricos"""
-    if location_id != DEFAULT_LOCATION.id:
-        raise HTTPException(status_code=404, detail="Ubicación no encontrada")
+    """
+    Obtener datos históricos
+    
+    - **startDate** / **endDate**: Rango opcional de fechas (si no, las últimas `hours` horas)
+    - **interval**: hourly, daily o weekly (semanas de lunes a domingo)
+    
+    Con daily y weekly cada punto es un bucket (`time` y `hour` de su inicio): media de
+    cada variable, suma de la precipitación y media vectorial de la dirección del
+    viento, más `count`, `min` y `max`. hourly devuelve las horas almacenadas.
+    """
+    location = get_location(location_id)
+    
+    if interval == "15min":
+        raise HTTPException(
+            status_code=400,
+            detail="El historial es horario: el intervalo mínimo es hourly"
+        )
+    if interval not in RESAMPLE_INTERVALS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Intervalo inválido. Valores válidos: {', '.join(RESAMPLE_INTERVALS)}"
+        )
+    
+    if startDate or endDate:
+        end = _parse_date_param(endDate, end_of_day=True) if endDate else np.datetime64(datetime.now(), "h") + np.timedelta64(1, "h")
+        start = _parse_date_param(startDate) if startDate else end - np.timedelta64(hours, "h")
+        if end <= start:
+            raise HTTPException(status_code=400, detail="endDate debe ser posterior a startDate")
+        if (end - start) > np.timedelta64(MAX_HISTORICAL_RANGE_HOURS, "h"):
+            raise HTTPException(
+                status_code=400,
+                detail=f"El rango máximo es de {MAX_HISTORICAL_RANGE_HOURS} horas"
+            )
+        frame = _history_range(location.id, start, end)
+    else:
+        frame = history.window(location.id, hours)
     
-    data = simulator.generate_historical_data(hours=hours)
+    minutes = RESAMPLE_INTERVALS[interval]
+    data = frame.resample(minutes).to_records() if minutes > 60 else frame.to_records()
     
     return HistoricalResponse(
-        location=DEFAULT_LOCATION,
+        location=location,
         data=data,
         summary={
+            "interval": interval,
             "totalRecords": len(data),
             "dateRange": {
                 "start": data[0]["timestamp"] if data else None,
@@ -301,6 +733,98 @@ async def get_historical_data(
     )
 
 
+@app.post("/api/v1/locations/{location_id}/readings:bulk")
+async def ingest_readings(location_id: str, file: UploadFile = File(...), format: str = None):
+    """
+    Cargar lecturas horarias reales desde un archivo CSV o Parquet.
+    El archivo se procesa por bloques; las horas ingeridas reemplazan a las simuladas.
+    
+    La lectura y la validación corren en el pool de hilos; solo la escritura de cada
+    bloque validado vuelve al event loop, igual que las demás escrituras del historial.
+    Si la carga supera el timeout, el hilo se detiene antes del siguiente bloque.
+    """
+    location = get_location(location_id)
+    loop = asyncio.get_running_loop()
+    stop = threading.Event()
+    
+    async def store(frame: TimeSeriesFrame) -> int:
+        # Tras un timeout el hilo puede seguir enviando bloques: se descartan
+        if stop.is_set():
+            return 0
+        return history.ingest(location.id, frame)
+    
+    def run() -> Dict:
+        return ingest_chunks(
+            read_chunks(file.file, format or detect_format(file.filename or "")),
+            lambda frame: asyncio.run_coroutine_threadsafe(store(frame), loop).result(),
+            stop=stop
+        )
+    
+    try:
+        report = await offload(analytics.run_thread, run)
+    except IngestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        stop.set()
+        # Las respuestas cacheadas pueden depender del historial reemplazado,
+        # también cuando la carga quedó a medias (error, timeout o cancelación)
+        forecast_cache.advance()
+    
+    return {
+        "location": location.dict(),
+        **report,
+        "lastUpdated": datetime.utcnow().isoformat() + "Z"
+    }
+
+
+@app.get("/api/v1/locations/{location_id}/highfreq")
+async def get_highfreq_data(location_id: str, resolution: str = "minute", limit: int = 60):
+    """
+    Obtener lecturas de alta frecuencia: muestras crudas de 1 Hz (ventana corta)
+    o agregados por minuto/hora (media, mínimo, máximo, último y cantidad).
+    """
+    location = get_location(location_id)
+    
+    if highfreq is None:
+        raise HTTPException(status_code=404, detail="El modo de alta frecuencia no está activado")
+    if resolution not in ("raw", "minute", "hour"):
+        raise HTTPException(status_code=400, detail="Resolución inválida. Valores válidos: raw, minute, hour")
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="El límite mínimo es 1")
+    
+    # La estación queda en seguimiento a partir de la primera consulta
+    highfreq.update([location.id], fleet.updated_at)
+    stream = highfreq.stream(location.id)
+    
+    if resolution == "raw":
+        rows = stream.raw.rows(limit)
+        values = rows["values"].astype(np.float64).round(1).tolist()
+        data = [
+            {"timestamp": stamp + "Z", **dict(zip(HIGHFREQ_VARIABLES, row))}
+            for stamp, row in zip(np.datetime_as_string(rows["keys"]).tolist(), values)
+        ]
+    else:
+        aggregates = stream.minutes if resolution == "minute" else stream.hours
+        rows = aggregates.rows(limit)
+        stats = {name: np.round(rows[name], 2).tolist() for name in ("mean", "min", "max", "last")}
+        data = []
+        for i, stamp in enumerate(np.datetime_as_string(rows["keys"], unit="s").tolist()):
+            point = {"timestamp": stamp + "Z", "count": int(rows["count"][i])}
+            for j, variable in enumerate(HIGHFREQ_VARIABLES):
+                # La dirección es circular: solo media vectorial y último valor
+                names = ("mean", "last") if variable == "windDirection" else stats
+                point[variable] = {name: stats[name][i][j] for name in names}
+            data.append(point)
+    
+    return {
+        "location": location.dict(),
+        "resolution": resolution,
+        "variables": HIGHFREQ_VARIABLES,
+        "data": data,
+        "lastUpdated": fleet.updated_at.isoformat() + "Z"
+    }
+
+
 @app.get("/api/v1/locations/{location_id}/analytics", response_model=AnalyticsResponse)
 async def get_analytics(
     location_id: str,
@@ -308,23 +832,35 @@ async def get_analytics(
     startDate: str = None,
     endDate: str = None
 ):
-    """Obtener análisis histórico y estadísticas"""
-    if location_id != DEFAULT_LOCATION.id:
-        raise HTTPException(status_code=404, detail="Ubicación no encontrada")
+    """
+    Obtener análisis histórico y estadísticas
     
-    analytics = simulator.generate_analytics(months=6)
+    - **period**: monthly (últimos 6 meses) o daily (últimos 30 días)
+    - **startDate** / **endDate**: Rango opcional de fechas
     
-    now = datetime.utcnow()
-    start = (now - timedelta(days=180)).strftime("%Y-%m-%d")
-    end = now.strftime("%Y-%m-%d")
+    Se responde desde los rollups diarios y mensuales precalculados, por lo que la
+    latencia no depende de la longitud del rango.
+    """
+    location = get_location(location_id)
+    
+    if period not in ("monthly", "daily"):
+        raise HTTPException(status_code=400, detail="Período inválido. Valores válidos: monthly, daily")
+    
+    start = _parse_date_param(startDate) if startDate else None
+    end = _parse_date_param(endDate) if endDate else None
+    limit = None if startDate else (6 if period == "monthly" else 30)
+    
+    result = history.rollups(location.id).analytics(period, start, end, limit)
+    if result is None:
+        raise HTTPException(status_code=400, detail="No hay datos históricos para el rango solicitado")
     
     return AnalyticsResponse(
-        location=DEFAULT_LOCATION,
+        location=location,
         period=period,
-        dateRange={"start": start, "end": end},
-        temperature=analytics["temperature"],
-        precipitation=analytics["precipitation"],
-        wind=analytics["wind"],
+        dateRange=result["dateRange"],
+        temperature=result["temperature"],
+        precipitation=result["precipitation"],
+        wind=result["wind"],
         lastUpdated=datetime.utcnow().isoformat() + "Z"
     )
 
@@ -334,19 +870,13 @@ async def get_analytics(
 @app.get("/api/v1/locations/{location_id}/charts/temperature")
 async def get_temperature_chart(location_id: str):
     """Datos para gráfico de temperatura (24h)"""
-    if location_id != DEFAULT_LOCATION.id:
-        raise HTTPException(status_code=404, detail="Ubicación no encontrada")
+    location = get_location(location_id)
     
-    historical = simulator.generate_historical_data(hours=24)
-    data = [
-        {
-            "time": point["time"],
-            "temp": point["temperature"],
-            "feels": point["feels"],
-            "soil": point["soil"]
-        }
-        for point in historical
-    ]
+    data = _chart_data(
+        history.window(location.id, 24),
+        "time",
+        {"temp": "temperature", "feels": "feels", "soil": "soil"}
+    )
     
     return {
         "data": data,
@@ -357,19 +887,13 @@ async def get_temperature_chart(location_id: str):
 @app.get("/api/v1/locations/{location_id}/charts/precipitation")
 async def get_precipitation_chart(location_id: str):
     """Datos para gráfico de precipitación y humedad"""
-    if location_id != DEFAULT_LOCATION.id:
-        raise HTTPException(status_code=404, detail="Ubicación no encontrada")
+    location = get_location(location_id)
     
-    historical = simulator.generate_historical_data(hours=24)
-    data = [
-        {
-            "hour": point["hour"],
-            "precipitation": point["precipitation"],
-            "humidity": point["humidity"],
-            "soilHumidity": point["soilHumidity"]
-        }
-        for point in historical
-    ]
+    data = _chart_data(
+        history.window(location.id, 24),
+        "hour",
+        {"precipitation": "precipitation", "humidity": "humidity", "soilHumidity": "soilHumidity"}
+    )
     
     return {
         "data": data,
@@ -380,19 +904,13 @@ async def get_precipitation_chart(location_id: str):
 @app.get("/api/v1/locations/{location_id}/charts/wind")
 async def get_wind_chart(location_id: str):
     """Datos para gráfico de viento"""
-    if location_id != DEFAULT_LOCATION.id:
-        raise HTTPException(status_code=404, detail="Ubicación no encontrada")
+    location = get_location(location_id)
     
-    historical = simulator.generate_historical_data(hours=24)
-    data = [
-        {
-            "time": point["time"],
-            "speed": point["windSpeed"],
-            "gust": point["gust"],
-            "direction": point["windDirection"]
-        }
-        for point in historical
-    ]
+    data = _chart_data(
+        history.window(location.id, 24),
+        "time",
+        {"speed": "windSpeed", "gust": "gust", "direction": "windDirection"}
+    )
     
     return {
         "data": data,
@@ -403,19 +921,13 @@ async def get_wind_chart(location_id: str):
 @app.get("/api/v1/locations/{location_id}/charts/pressure-solar")
 async def get_pressure_solar_chart(location_id: str):
     """Datos para gráfico de presión y radiación solar"""
-    if location_id != DEFAULT_LOCATION.id:
-        raise HTTPException(status_code=404, detail="Ubicación no encontrada")
+    location = get_location(location_id)
     
-    historical = simulator.generate_historical_data(hours=24)
-    data = [
-        {
-            "time": point["time"],
-            "pressure": point["pressure"],
-            "solar": point["solarRadiation"],
-            "uv": point["uvIndex"]
-        }
-        for point in historical
-    ]
+    data = _chart_data(
+        history.window(location.id, 24),
+        "time",
+        {"pressure": "pressure", "solar": "solarRadiation", "uv": "uvIndex"}
+    )
     
     return {
         "data": data,
@@ -426,20 +938,13 @@ async def get_pressure_solar_chart(location_id: str):
 @app.get("/api/v1/locations/{location_id}/charts/air-quality")
 async def get_air_quality_chart(location_id: str):
     """Datos para gráfico de calidad del aire"""
-    if location_id != DEFAULT_LOCATION.id:
-        raise HTTPException(status_code=404, detail="Ubicación no encontrada")
+    location = get_location(location_id)
     
-    historical = simulator.generate_historical_data(hours=24)
-    data = [
-        {
-            "time": point["time"],
-            "pm25": point["pm25"],
-            "pm10": point["pm10"],
-            "co2": point["co2"],
-            "o3": point["o3"]
-        }
-        for point in historical
-    ]
+    data = _chart_data(
+        history.window(location.id, 24),
+        "time",
+        {"pm25": "pm25", "pm10": "pm10", "co2": "co2", "o3": "o3"}
+    )
     
     return {
         "data": data,
@@ -450,10 +955,9 @@ async def get_air_quality_chart(location_id: str):
 @app.get("/api/v1/locations/{location_id}/charts/radar")
 async def get_radar_chart(location_id: str):
     """Datos para gráfico radar (condiciones generales)"""
-    if location_id != DEFAULT_LOCATION.id:
-        raise HTTPException(status_code=404, detail="Ubicación no encontrada")
+    location = get_location(location_id)
     
-    current = weather_state.get("current", {})
+    current = fleet.current_weather(location.id)
     temp = current.get("temperature", {}).get("air", 24)
     humidity = current.get("humidity", {}).get("relative", 68)
     wind = current.get("wind", {}).get("speed", 18)
@@ -477,101 +981,305 @@ async def get_radar_chart(location_id: str):
     }
 
 
+@app.get("/api/v1/locations/{location_id}/charts/rolling", response_model=RollingAggregatesResponse)
+async def get_rolling_chart(
+    location_id: str,
+    variables: str = "temperature",
+    hours: int = 168,
+    window: int = 24,
+    step: int = 1,
+    stats: str = "mean"
+):
+    """
+    Series suavizadas para gráficos: agregados móviles calculados en el servidor
+    
+    - **variables**: Variables separadas por coma (p. ej. temperature,pm25)
+    - **hours**: Período cubierto por la serie resultante
+    - **window**: Tamaño de la ventana en horas (en EWMA, α = 2 / (window + 1))
+    - **step**: Cada cuántas horas se emite un punto
+    - **stats**: Agregados separados por coma: mean, sum, min, max, std, ewma
+    
+    Cada punto corresponde a la ventana que termina en su timestamp. Los agregados salen
+    de sumas acumuladas y extremos por bloques sobre las columnas del historial: O(n)
+    por serie sin importar el tamaño de la ventana. La respuesta es columnar (una lista
+    de timestamps y una lista de valores por variable y agregado).
+    """
+    location = get_location(location_id)
+    
+    variable_list = [v.strip() for v in variables.split(",") if v.strip()]
+    invalid_vars = [v for v in variable_list if v not in HISTORICAL_FIELDS]
+    if not variable_list or invalid_vars:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Variables inválidas: {', '.join(invalid_vars)}. Variables válidas: {', '.join(HISTORICAL_FIELDS)}"
+        )
+    aggregates = list(dict.fromkeys(name.strip() for name in stats.split(",") if name.strip()))
+    invalid_stats = [name for name in aggregates if name not in ROLLING_AGGREGATES]
+    if not aggregates or invalid_stats:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Agregados inválidos: {', '.join(invalid_stats)}. Agregados válidos: {', '.join(ROLLING_AGGREGATES)}"
+        )
+    if hours < 1 or window < 1 or step < 1:
+        raise HTTPException(status_code=400, detail="hours, window y step deben ser al menos 1")
+    if hours + window - 1 > MAX_ANALYSIS_HOURS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El período más la ventana no puede superar {MAX_ANALYSIS_HOURS} horas"
+        )
+    
+    # Las primeras window-1 horas solo completan la primera ventana
+    frame = history.window(location.id, hours + window - 1)
+    if len(frame) < window:
+        raise HTTPException(status_code=400, detail="No hay datos históricos suficientes para la ventana")
+    
+    def build() -> Response:
+        series = {}
+        for variable in dict.fromkeys(variable_list):
+            ends, values = RollingAggregates.series(frame.values(variable), window, step, aggregates)
+            series[variable] = {name: np.round(column, 2).tolist() for name, column in values.items()}
+        return json_response(RollingAggregatesResponse(
+            location=location,
+            variables=list(series),
+            stats=aggregates,
+            window=window,
+            step=step,
+            timestamps=[stamp + "Z" for stamp in np.datetime_as_string(frame.index[ends], unit="s").tolist()],
+            series=series,
+            lastUpdated=datetime.utcnow().isoformat() + "Z"
+        ))
+    
+    return await offload(analytics.run_thread, build)
+
+
 # ==================== ESTADÍSTICAS Y REGRESIÓN ====================
 
 @app.get("/api/v1/locations/{location_id}/statistics", response_model=StatisticsResponse)
 async def get_statistics(
     location_id: str,
-    hours: int = 168  # Por defecto 7 días (168 horas)
+    hours: int = 168,  # Por defecto 7 días (168 horas)
+    exact: bool = False
 ):
     """
     Obtener estadísticas descriptivas de los datos meteorológicos
     
     - **location_id**: ID de la ubicación
-    - **hours**: Período histórico en horas (mínimo: 2, máximo: 720, default: 168 = 7 días)
+    - **hours**: Período histórico en horas (mínimo: 2, máximo: 43800 con archivo en disco, 720 sin él; default: 168 = 7 días)
     
     Retorna estadísticas descriptivas completas incluyendo:
     - Medidas de tendencia central (media, mediana, moda)
     - Medidas de dispersión (desviación estándar, varianza, rango)
     - Cuartiles y percentiles
     - Estadísticas avanzadas (asimetría, curtosis, intervalos de confianza)
+    
+    Por encima de la capacidad del buffer en memoria, los cuantiles y la moda salen
+    de histogramas de punto fijo por día y mes (exactos para variables con resolución
+    declarada; si no, sketches KLL con error MTO_SKETCH_ERROR) y los momentos de los
+    acumuladores en línea; `exact=true` recorre el historial.
     """
-    if location_id != DEFAULT_LOCATION.id:
-        raise HTTPException(status_code=404, detail="Ubicación no encontrada")
+    location = get_location(location_id)
     
     # Validar parámetros
     if hours < 2:
         raise HTTPException(status_code=400, detail="El período mínimo es de 2 horas")
-    if hours > 720:
-        raise HTTPException(status_code=400, detail="El período máximo es de 720 horas (30 días)")
-    
-    # Generar datos históricos
-    historical_data = simulator.generate_historical_data(hours=hours)
+    if hours > MAX_ANALYSIS_HOURS:
+        raise HTTPException(status_code=400, detail=f"El período máximo es de {MAX_ANALYSIS_HOURS} horas")
+    
+    if hours > HISTORY_CAPACITY_HOURS and not exact:
+        # Rango largo: O(buckets × tamaño del sketch) en lugar de O(lecturas), en el pool de hilos
+        def sketch_stats() -> Dict:
+            moments, sketch = history.aggregate_window(location.id, hours)
+            return DescriptiveStatistics.calculate_sketch_stats(moments, sketch, STATISTICS_VARIABLES)
+        
+        stats = await offload(analytics.run_thread, sketch_stats)
+    else:
+        # Leer ventana del historial almacenado
+        historical_data = history.window(location.id, hours)
+        
+        if not historical_data:
+            raise HTTPException(status_code=400, detail="No hay datos históricos disponibles")
+        
+        # Calcular estadísticas en el pool de procesos (copia: las vistas del buffer
+        # cambian con cada tick mientras la tarea espera en cola)
+        stats = await offload(
+            analytics.run_process,
+            DescriptiveStatistics.calculate_weather_statistics,
+            historical_data.copy()
+        )
     
-    if not historical_data:
+    if not stats:
         raise HTTPException(status_code=400, detail="No hay datos históricos disponibles")
     
-    # Calcular estadísticas
-    stats = DescriptiveStatistics.calculate_weather_statistics(historical_data)
-    
-    # Convertir a formato de respuesta
-    statistics_dict = {}
-    for var_name, var_stats in stats.items():
-        from models import VariableStatistics, ConfidenceInterval
+    # Convertir a formato de respuesta y serializar en el pool de hilos
+    def build() -> Response:
+        statistics_dict = {}
+        for var_name, var_stats in stats.items():
+            from models import VariableStatistics, ConfidenceInterval
         
-        ci_data = var_stats.get("confidenceInterval95", {})
-        ci = None
-        if ci_data:
-            ci = ConfidenceInterval(
-                lower=ci_data.get("lower", 0),
-                upper=ci_data.get("upper", 0),
-                margin=ci_data.get("margin", 0)
+            ci_data = var_stats.get("confidenceInterval95", {})
+            ci = None
+            if ci_data:
+                ci = ConfidenceInterval(
+                    lower=ci_data.get("lower", 0),
+                    upper=ci_data.get("upper", 0),
+                    margin=ci_data.get("margin", 0)
+                )
+        
+            statistics_dict[var_name] = VariableStatistics(
+                count=var_stats.get("count", 0),
+                mean=var_stats.get("mean", 0),
+                median=var_stats.get("median", 0),
+                mode=var_stats.get("mode", 0),
+                stdDev=var_stats.get("stdDev", 0),
+                variance=var_stats.get("variance", 0),
+                min=var_stats.get("min", 0),
+                max=var_stats.get("max", 0),
+                range=var_stats.get("range", 0),
+                q1=var_stats.get("q1", 0),
+                q2=var_stats.get("q2", 0),
+                q3=var_stats.get("q3", 0),
+                iqr=var_stats.get("iqr", 0),
+                p10=var_stats.get("p10", 0),
+                p90=var_stats.get("p90", 0),
+                p95=var_stats.get("p95", 0),
+                p99=var_stats.get("p99", 0),
+                coefficientOfVariation=var_stats.get("coefficientOfVariation", 0),
+                skewness=var_stats.get("skewness"),
+                kurtosis=var_stats.get("kurtosis"),
+                standardError=var_stats.get("standardError"),
+                confidenceInterval95=ci
             )
         
-        statistics_dict[var_name] = VariableStatistics(
-            count=var_stats.get("count", 0),
-            mean=var_stats.get("mean", 0),
-            median=var_stats.get("median", 0),
-            mode=var_stats.get("mode", 0),
-            stdDev=var_stats.get("stdDev", 0),
-            variance=var_stats.get("variance", 0),
-            min=var_stats.get("min", 0),
-            max=var_stats.get("max", 0),
-            range=var_stats.get("range", 0),
-            q1=var_stats.get("q1", 0),
-            q2=var_stats.get("q2", 0),
-            q3=var_stats.get("q3", 0),
-            iqr=var_stats.get("iqr", 0),
-            p10=var_stats.get("p10", 0),
-            p90=var_stats.get("p90", 0),
-            p95=var_stats.get("p95", 0),
-            p99=var_stats.get("p99", 0),
-            coefficientOfVariation=var_stats.get("coefficientOfVariation", 0),
-            skewness=var_stats.get("skewness"),
-            kurtosis=var_stats.get("kurtosis"),
-            standardError=var_stats.get("standardError"),
-            confidenceInterval95=ci
-        )
+        now = datetime.utcnow()
+        start_date = (now - timedelta(hours=hours)).strftime("%Y-%m-%d")
+        end_date = now.strftime("%Y-%m-%d")
+        
+        return json_response(StatisticsResponse(
+            location=location,
+            period=f"{hours}h",
+            dateRange={"start": start_date, "end": end_date},
+            statistics=statistics_dict,
+            lastUpdated=datetime.utcnow().isoformat() + "Z"
+        ))
+        
+    return await offload(analytics.run_thread, build)
+
+
+@app.get("/api/v1/locations/{location_id}/statistics/online", response_model=OnlineStatisticsResponse)
+async def get_online_statistics(location_id: str, days: int = None):
+    """
+    Obtener estadísticas basadas en momentos desde acumuladores en línea
+    
+    - **days**: Ventana de N días calendario (incluido el actual); sin valor, todo lo
+      cargado desde el arranque
+    
+    Los acumuladores se actualizan en O(1) con cada hora completa, por lo que la
+    respuesta no recorre el historial. No incluye cuantiles, mediana ni moda.
+    """
+    location = get_location(location_id)
     
-    now = datetime.utcnow()
-    start_date = (now - timedelta(hours=hours)).strftime("%Y-%m-%d")
-    end_date = now.strftime("%Y-%m-%d")
+    if days is not None and days < 1:
+        raise HTTPException(status_code=400, detail="El período mínimo es de 1 día")
+    
+    moments = history.moments(location.id)
+    if days is None:
+        accumulator = moments.total
+    else:
+        accumulator = moments.window(days, np.datetime64(fleet.updated_at, "D"))
+    
+    statistics = accumulator.summary(moments.variables)
+    if not statistics:
+        raise HTTPException(status_code=400, detail="No hay datos históricos disponibles")
     
-    return StatisticsResponse(
-        location=DEFAULT_LOCATION,
-        period=f"{hours}h",
-        dateRange={"start": start_date, "end": end_date},
-        statistics=statistics_dict,
+    return OnlineStatisticsResponse(
+        location=location,
+        period=f"{days}d" if days is not None else "startup",
+        statistics=statistics,
         lastUpdated=datetime.utcnow().isoformat() + "Z"
     )
 
 
+@app.get("/api/v1/locations/{location_id}/statistics/rolling", response_model=RollingStatisticsResponse)
+async def get_rolling_statistics(
+    location_id: str,
+    variable: str = "temperature",
+    hours: int = 168,
+    window: int = 24,
+    step: int = 1,
+    quantiles: str = "0.5,0.9"
+):
+    """
+    Obtener cuantiles móviles (mediana, p90, etc.) de una variable
+    
+    - **variable**: Variable a analizar (p. ej. temperature, pm25)
+    - **hours**: Período cubierto por la serie resultante
+    - **window**: Tamaño de la ventana en horas (p. ej. 24 para la mediana móvil diaria)
+    - **step**: Cada cuántas horas se emite un punto
+    - **quantiles**: Niveles separados por coma entre 0 y 1 (p. ej. 0.5,0.9)
+    
+    Cada punto corresponde a la ventana que termina en su timestamp. La ventana se
+    mantiene ordenada en un skiplist indexable: O(log w) por hora en lugar de
+    reordenar la ventana completa en cada posición.
+    """
+    location = get_location(location_id)
+    
+    if variable not in STATISTICS_VARIABLES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Variable inválida. Variables válidas: {', '.join(STATISTICS_VARIABLES)}"
+        )
+    if hours < 1 or window < 1 or step < 1:
+        raise HTTPException(status_code=400, detail="hours, window y step deben ser al menos 1")
+    if hours + window - 1 > MAX_ANALYSIS_HOURS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El período más la ventana no puede superar {MAX_ANALYSIS_HOURS} horas"
+        )
+    try:
+        levels = [float(level) for level in quantiles.split(",") if level.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cuantiles inválidos. Ejemplo: 0.5,0.9")
+    if not levels or not all(0 <= level <= 1 for level in levels):
+        raise HTTPException(status_code=400, detail="Los cuantiles deben estar entre 0 y 1")
+    
+    # Las primeras window-1 horas solo completan la primera ventana
+    frame = history.window(location.id, hours + window - 1)
+    if len(frame) < window:
+        raise HTTPException(status_code=400, detail="No hay datos históricos suficientes para la ventana")
+    
+    ends, values = await offload(
+        analytics.run_process,
+        RollingQuantiles.series,
+        frame.values(variable).copy(), window, step, levels
+    )
+    stamps = frame.index[ends]
+    
+    def build() -> Response:
+        labels = [f"p{level * 100:g}" for level in levels]
+        data = [
+            {"timestamp": stamp + "Z", "quantiles": dict(zip(labels, row))}
+            for stamp, row in zip(np.datetime_as_string(stamps, unit="s").tolist(), np.round(values, 2).tolist())
+        ]
+        return json_response(RollingStatisticsResponse(
+            location=location,
+            variable=variable,
+            window=window,
+            step=step,
+            quantiles=levels,
+            data=data,
+            lastUpdated=datetime.utcnow().isoformat() + "Z"
+        ))
+    
+    return await offload(analytics.run_thread, build)
+
+
 @app.get("/api/v1/locations/{location_id}/predictions/regression", response_model=RegressionResponse)
 async def get_regression_predictions(
     location_id: str,
     hours: int = 24,
     hours_ahead: int = 24,
-    variables: str = "temperature,humidity,windSpeed,pressure"
+    variables: str = "temperature,humidity,windSpeed,pressure",
+    model: str = "linear"
 ):
     """
     Obtener predicciones usando regresión lineal para múltiples variables
@@ -580,14 +1288,15 @@ async def get_regression_predictions(
     - **hours**: Datos históricos a usar para entrenar el modelo (mínimo: 2, máximo: 168, default: 24)
     - **hours_ahead**: Horas futuras a predecir (mínimo: 1, máximo: 72, default: 24)
     - **variables**: Variables a predecir separadas por coma (temperature, humidity, windSpeed, pressure, precipitation)
+    - **model**: `linear` (default, tendencia sobre las últimas `hours` horas) o `harmonic`
+      (tendencia más ciclo diario desde la tabla de pronósticos de la flota; `hours` no aplica)
     
     Retorna predicciones con:
     - Valores predichos para cada hora futura
     - Intervalos de confianza al 95%
     - Métricas del modelo (R², RMSE, MAE, MSE)
     """
-    if location_id != DEFAULT_LOCATION.id:
-        raise HTTPException(status_code=404, detail="Ubicación no encontrada")
+    location = get_location(location_id)
     
     # Validar parámetros
     if hours < 2:
@@ -598,12 +1307,7 @@ async def get_regression_predictions(
         raise HTTPException(status_code=400, detail="Debe predecir al menos 1 hora adelante")
     if hours_ahead > 72:
         raise HTTPException(status_code=400, detail="El máximo de horas a predecir es 72 (3 días)")
-    
-    # Generar datos históricos
-    historical_data = simulator.generate_historical_data(hours=hours)
-    
-    if not historical_data or len(historical_data) < 2:
-        raise HTTPException(status_code=400, detail="Datos insuficientes para realizar predicción")
+    validate_regression_model(model, hours_ahead)
     
     # Parsear variables y validar
     variable_list = [v.strip() for v in variables.split(",") if v.strip()]
@@ -619,59 +1323,7 @@ async def get_regression_predictions(
         raise HTTPException(status_code=400, detail="Debe especificar al menos una variable")
     
     # Realizar predicciones para cada variable
-    predictions = LinearRegressionPredictor.predict_multiple_variables(
-        historical_data,
-        variable_list,
-        hours_ahead
-    )
-    
-    # Convertir a formato de respuesta
-    from models import VariableRegressionResult, RegressionModel, RegressionPrediction
-    
-    variables_dict = {}
-    for var_name, pred_result in predictions.items():
-        if "error" in pred_result:
-            variables_dict[var_name] = VariableRegressionResult(
-                variable=var_name,
-                model=RegressionModel(
-                    type="linear_regression",
-                    coefficient=0,
-                    intercept=0,
-                    r2=0,
-                    rmse=0,
-                    mae=0,
-                    mse=0
-                ),
-                predictions=[],
-                dataPoints=0,
-                hoursAhead=hours_ahead,
-                error=pred_result.get("error")
-            )
-        else:
-            model_data = pred_result.get("model", {})
-            variables_dict[var_name] = VariableRegressionResult(
-                variable=var_name,
-                model=RegressionModel(
-                    type=model_data.get("type", "linear_regression"),
-                    coefficient=model_data.get("coefficient", 0),
-                    intercept=model_data.get("intercept", 0),
-                    r2=model_data.get("r2", 0),
-                    rmse=model_data.get("rmse", 0),
-                    mae=model_data.get("mae", 0),
-                    mse=model_data.get("mse", 0)
-                ),
-                predictions=[
-                    RegressionPrediction(**pred) for pred in pred_result.get("predictions", [])
-                ],
-                dataPoints=pred_result.get("dataPoints", 0),
-                hoursAhead=pred_result.get("hoursAhead", hours_ahead)
-            )
-    
-    return RegressionResponse(
-        location=DEFAULT_LOCATION,
-        variables=variables_dict,
-        lastUpdated=datetime.utcnow().isoformat() + "Z"
-    )
+    return await regression_predictions(location, variable_list, hours, hours_ahead, model)
 
 
 @app.get("/api/v1/locations/{location_id}/predictions/regression/{variable}", response_model=RegressionResponse)
@@ -679,7 +1331,8 @@ async def get_single_variable_regression(
     location_id: str,
     variable: str,
     hours: int = 24,
-    hours_ahead: int = 24
+    hours_ahead: int = 24,
+    model: str = "linear"
 ):
     """
     Obtener predicción de regresión lineal para una variable específica
@@ -688,9 +1341,9 @@ async def get_single_variable_regression(
     - **variable**: Variable a predecir (temperature, humidity, windSpeed, pressure, precipitation, etc.)
     - **hours**: Datos históricos a usar (mínimo: 2, máximo: 168, default: 24)
     - **hours_ahead**: Horas futuras a predecir (mínimo: 1, máximo: 72, default: 24)
+    - **model**: `linear` (default) o `harmonic` (tabla de pronósticos de la flota)
     """
-    if location_id != DEFAULT_LOCATION.id:
-        raise HTTPException(status_code=404, detail="Ubicación no encontrada")
+    location = get_location(location_id)
     
     # Validar variable
     valid_variables = ["temperature", "humidity", "windSpeed", "pressure", "precipitation", "solarRadiation", "uvIndex", "pm25", "pm10"]
@@ -709,116 +1362,93 @@ async def get_single_variable_regression(
         raise HTTPException(status_code=400, detail="Debe predecir al menos 1 hora adelante")
     if hours_ahead > 72:
         raise HTTPException(status_code=400, detail="El máximo de horas a predecir es 72 (3 días)")
-    
-    # Generar datos históricos
-    historical_data = simulator.generate_historical_data(hours=hours)
-    
-    if not historical_data or len(historical_data) < 2:
-        raise HTTPException(status_code=400, detail="Datos insuficientes para realizar predicción")
+    validate_regression_model(model, hours_ahead)
     
     # Realizar predicción
-    prediction = LinearRegressionPredictor.predict_future(
-        historical_data,
-        variable,
-        hours_ahead
-    )
-    
-    # Convertir a formato de respuesta
-    from models import VariableRegressionResult, RegressionModel, RegressionPrediction
-    
-    if "error" in prediction:
-        variables_dict = {
-            variable: VariableRegressionResult(
-                variable=variable,
-                model=RegressionModel(
-                    type="linear_regression",
-                    coefficient=0,
-                    intercept=0,
-                    r2=0,
-                    rmse=0,
-                    mae=0,
-                    mse=0
-                ),
-                predictions=[],
-                dataPoints=0,
-                hoursAhead=hours_ahead,
-                error=prediction.get("error")
-            )
-        }
-    else:
-        model_data = prediction.get("model", {})
-        variables_dict = {
-            variable: VariableRegressionResult(
-                variable=variable,
-                model=RegressionModel(
-                    type=model_data.get("type", "linear_regression"),
-                    coefficient=model_data.get("coefficient", 0),
-                    intercept=model_data.get("intercept", 0),
-                    r2=model_data.get("r2", 0),
-                    rmse=model_data.get("rmse", 0),
-                    mae=model_data.get("mae", 0),
-                    mse=model_data.get("mse", 0)
-                ),
-                predictions=[
-                    RegressionPrediction(**pred) for pred in prediction.get("predictions", [])
-                ],
-                dataPoints=prediction.get("dataPoints", 0),
-                hoursAhead=prediction.get("hoursAhead", hours_ahead)
-            )
-        }
-    
-    return RegressionResponse(
-        location=DEFAULT_LOCATION,
-        variables=variables_dict,
-        lastUpdated=datetime.utcnow().isoformat() + "Z"
-    )
+    return await regression_predictions(location, [variable], hours, hours_ahead, model)
 
 
 @app.get("/api/v1/locations/{location_id}/correlation", response_model=CorrelationMatrixResponse)
 async def get_correlation_matrix(
     location_id: str,
-    hours: int = 168  # Por defecto 7 días
+    hours: int = 168,  # Por defecto 7 días
+    variables: str = None,
+    method: str = "pearson",
+    lags: int = 0
 ):
     """
     Obtener matriz de correlación entre variables meteorológicas
     
     - **location_id**: ID de la ubicación
-    - **hours**: Período histórico en horas (mínimo: 2, máximo: 720, default: 168 = 7 días)
+    - **hours**: Período histórico en horas (mínimo: 2, máximo: 43800 con archivo en disco, 720 sin él; default: 168 = 7 días)
+    - **variables**: Variables separadas por coma, o `all` para todos los campos numéricos
+      (por defecto: temperature, humidity, windSpeed, pressure, precipitation)
+    - **method**: `pearson` (default) o `spearman` (por rangos)
+    - **lags**: Desfase máximo en horas (0-48) para la correlación cruzada de cada par
     
-    Retorna una matriz de correlación de Pearson entre todas las variables meteorológicas.
+    Retorna una matriz de correlación entre las variables meteorológicas.
     Los valores van de -1 a 1:
     - 1: Correlación positiva perfecta
     - 0: Sin correlación
     - -1: Correlación negativa perfecta
+    
+    Con `lags`, `lagged[a][b][k]` es la correlación entre a(t) y b(t + lags[k]).
     """
-    if location_id != DEFAULT_LOCATION.id:
-        raise HTTPException(status_code=404, detail="Ubicación no encontrada")
+    location = get_location(location_id)
     
     # Validar parámetros
     if hours < 2:
         raise HTTPException(status_code=400, detail="El período mínimo es de 2 horas")
-    if hours > 720:
-        raise HTTPException(status_code=400, detail="El período máximo es de 720 horas (30 días)")
+    if hours > MAX_ANALYSIS_HOURS:
+        raise HTTPException(status_code=400, detail=f"El período máximo es de {MAX_ANALYSIS_HOURS} horas")
+    if method not in ("pearson", "spearman"):
+        raise HTTPException(status_code=400, detail="Método inválido. Valores válidos: pearson, spearman")
+    if not 0 <= lags <= MAX_CORRELATION_LAG:
+        raise HTTPException(status_code=400, detail=f"El desfase debe estar entre 0 y {MAX_CORRELATION_LAG} horas")
+    
+    if variables is None:
+        variable_list = None
+    elif variables.strip() == "all":
+        variable_list = list(HISTORICAL_FIELDS)
+    else:
+        variable_list = [v.strip() for v in variables.split(",") if v.strip()]
+        invalid_vars = [v for v in variable_list if v not in HISTORICAL_FIELDS]
+        if invalid_vars:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Variables inválidas: {', '.join(invalid_vars)}. Variables válidas: {', '.join(HISTORICAL_FIELDS)}"
+            )
     
-    # Generar datos históricos
-    historical_data = simulator.generate_historical_data(hours=hours)
+    # Leer ventana del historial almacenado
+    historical_data = history.window(location.id, hours)
     
     if not historical_data or len(historical_data) < 2:
         raise HTTPException(status_code=400, detail="Datos insuficientes para calcular correlación")
     
-    # Calcular matriz de correlación
-    correlation_result = CorrelationAnalysis.calculate_correlation_matrix(historical_data)
-    
-    if not correlation_result:
-        raise HTTPException(status_code=400, detail="No se pudo calcular la matriz de correlación")
+    # Calcular matriz de correlación en el pool de hilos (NumPy libera el GIL);
+    # la copia evita que el tick modifique la ventana durante el cálculo
+    frame = historical_data.copy()
     
-    return CorrelationMatrixResponse(
-        location=DEFAULT_LOCATION,
-        matrix=correlation_result.get("matrix", {}),
-        variables=correlation_result.get("variables", []),
-        dataPoints=correlation_result.get("dataPoints", 0),
-        lastUpdated=datetime.utcnow().isoformat() + "Z"
-    )
+    def build() -> Response:
+        correlation_result = CorrelationAnalysis.calculate_correlation_matrix(
+            frame, variable_list, method, lags
+        )
+        
+        if not correlation_result:
+            raise HTTPException(status_code=400, detail="No se pudo calcular la matriz de correlación")
+        
+        return json_response(CorrelationMatrixResponse(
+            location=location,
+            matrix=correlation_result.get("matrix", {}),
+            variables=correlation_result.get("variables", []),
+            dataPoints=correlation_result.get("dataPoints", 0),
+            method=correlation_result.get("method", method),
+            lags=correlation_result.get("lags"),
+            lagged=correlation_result.get("lagged"),
+            lastUpdated=datetime.utcnow().isoformat() + "Z"
+        ))
+    
+    return await offload(analytics.run_thread, build)
 
 
 # ==================== WEBSOCKET ====================
@@ -826,15 +1456,21 @@ async def get_correlation_matrix(
 @app.websocket("/ws/locations/{location_id}/realtime")
 async def websocket_endpoint(websocket: WebSocket, location_id: str):
     """WebSocket para actualizaciones en tiempo real"""
+    location = registry.get(location_id)
+    if location is None:
+        await websocket.close(code=1008)
+        return
+    
     await websocket.accept()
-    active_connections.append(websocket)
+    connections = active_connections.setdefault(location_id, [])
+    connections.append(websocket)
     
     try:
         # Enviar estado actual inmediatamente
         message = {
             "type": "current_weather_update",
             "locationId": location_id,
-            "data": weather_state.get("current", {}),
+            "data": current_state(location)["current"],
             "timestamp": datetime.utcnow().isoformat() + "Z"
         }
         await websocket.send_json(message)
@@ -844,11 +1480,11 @@ async def websocket_endpoint(websocket: WebSocket, location_id: str):
             await websocket.receive_text()
             
     except WebSocketDisconnect:
-        active_connections.remove(websocket)
+        connections.remove(websocket)
     except Exception as e:
         print(f"Error en WebSocket: {e}")
-        if websocket in active_connections:
-            active_connections.remove(websocket)
+        if websocket in connections:
+            connections.remove(websocket)
 
 
 if __name__ == "__main__":
@@ -3,7 +3,7 @@ Modelos Pydantic para validación de datos
 """
 
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Union
 from datetime import datetime
 
 
@@ -130,6 +130,35 @@ class AlertsResponse(BaseModel):
     lastUpdated: str
 
 
+class Anomaly(BaseModel):
+    id: str
+    variable: str
+    value: float
+    expected: float
+    zScore: float
+    robustZScore: float
+    direction: str
+    severity: str
+    timestamp: str
+
+
+class AnomalyScore(BaseModel):
+    value: float
+    mean: float
+    stdDev: float
+    zScore: Optional[float] = None
+    robustZScore: Optional[float] = None
+    anomalous: bool
+
+
+class AnomaliesResponse(BaseModel):
+    location: Location
+    threshold: float
+    scores: Dict[str, AnomalyScore]
+    anomalies: List[Anomaly]
+    lastUpdated: str
+
+
 class Prediction(BaseModel):
     date: str
     model: str
@@ -156,15 +185,19 @@ class HistoricalDataPoint(BaseModel):
     pressure: float
     precipitation: float
     solarRadiation: Optional[float] = None
-    uvIndex: Optional[int] = None
+    uvIndex: Optional[Union[int, float]] = None
     pm25: Optional[float] = None
     pm10: Optional[float] = None
-    co2: Optional[int] = None
+    co2: Optional[Union[int, float]] = None
     o3: Optional[float] = None
     feels: Optional[float] = None
     soil: Optional[float] = None
     soilHumidity: Optional[float] = None
     gust: Optional[float] = None
+    # Solo en datos remuestreados (interval daily o weekly)
+    count: Optional[int] = None
+    min: Optional[Dict[str, float]] = None
+    max: Optional[Dict[str, float]] = None
 
 
 class HistoricalResponse(BaseModel):
@@ -223,6 +256,54 @@ class StatisticsResponse(BaseModel):
     lastUpdated: str
 
 
+class MomentStatistics(BaseModel):
+    count: int
+    mean: float
+    stdDev: float
+    variance: float
+    min: float
+    max: float
+    range: float
+    coefficientOfVariation: float
+    skewness: float
+    kurtosis: float
+    standardError: float
+    confidenceInterval95: ConfidenceInterval
+
+
+class OnlineStatisticsResponse(BaseModel):
+    location: Location
+    period: str
+    statistics: Dict[str, MomentStatistics]
+    lastUpdated: str
+
+
+class RollingStatisticsPoint(BaseModel):
+    timestamp: str
+    quantiles: Dict[str, float]
+
+
+class RollingStatisticsResponse(BaseModel):
+    location: Location
+    variable: str
+    window: int
+    step: int
+    quantiles: List[float]
+    data: List[RollingStatisticsPoint]
+    lastUpdated: str
+
+
+class RollingAggregatesResponse(BaseModel):
+    location: Location
+    variables: List[str]
+    stats: List[str]
+    window: int
+    step: int
+    timestamps: List[str]
+    series: Dict[str, Dict[str, List[float]]]
+    lastUpdated: str
+
+
 class RegressionModel(BaseModel):
     type: str
     coefficient: float
@@ -237,9 +318,9 @@ class RegressionPrediction(BaseModel):
     timestamp: str
     time: str
     datetime: str
-    predicted: float
-    lowerBound: float
-    upperBound: float
+    predicted: Optional[float]
+    lowerBound: Optional[float]
+    upperBound: Optional[float]
     confidence: int
 
 
@@ -263,5 +344,8 @@ class CorrelationMatrixResponse(BaseModel):
     matrix: Dict[str, Dict[str, float]]
     variables: List[str]
     dataPoints: int
+    method: str = "pearson"
+    lags: Optional[List[int]] = None
+    lagged: Optional[Dict[str, Dict[str, List[float]]]] = None
     lastUpdated: str
 
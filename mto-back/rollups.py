@@ -0,0 +1,251 @@
+"""
+Agregados Precalculados (Rollups)
+Pirámide hora -> día -> mes mantenida incrementalmente al completarse cada hora
+"""
+
+from typing import Dict, Optional
+import numpy as np
+from datetime import datetime
+
+from timeseries import FIELD_SPECS, TimeSeriesFrame
+
+
+ROLLUP_VARIABLES = list(FIELD_SPECS)
+
+# Sectores de la rosa de vientos (mismo criterio que el simulador: dirección // 45)
+WIND_SECTORS = ["N", "NE", "E", "SE", "S", "SO", "O", "NO"]
+
+
+class RollupTier:
+    """
+    Agregados por bucket temporal (día o mes) para todas las variables:
+    count, sum, min, max y suma de cuadrados, más la rosa de vientos por sector.
+    """
+
+    def __init__(self, unit: str, initial_capacity: int = 64):
+        self.unit = unit
+        self.size = 0
+        self._rows: Dict[np.datetime64, int] = {}
+        self.keys = np.empty(initial_capacity, dtype=f"datetime64[{unit}]")
+        self.count = np.zeros(initial_capacity, dtype=np.int64)
+        shape = (initial_capacity, len(ROLLUP_VARIABLES))
+        self.sum = np.zeros(shape)
+        self.sumsq = np.zeros(shape)
+        self.min = np.full(shape, np.inf)
+        self.max = np.full(shape, -np.inf)
+        self.sector_count = np.zeros((initial_capacity, len(WIND_SECTORS)), dtype=np.int64)
+        self.sector_speed = np.zeros((initial_capacity, len(WIND_SECTORS)))
+
+    def _grow(self) -> None:
+        """Duplica la capacidad de los arreglos"""
+        capacity = 2 * len(self.keys)
+        self.keys = np.resize(self.keys, capacity)
+        for name, fill in [("count", 0), ("sum", 0.0), ("sumsq", 0.0), ("min", np.inf),
+                           ("max", -np.inf), ("sector_count", 0), ("sector_speed", 0.0)]:
+            old = getattr(self, name)
+            new = np.full((capacity,) + old.shape[1:], fill, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _row(self, key: np.datetime64) -> int:
+        """Fila del bucket, creándola si no existe"""
+        row = self._rows.get(key)
+        if row is None:
+            if self.size == len(self.keys):
+                self._grow()
+            row = self.size
+            self.keys[row] = key
+            self._rows[key] = row
+            self.size += 1
+        return row
+
+    def add(self, frame: TimeSeriesFrame) -> None:
+        """Acumula las horas del frame en sus buckets (O(horas))"""
+        if len(frame) == 0:
+            return
+
+        keys = frame.index.astype(f"datetime64[{self.unit}]")
+        unique, inverse = np.unique(keys, return_inverse=True)
+        target = np.array([self._row(key) for key in unique])[inverse]
+
+        values = np.column_stack([frame.values(name) for name in ROLLUP_VARIABLES])
+        np.add.at(self.count, target, 1)
+        np.add.at(self.sum, target, values)
+        np.add.at(self.sumsq, target, values * values)
+        np.minimum.at(self.min, target, values)
+        np.maximum.at(self.max, target, values)
+
+        sector = (frame["windDirection"].astype(np.int64) // 45) % len(WIND_SECTORS)
+        np.add.at(self.sector_count, (target, sector), 1)
+        np.add.at(self.sector_speed, (target, sector), frame.values("windSpeed"))
+
+    def reset(self, keys: np.ndarray) -> None:
+        """Vacía los buckets indicados (para volver a acumularlos)"""
+        rows = [self._rows[key] for key in keys.astype(f"datetime64[{self.unit}]") if key in self._rows]
+        self.count[rows] = 0
+        self.sum[rows] = 0.0
+        self.sumsq[rows] = 0.0
+        self.min[rows] = np.inf
+        self.max[rows] = -np.inf
+        self.sector_count[rows] = 0
+        self.sector_speed[rows] = 0.0
+
+    def combine(self, key: np.datetime64, rows: Dict[str, np.ndarray]) -> None:
+        """Acumula en el bucket `key` los buckets de `rows` (p. ej. los días de un mes)"""
+        if len(rows["keys"]) == 0:
+            return
+        row = self._row(np.datetime64(key, self.unit))
+        self.count[row] += rows["count"].sum()
+        self.sum[row] += rows["sum"].sum(axis=0)
+        self.sumsq[row] += rows["sumsq"].sum(axis=0)
+        self.min[row] = np.minimum(self.min[row], rows["min"].min(axis=0))
+        self.max[row] = np.maximum(self.max[row], rows["max"].max(axis=0))
+        self.sector_count[row] += rows["sector_count"].sum(axis=0)
+        self.sector_speed[row] += rows["sector_speed"].sum(axis=0)
+
+    def counts(self, keys: np.ndarray) -> np.ndarray:
+        """Horas acumuladas en cada bucket indicado (0 si no existe)"""
+        rows = self._rows
+        return np.array(
+            [self.count[rows[key]] if key in rows else 0 for key in keys.astype(f"datetime64[{self.unit}]")],
+            dtype=np.int64
+        )
+
+    def rows(self, start: Optional[np.datetime64] = None, end: Optional[np.datetime64] = None) -> Dict[str, np.ndarray]:
+        """Buckets con clave en [start, end], ordenados por fecha"""
+        keys = self.keys[:self.size]
+        mask = np.ones(self.size, dtype=bool)
+        if start is not None:
+            mask &= keys >= np.datetime64(start, self.unit)
+        if end is not None:
+            mask &= keys <= np.datetime64(end, self.unit)
+
+        selected = np.nonzero(mask)[0]
+        selected = selected[np.argsort(keys[selected])]
+        return {
+            "keys": keys[selected],
+            "count": self.count[selected],
+            "sum": self.sum[selected],
+            "sumsq": self.sumsq[selected],
+            "min": self.min[selected],
+            "max": self.max[selected],
+            "sector_count": self.sector_count[selected],
+            "sector_speed": self.sector_speed[selected]
+        }
+
+
+class RollupPyramid:
+    """Rollups diarios y mensuales de una estación"""
+
+    def __init__(self):
+        self.daily = RollupTier("D")
+        self.monthly = RollupTier("M")
+
+    def add(self, frame: TimeSeriesFrame) -> None:
+        """Incorpora horas completas a todos los niveles"""
+        self.daily.add(frame)
+        self.monthly.add(frame)
+
+    def rebuild(self, frame: TimeSeriesFrame) -> None:
+        """
+        Recalcula los días que toca el frame, que debe contener todas sus horas (p. ej.
+        tras reemplazar lecturas ingeridas), y los meses de esos días a partir de sus
+        buckets diarios: las horas de un mes que ya no están almacenadas se conservan.
+        """
+        days = np.unique(frame.index.astype("datetime64[D]"))
+        self.daily.reset(days)
+        self.daily.add(frame)
+        months = np.unique(days.astype("datetime64[M]"))
+        self.monthly.reset(months)
+        for month in months:
+            self.monthly.combine(month, self.daily.rows(month, (month + 1).astype("datetime64[D]") - 1))
+
+    @staticmethod
+    def variable(name: str) -> int:
+        """Columna de una variable en los arreglos de agregados"""
+        return ROLLUP_VARIABLES.index(name)
+
+    def analytics(
+        self,
+        period: str = "monthly",
+        start: Optional[np.datetime64] = None,
+        end: Optional[np.datetime64] = None,
+        limit: Optional[int] = None
+    ) -> Optional[Dict]:
+        """
+        Análisis histórico (temperatura, precipitación y rosa de vientos) a partir de
+        los buckets precalculados, sin recorrer las horas originales.
+        """
+        tier = self.monthly if period == "monthly" else self.daily
+        rows = tier.rows(start, end)
+        if limit:
+            rows = {name: values[-limit:] for name, values in rows.items()}
+        if len(rows["keys"]) == 0:
+            return None
+
+        t = self.variable("temperature")
+        p = self.variable("precipitation")
+        averages = rows["sum"][:, t] / rows["count"]
+        precipitation = rows["sum"][:, p]
+
+        # Días con lluvia: del nivel diario, agrupados por mes si corresponde
+        if period == "monthly":
+            last_day = (rows["keys"][-1] + 1).astype("datetime64[D]") - 1
+            daily = self.daily.rows(rows["keys"][0], last_day)
+            rainy_months = daily["keys"][daily["sum"][:, p] > 0].astype("datetime64[M]")
+            rain_days = np.searchsorted(rainy_months, rows["keys"], side="right") - \
+                np.searchsorted(rainy_months, rows["keys"], side="left")
+            date_format, label_format = "%Y-%m", "%b"
+        else:
+            rain_days = (precipitation > 0).astype(np.int64)
+            date_format, label_format = "%Y-%m-%d", "%d %b"
+
+        records = []
+        for i, key in enumerate(rows["keys"]):
+            moment = key.astype("datetime64[D]").astype(datetime)
+            records.append({
+                "date": moment.strftime(date_format),
+                "month": moment.strftime(label_format),
+                "avg": round(float(averages[i]), 1),
+                "max": round(float(rows["max"][i, t]), 1),
+                "min": round(float(rows["min"][i, t]), 1),
+                "precipitation": round(float(precipitation[i]), 1),
+                "days": int(rain_days[i])
+            })
+
+        # Rosa de vientos del período
+        sector_count = rows["sector_count"].sum(axis=0)
+        sector_speed = rows["sector_speed"].sum(axis=0)
+        total = max(1, int(sector_count.sum()))
+        wind_frequency = [
+            {
+                "direction": direction,
+                "frequency": round(100.0 * sector_count[i] / total, 1),
+                "avgSpeed": round(float(sector_speed[i] / sector_count[i]), 1) if sector_count[i] else 0.0
+            }
+            for i, direction in enumerate(WIND_SECTORS)
+        ]
+        wind_speed = self.variable("windSpeed")
+
+        return {
+            "dateRange": {
+                "start": records[0]["date"],
+                "end": records[-1]["date"]
+            },
+            "temperature": {
+                "average": round(float(rows["sum"][:, t].sum() / rows["count"].sum()), 1),
+                "max": round(float(rows["max"][:, t].max()), 1),
+                "min": round(float(rows["min"][:, t].min()), 1),
+                "records": records
+            },
+            "precipitation": {
+                "total": round(float(precipitation.sum()), 1),
+                "daysWithRain": int(rain_days.sum()),
+                "records": [{"date": r["date"], "amount": r["precipitation"], "days": r["days"]} for r in records]
+            },
+            "wind": {
+                "dominantDirection": WIND_SECTORS[int(np.argmax(sector_count))],
+                "averageSpeed": round(float(rows["sum"][:, wind_speed].sum() / rows["count"].sum()), 1),
+                "frequency": wind_frequency
+            }
+        }
@@ -5,18 +5,61 @@ Genera valores realistas para todas las variables meteorológicas
 
 import random
 import math
+import hashlib
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Dict, List, Optional
 import numpy as np
 
+from timeseries import TimeSeriesFrame
+
+
+# Número de variables uniformes que consume cada hora simulada
+UNIFORMS_PER_HOUR = 16
+
+# Philox produce 4 enteros de 64 bits por incremento de contador
+PHILOX_BLOCKS_PER_HOUR = UNIFORMS_PER_HOUR // 4
+
+
+def _philox_key(seed: int, location_id: str) -> np.ndarray:
+    """Deriva la clave Philox (2 x uint64) a partir de la semilla y el id de ubicación"""
+    digest = hashlib.blake2b(f"{seed}:{location_id}".encode(), digest_size=16).digest()
+    return np.frombuffer(digest, dtype=np.uint64).copy()
+
+
+def _uniform(u: np.ndarray, low: float, high: float) -> np.ndarray:
+    """Escala uniformes en [0, 1) al intervalo [low, high)"""
+    return low + u * (high - low)
+
+
+def _randint(u: np.ndarray, low: int, high: int) -> np.ndarray:
+    """Escala uniformes en [0, 1) a enteros en [low, high] (como random.randint)"""
+    return low + np.floor(u * (high - low + 1)).astype(np.int64)
+
 
 class WeatherSimulator:
     """Simulador de datos meteorológicos realistas"""
     
-    def __init__(self, base_temp: float = 24.0, base_humidity: float = 68.0):
+    def __init__(
+        self,
+        base_temp: float = 24.0,
+        base_humidity: float = 68.0,
+        seed: Optional[int] = None,
+        location_id: str = ""
+    ):
         self.base_temp = base_temp
         self.base_humidity = base_humidity
         self.start_time = datetime.now()
+        self.rng = np.random.default_rng()
+        
+        # Modo determinista: cada hora se deriva de (semilla, ubicación, índice de hora)
+        self.seed = seed
+        self.location_id = location_id
+        self._philox_key = _philox_key(seed, location_id) if seed is not None else None
+    
+    @property
+    def deterministic(self) -> bool:
+        """Indica si el historial se genera con el RNG por contador (reproducible)"""
+        return self._philox_key is not None
         
     def _get_time_factor(self) -> float:
         """Factor temporal para variaciones diurnas"""
@@ -143,48 +186,85 @@ class WeatherSimulator:
             }
         }
     
-    def generate_historical_data(self, hours: int = 24) -> List[Dict]:
-        """Genera datos históricos para las últimas N horas"""
-        data = []
-        now = datetime.now()
+    def generate_historical_frame(self, hours: int = 24) -> TimeSeriesFrame:
+        """Genera datos históricos de las últimas N horas en formato columnar"""
+        now = np.datetime64(datetime.now(), "us")
+        timestamps = now - np.arange(hours, 0, -1) * np.timedelta64(1, "h")
+        return self.generate_frame_at(timestamps)
+    
+    def generate_hour_range(self, start: np.datetime64, end: np.datetime64) -> TimeSeriesFrame:
+        """Genera las horas completas en [start, end) en formato columnar"""
+        hours = np.arange(
+            np.datetime64(start, "h"),
+            np.datetime64(end, "h"),
+            np.timedelta64(1, "h")
+        )
+        return self.generate_frame_at(hours.astype("datetime64[us]"))
+    
+    def generate_frame_at(self, timestamps: np.ndarray) -> TimeSeriesFrame:
+        """Genera una lectura horaria por cada timestamp (datetime64) en lote"""
+        if self.deterministic:
+            hour_index = timestamps.astype("datetime64[h]").astype(np.int64)
+            uniforms = self._uniforms_for_hours(hour_index)
+        else:
+            uniforms = self.rng.random((len(timestamps), UNIFORMS_PER_HOUR))
+        return self._columns_from_uniforms(timestamps, uniforms)
+    
+    def _uniforms_for_hours(self, hour_index: np.ndarray) -> np.ndarray:
+        """
+        Uniformes direccionadas por contador: la hora h usa los bloques Philox
+        [h * PHILOX_BLOCKS_PER_HOUR, (h + 1) * PHILOX_BLOCKS_PER_HOUR), por lo que
+        cualquier hora o rango se genera en O(1) sin producir las anteriores.
+        """
+        if len(hour_index) == 0:
+            return np.empty((0, UNIFORMS_PER_HOUR))
         
-        for i in range(hours, 0, -1):
-            timestamp = now - timedelta(hours=i)
-            hour = timestamp.hour
-            
-            # Simula variación histórica
-            time_factor = math.sin((hour - 6) * math.pi / 12) if 6 <= hour <= 18 else -0.3
-            temp = self.base_temp + time_factor * 8 + random.uniform(-2, 2)
-            humidity = max(40, min(95, self.base_humidity - (time_factor * 2) + random.uniform(-5, 5)))
-            wind_speed = max(5, min(30, 12 + time_factor * 8 + random.uniform(-3, 3)))
-            pressure = 1013 + random.uniform(-5, 5)
-            precip = random.uniform(0, 2) if random.random() > 0.7 else 0
-            solar = max(0, 1000 * (1 - abs(hour - 12) / 6) + random.uniform(-100, 100)) if 6 <= hour <= 18 else 0
-            uv = max(0, min(11, int((solar / 100) * 0.8))) if 6 <= hour <= 18 else 0
-            
-            data.append({
-                "timestamp": timestamp.isoformat() + "Z",
-                "time": timestamp.strftime("%H:%M"),
-                "hour": timestamp.strftime("%Hh"),
-                "temperature": round(temp, 1),
-                "humidity": round(humidity, 1),
-                "windSpeed": round(wind_speed, 1),
-                "windDirection": random.randint(0, 360),
-                "pressure": round(pressure, 1),
-                "precipitation": round(precip, 1),
-                "solarRadiation": round(solar, 0),
-                "uvIndex": uv,
-                "pm25": round(random.uniform(10, 25), 1),
-                "pm10": round(random.uniform(20, 35), 1),
-                "co2": random.randint(400, 450),
-                "o3": round(random.uniform(40, 60), 1),
-                "feels": round(temp - random.uniform(1, 3), 1),
-                "soil": round(temp + random.uniform(-2, 2), 1),
-                "soilHumidity": round(random.uniform(40, 50), 1),
-                "gust": round(wind_speed * random.uniform(1.3, 1.8), 1)
-            })
+        first = int(hour_index.min())
+        span = int(hour_index.max()) - first + 1
+        bit_generator = np.random.Philox(key=self._philox_key)
+        bit_generator.advance(first * PHILOX_BLOCKS_PER_HOUR)
+        raw = bit_generator.random_raw(span * UNIFORMS_PER_HOUR).reshape(span, UNIFORMS_PER_HOUR)
+        
+        # 53 bits superiores -> double en [0, 1), igual que Generator.random
+        uniforms = (raw >> np.uint64(11)) * (1.0 / 9007199254740992.0)
+        return uniforms[hour_index - first]
+    
+    def _columns_from_uniforms(self, timestamps: np.ndarray, u: np.ndarray) -> TimeSeriesFrame:
+        """Transforma una matriz de uniformes (horas x UNIFORMS_PER_HOUR) en variables"""
+        hour = timestamps.astype("datetime64[h]").astype(np.int64) % 24
+        daytime = (hour >= 6) & (hour <= 18)
+        
+        # Variación diurna vectorizada
+        time_factor = np.where(daytime, np.sin((hour - 6) * np.pi / 12), -0.3)
+        temp = self.base_temp + time_factor * 8 + _uniform(u[:, 0], -2, 2)
+        humidity = np.clip(self.base_humidity - (time_factor * 2) + _uniform(u[:, 1], -5, 5), 40, 95)
+        wind_speed = np.clip(12 + time_factor * 8 + _uniform(u[:, 2], -3, 3), 5, 30)
+        pressure = 1013 + _uniform(u[:, 3], -5, 5)
+        precip = np.where(u[:, 4] > 0.7, _uniform(u[:, 5], 0, 2), 0.0)
+        
+        # Radiación solar y UV solo durante el día
+        solar_raw = np.maximum(0, 1000 * (1 - np.abs(hour - 12) / 6) + _uniform(u[:, 6], -100, 100))
+        solar = np.where(daytime, solar_raw, 0.0)
+        uv = np.where(daytime, np.clip(np.floor((solar / 100) * 0.8), 0, 11), 0).astype(np.int64)
         
-        return data
+        return TimeSeriesFrame.from_arrays(timestamps, {
+            "temperature": np.round(temp, 1),
+            "humidity": np.round(humidity, 1),
+            "windSpeed": np.round(wind_speed, 1),
+            "windDirection": _randint(u[:, 7], 0, 360),
+            "pressure": np.round(pressure, 1),
+            "precipitation": np.round(precip, 1),
+            "solarRadiation": np.round(solar, 0),
+            "uvIndex": uv,
+            "pm25": np.round(_uniform(u[:, 8], 10, 25), 1),
+            "pm10": np.round(_uniform(u[:, 9], 20, 35), 1),
+            "co2": _randint(u[:, 10], 400, 450),
+            "o3": np.round(_uniform(u[:, 11], 40, 60), 1),
+            "feels": np.round(temp - _uniform(u[:, 12], 1, 3), 1),
+            "soil": np.round(temp + _uniform(u[:, 13], -2, 2), 1),
+            "soilHumidity": np.round(_uniform(u[:, 14], 40, 50), 1),
+            "gust": np.round(wind_speed * _uniform(u[:, 15], 1.3, 1.8), 1)
+        })
     
     def generate_daily_forecast(self, days: int = 7) -> List[Dict]:
         """Genera pronóstico diario para N días"""
@@ -248,127 +328,6 @@ class WeatherSimulator:
         
         return forecast
     
-    def generate_hourly_forecast(self, hours: int = 24) -> List[Dict]:
-        """Genera pronóstico horario para N horas"""
-        forecast = []
-        now = datetime.now()
-        
-        for i in range(hours):
-            dt = now + timedelta(hours=i)
-            hour = dt.hour
-            
-            time_factor = math.sin((hour - 6) * math.pi / 12) if 6 <= hour <= 18 else -0.3
-            temp = self.base_temp + time_factor * 8 + random.uniform(-2, 2)
-            feels = temp - random.uniform(1, 3)
-            humidity = max(40, min(95, self.base_humidity - (time_factor * 2) + random.uniform(-5, 5)))
-            wind_speed = max(5, min(30, 12 + time_factor * 8 + random.uniform(-3, 3)))
-            
-            precip_prob = random.uniform(0, 30) if 6 <= hour <= 18 else random.uniform(0, 50)
-            precip_amount = random.uniform(0, 5) if precip_prob > 20 else 0
-            
-            cloud_cover = random.uniform(20, 60)
-            if cloud_cover < 30:
-                icon = "partly-cloudy"
-                description = "Parcialmente nublado"
-            else:
-                icon = "cloud"
-                description = "Nublado"
-            
-            uv = max(0, min(11, int((hour - 6) * 0.8))) if 6 <= hour <= 18 else 0
-            
-            forecast.append({
-                "datetime": dt.isoformat() + "Z",
-                "temperature": round(temp, 1),
-                "feelsLike": round(feels, 1),
-                "humidity": round(humidity, 1),
-                "windSpeed": round(wind_speed, 1),
-                "windDirection": random.randint(0, 360),
-                "precipitation": {
-                    "probability": round(precip_prob, 0),
-                    "amount": round(precip_amount, 1)
-                },
-                "conditions": {
-                    "icon": icon,
-                    "description": description
-                },
-                "uvIndex": uv
-            })
-        
-        return forecast
-    
-    def generate_alerts(self) -> List[Dict]:
-        """Genera alertas meteorológicas simuladas"""
-        alerts = []
-        now = datetime.now()
-        
-        # Alerta de lluvia (30% probabilidad)
-        if random.random() < 0.3:
-            start = now + timedelta(hours=random.randint(1, 3))
-            alerts.append({
-                "id": "alert_001",
-                "type": "rain",
-                "severity": "warning",
-                "title": "Lluvia Intensa",
-                "description": "Se esperan precipitaciones intensas con acumulados de hasta 30mm/h en el área metropolitana.",
-                "startTime": start.isoformat() + "Z",
-                "endTime": (start + timedelta(hours=2)).isoformat() + "Z",
-                "affectedAreas": ["CABA", "Gran Buenos Aires Norte", "Gran Buenos Aires Oeste"],
-                "recommendations": [
-                    "Evite circular por zonas bajas propensas a inundaciones",
-                    "Tenga precaución al conducir"
-                ],
-                "icon": "cloud-rain",
-                "color": "chart-2",
-                "isActive": True,
-                "createdAt": now.isoformat() + "Z"
-            })
-        
-        # Alerta de viento (20% probabilidad)
-        if random.random() < 0.2:
-            start = now + timedelta(hours=random.randint(2, 4))
-            alerts.append({
-                "id": "alert_002",
-                "type": "wind",
-                "severity": "watch",
-                "title": "Vientos Fuertes",
-                "description": "Vientos del sudeste con ráfagas de hasta 60-70 km/h durante la tarde.",
-                "startTime": start.isoformat() + "Z",
-                "endTime": (start + timedelta(hours=6)).isoformat() + "Z",
-                "affectedAreas": ["Costa Atlántica", "CABA", "Gran Buenos Aires"],
-                "recommendations": [
-                    "Asegure objetos que puedan ser movidos por el viento",
-                    "Evite actividades al aire libre"
-                ],
-                "icon": "wind",
-                "color": "chart-3",
-                "isActive": True,
-                "createdAt": now.isoformat() + "Z"
-            })
-        
-        # Alerta UV (siempre activa durante el día)
-        if 12 <= now.hour <= 16:
-            alerts.append({
-                "id": "alert_003",
-                "type": "uv",
-                "severity": "info",
-                "title": "Radiación UV Alta",
-                "description": "Índice UV extremadamente alto. Riesgo elevado de daño solar.",
-                "startTime": now.replace(hour=12, minute=0).isoformat() + "Z",
-                "endTime": now.replace(hour=16, minute=0).isoformat() + "Z",
-                "affectedAreas": ["Todo el territorio"],
-                "recommendations": [
-                    "Use protector solar FPS 50+",
-                    "Busque sombra entre 12:00 y 16:00",
-                    "Use ropa protectora"
-                ],
-                "icon": "sun",
-                "color": "chart-4",
-                "isActive": True,
-                "createdAt": now.isoformat() + "Z"
-            })
-        
-        return alerts
-    
     def generate_predictions(self, days: int = 7) -> List[Dict]:
         """Genera predicciones con intervalos de confianza"""
         predictions = []
@@ -402,59 +361,3 @@ class WeatherSimulator:
             })
         
         return predictions
-    
-    def generate_analytics(self, months: int = 6) -> Dict:
-        """Genera datos de análisis histórico"""
-        now = datetime.now()
-        records = []
-        
-        for i in range(months, 0, -1):
-            month_date = now - timedelta(days=30 * i)
-            month_name = month_date.strftime("%b")
-            
-            avg_temp = self.base_temp - (i * 2) + random.uniform(-2, 2)
-            max_temp = avg_temp + random.uniform(5, 8)
-            min_temp = avg_temp - random.uniform(8, 12)
-            
-            precip = random.uniform(40, 150)
-            days_rain = random.randint(3, 10)
-            
-            records.append({
-                "date": month_date.strftime("%Y-%m"),
-                "month": month_name,
-                "avg": round(avg_temp, 1),
-                "max": round(max_temp, 1),
-                "min": round(min_temp, 1),
-                "precipitation": round(precip, 1),
-                "days": days_rain
-            })
-        
-        # Rosa de vientos
-        directions = ["N", "NE", "E", "SE", "S", "SO", "O", "NO"]
-        wind_frequency = []
-        for direction in directions:
-            wind_frequency.append({
-                "direction": direction,
-                "frequency": round(random.uniform(5, 20), 1),
-                "avgSpeed": round(random.uniform(12, 22), 1)
-            })
-        
-        return {
-            "temperature": {
-                "average": round(sum(r["avg"] for r in records) / len(records), 1),
-                "max": round(max(r["max"] for r in records), 1),
-                "min": round(min(r["min"] for r in records), 1),
-                "records": records
-            },
-            "precipitation": {
-                "total": round(sum(r["precipitation"] for r in records), 1),
-                "daysWithRain": sum(r["days"] for r in records),
-                "records": [{"date": r["date"], "amount": r["precipitation"], "days": r["days"]} for r in records]
-            },
-            "wind": {
-                "dominantDirection": "SE",
-                "averageSpeed": round(sum(w["avgSpeed"] for w in wind_frequency) / len(wind_frequency), 1),
-                "frequency": wind_frequency
-            }
-        }
-
@@ -0,0 +1,232 @@
+"""
+Sketches de Cuantiles
+KLL combinable con memoria acotada, por estación y bucket temporal (día y mes)
+"""
+
+import math
+from typing import Dict, List, Optional, Union
+import numpy as np
+
+from histograms import FixedPointHistogram, declared_decimals
+from statistics import STATISTICS_VARIABLES
+from timeseries import TimeSeriesFrame
+
+
+# Error de rango normalizado por defecto (1%) y constante que lo relaciona con k
+DEFAULT_ERROR = 0.01
+ERROR_CONSTANT = 2.0
+
+# Capacidad mínima de un compactor
+MIN_CAPACITY = 8
+
+
+def k_for_error(error: float) -> int:
+    """Parámetro k del sketch para un error de rango normalizado dado"""
+    return max(MIN_CAPACITY, int(math.ceil(ERROR_CONSTANT / error)))
+
+
+class KLLSketch:
+    """
+    Sketch KLL para varias variables a la vez (una fila por variable).
+
+    Cada nivel es un compactor: cuando se llena, se ordena y la mitad de sus
+    elementos sube al nivel siguiente con el doble de peso. Como todas las variables
+    reciben las mismas lecturas, sus compactores se llenan juntos y se compactan con
+    un solo np.sort por eje. Mientras no hubo compactación el sketch guarda los datos
+    exactos y los cuantiles coinciden con np.quantile.
+    """
+
+    __slots__ = ("k", "n", "levels", "_offset")
+
+    def __init__(self, variables: int, k: int = k_for_error(DEFAULT_ERROR)):
+        self.k = k
+        self.n = 0
+        self.levels: List[np.ndarray] = [np.empty((variables, 0))]
+        self._offset = 0
+
+    @property
+    def size(self) -> int:
+        """Elementos retenidos por variable"""
+        return sum(level.shape[1] for level in self.levels)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(MIN_CAPACITY, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values: np.ndarray) -> None:
+        """Incorpora lecturas (filas) con un valor por variable"""
+        if len(values) == 0:
+            return
+        self.levels[0] = np.concatenate([self.levels[0], values.T], axis=1)
+        self.n += len(values)
+        self._compress()
+
+    def merge(self, other: "KLLSketch") -> None:
+        """Combina otro sketch en este"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty((self.levels[0].shape[0], 0)))
+        for i, level in enumerate(other.levels):
+            if level.shape[1]:
+                self.levels[i] = np.concatenate([self.levels[i], level], axis=1)
+        self.n += other.n
+        self._compress()
+
+    def copy(self) -> "KLLSketch":
+        sketch = KLLSketch(self.levels[0].shape[0], self.k)
+        sketch.n = self.n
+        sketch.levels = list(self.levels)
+        sketch._offset = self._offset
+        return sketch
+
+    def _compress(self) -> None:
+        """Compacta el nivel más bajo que esté lleno hasta respetar la capacidad total"""
+        while self.size > sum(self._capacity(i) for i in range(len(self.levels))):
+            for i, level in enumerate(self.levels):
+                if level.shape[1] < self._capacity(i):
+                    continue
+                if i + 1 == len(self.levels):
+                    self.levels.append(np.empty((level.shape[0], 0)))
+                items = np.sort(level, axis=1)
+                keep = items[:, items.shape[1] - items.shape[1] % 2:]
+                items = items[:, :items.shape[1] - items.shape[1] % 2]
+                # Alternar el desplazamiento mantiene el sesgo acotado sin usar un RNG
+                promoted = items[:, self._offset::2]
+                self._offset ^= 1
+                self.levels[i + 1] = np.concatenate([self.levels[i + 1], promoted], axis=1)
+                self.levels[i] = keep
+                break
+
+    def _weighted(self) -> tuple:
+        """Elementos ordenados por variable y sus pesos acumulados"""
+        items = np.concatenate(self.levels, axis=1)
+        weights = np.concatenate([
+            np.full(level.shape[1], 2 ** i, dtype=np.int64) for i, level in enumerate(self.levels)
+        ])
+        order = np.argsort(items, axis=1, kind="stable")
+        return np.take_along_axis(items, order, axis=1), np.cumsum(weights[order], axis=1)
+
+    def quantiles(self, levels: List[float]) -> np.ndarray:
+        """Cuantiles (una fila por nivel, una columna por variable)"""
+        if all(level.shape[1] == 0 for level in self.levels[1:]):
+            return np.quantile(self.levels[0], levels, axis=1)
+
+        items, cumulative = self._weighted()
+        result = np.empty((len(levels), items.shape[0]))
+        for j, q in enumerate(levels):
+            rank = q * (self.n - 1)
+            position = (cumulative > rank).argmax(axis=1)
+            result[j] = items[np.arange(items.shape[0]), position]
+        return result
+
+    def mode(self) -> np.ndarray:
+        """Valor retenido con mayor peso total por variable (exacto si no hubo compactación)"""
+        items, cumulative = self._weighted()
+        weights = np.diff(cumulative, axis=1, prepend=0)
+        result = np.empty(items.shape[0])
+        for v in range(items.shape[0]):
+            values, inverse = np.unique(items[v], return_inverse=True)
+            result[v] = values[np.argmax(np.bincount(inverse, weights=weights[v]))]
+        return result
+
+
+QuantileSummary = Union[KLLSketch, FixedPointHistogram]
+
+
+class SketchPyramid:
+    """
+    Sketches diarios y mensuales de una estación, mantenidos junto a los rollups.
+    Si todas las variables tienen resolución declarada cada bucket empieza como
+    histograma de punto fijo (exacto); si no, o si el bucket recibe lecturas fuera
+    de la grilla, pasa a sketch KLL, igual que las combinaciones que lo incluyen.
+    """
+
+    def __init__(self, k: int = k_for_error(DEFAULT_ERROR), variables: Optional[List[str]] = None):
+        self.k = k
+        self.variables = variables or STATISTICS_VARIABLES
+        self.decimals = declared_decimals(self.variables)
+        self.daily: Dict[np.datetime64, QuantileSummary] = {}
+        self.monthly: Dict[np.datetime64, QuantileSummary] = {}
+
+    def new(self) -> QuantileSummary:
+        """Sketch vacío del tipo que usa la pirámide"""
+        if self.decimals is not None:
+            return FixedPointHistogram(self.decimals)
+        return KLLSketch(len(self.variables), self.k)
+
+    def _kll(self, summary: QuantileSummary) -> KLLSketch:
+        """Sketch KLL con las lecturas de un histograma (o el mismo sketch)"""
+        if isinstance(summary, KLLSketch):
+            return summary
+        sketch = KLLSketch(len(self.variables), self.k)
+        sketch.update(summary.values())
+        return sketch
+
+    def update(self, summary: QuantileSummary, values: np.ndarray) -> QuantileSummary:
+        """
+        Incorpora lecturas a un sketch de la pirámide y lo devuelve. Un histograma que
+        recibe valores fuera de su grilla se convierte antes a KLL en lugar de
+        redondearlos.
+        """
+        if isinstance(summary, FixedPointHistogram) and not summary.accepts(values):
+            summary = self._kll(summary)
+        summary.update(values)
+        return summary
+
+    def combine(self, parts: List[QuantileSummary]) -> QuantileSummary:
+        """Combina sketches de la pirámide (KLL si alguno lo es)"""
+        result = self.new()
+        if any(isinstance(part, KLLSketch) for part in parts):
+            result = self._kll(result)
+            parts = [self._kll(part) for part in parts]
+        for part in parts:
+            result.merge(part)
+        return result
+
+    def add(self, frame: TimeSeriesFrame, units: str = "DM") -> None:
+        """Incorpora horas completas a los sketches de su día y su mes (`units`)"""
+        if len(frame) == 0:
+            return
+        values = np.column_stack([frame.values(name) for name in self.variables])
+        for unit, buckets in (("D", self.daily), ("M", self.monthly)):
+            if unit not in units:
+                continue
+            keys = frame.index.astype(f"datetime64[{unit}]")
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+            for start, stop in zip(starts, np.r_[starts[1:], len(keys)]):
+                key = keys[start]
+                buckets[key] = self.update(buckets[key] if key in buckets else self.new(), values[start:stop])
+
+    def rebuild(self, frame: TimeSeriesFrame) -> None:
+        """
+        Recalcula los días que toca el frame (que debe contener todas sus horas) y los
+        meses de esos días combinando sus sketches diarios.
+        """
+        days = np.unique(frame.index.astype("datetime64[D]"))
+        for key in days:
+            self.daily.pop(key, None)
+        self.add(frame, units="D")
+        for month in np.unique(days.astype("datetime64[M]")):
+            first = month.astype("datetime64[D]")
+            self.monthly[month] = self.combine([
+                self.daily[day] for day in np.arange(first, (month + 1).astype("datetime64[D]")) if day in self.daily
+            ])
+
+    def days(self, first: np.datetime64, last: np.datetime64) -> QuantileSummary:
+        """
+        Sketch combinado de los días [first, last]: los meses completos del rango
+        salen del nivel mensual y solo los días sueltos de los extremos del diario.
+        """
+        parts = []
+        day = np.datetime64(first, "D")
+        last = np.datetime64(last, "D")
+        while day <= last:
+            month = day.astype("datetime64[M]")
+            month_last = (month + 1).astype("datetime64[D]") - 1
+            if day == month.astype("datetime64[D]") and month_last <= last and month in self.monthly:
+                parts.append(self.monthly[month])
+                day = month_last + 1
+                continue
+            if day in self.daily:
+                parts.append(self.daily[day])
+            day += 1
+        return self.combine(parts)
@@ -0,0 +1,277 @@
+"""
+Registro de Estaciones y Flota de Simuladores
+Parámetros por estación con búsqueda O(1) y simulación vectorizada de toda la flota
+"""
+
+import json
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+
+from models import Location
+from sensors import WeatherSimulator
+
+
+DIRECTION_NAMES = np.array(["N", "NE", "E", "SE", "S", "SO", "O", "NO"])
+PRESSURE_TRENDS = np.array(["rising", "falling", "stable"])
+
+# Número de variables uniformes que consume cada estación por tick
+UNIFORMS_PER_TICK = 22
+
+
+class LocationRegistry:
+    """Registro de estaciones: ubicación y parámetros del simulador por estación"""
+
+    def __init__(self, seed: Optional[int] = None):
+        self.seed = seed
+        self.locations: List[Location] = []
+        self._index: Dict[str, int] = {}
+        self._base_temp: List[float] = []
+        self._base_humidity: List[float] = []
+        self._simulators: Dict[str, WeatherSimulator] = {}
+        self._params: Optional[Dict[str, np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def __contains__(self, location_id: str) -> bool:
+        return location_id in self._index
+
+    def add(self, location: Location, base_temp: float = 24.0, base_humidity: float = 68.0) -> None:
+        """Registra (o reemplaza) una estación"""
+        if location.id in self._index:
+            row = self._index[location.id]
+            self.locations[row] = location
+            self._base_temp[row] = base_temp
+            self._base_humidity[row] = base_humidity
+            self._simulators.pop(location.id, None)
+        else:
+            self._index[location.id] = len(self.locations)
+            self.locations.append(location)
+            self._base_temp.append(base_temp)
+            self._base_humidity.append(base_humidity)
+        self._params = None
+
+    def get(self, location_id: str) -> Optional[Location]:
+        """Busca una estación por id (None si no existe)"""
+        row = self._index.get(location_id)
+        return self.locations[row] if row is not None else None
+
+    def row(self, location_id: str) -> int:
+        """Fila de la estación en los arreglos de la flota"""
+        return self._index[location_id]
+
+    @property
+    def params(self) -> Dict[str, np.ndarray]:
+        """Parámetros de todas las estaciones como arreglos (una fila por estación)"""
+        if self._params is None:
+            self._params = {
+                "base_temp": np.array(self._base_temp, dtype=np.float64),
+                "base_humidity": np.array(self._base_humidity, dtype=np.float64)
+            }
+        return self._params
+
+    def simulator(self, location_id: str) -> WeatherSimulator:
+        """Simulador de la estación (se crea al primer uso con sus parámetros)"""
+        simulator = self._simulators.get(location_id)
+        if simulator is None:
+            row = self._index[location_id]
+            simulator = WeatherSimulator(
+                base_temp=self._base_temp[row],
+                base_humidity=self._base_humidity[row],
+                seed=self.seed,
+                location_id=location_id
+            )
+            self._simulators[location_id] = simulator
+        return simulator
+
+    def load_file(self, path: str) -> None:
+        """
+        Carga estaciones desde un archivo JSON: una lista de objetos con los campos
+        de Location y, opcionalmente, baseTemp y baseHumidity.
+        """
+        with open(path, encoding="utf-8") as f:
+            entries = json.load(f)
+
+        for entry in entries:
+            base_temp = entry.pop("baseTemp", 24.0)
+            base_humidity = entry.pop("baseHumidity", 68.0)
+            self.add(Location(**entry), base_temp=base_temp, base_humidity=base_humidity)
+
+    def add_synthetic(self, count: int, around: Location) -> None:
+        """
+        Agrega estaciones sintéticas alrededor de una ubicación (pruebas de carga).
+        Los números ya usados por estaciones registradas se saltean.
+        """
+        rng = np.random.default_rng(self.seed or 0)
+        offsets = rng.uniform(-1.5, 1.5, size=(count, 2))
+        base_temps = rng.uniform(18, 30, size=count)
+        base_humidities = rng.uniform(55, 85, size=count)
+
+        number = len(self.locations)
+        for i in range(count):
+            number += 1
+            while f"loc_{number:03d}" in self._index:
+                number += 1
+            self.add(
+                Location(
+                    id=f"loc_{number:03d}",
+                    name=f"Estación {number:03d}",
+                    country=around.country,
+                    latitude=round(around.latitude + offsets[i, 0], 4),
+                    longitude=round(around.longitude + offsets[i, 1], 4),
+                    timezone=around.timezone,
+                    elevation=around.elevation
+                ),
+                base_temp=round(float(base_temps[i]), 1),
+                base_humidity=round(float(base_humidities[i]), 1)
+            )
+
+
+class SimulatorFleet:
+    """
+    Simula las condiciones actuales de todas las estaciones en un solo paso.
+
+    Cada variable es un arreglo con una fila por estación; la vista anidada de
+    CurrentWeather solo se construye cuando se consulta una estación.
+    """
+
+    def __init__(self, registry: LocationRegistry):
+        self.registry = registry
+        self.rng = np.random.default_rng()
+        self.current: Dict[str, np.ndarray] = {}
+        self.updated_at: Optional[datetime] = None
+
+    def tick(self, now: Optional[datetime] = None) -> None:
+        """Genera las condiciones actuales de toda la flota (vectorizado)"""
+        now = now or datetime.now()
+        hour = now.hour
+        daytime = 6 <= hour <= 18
+        time_factor = np.sin((hour - 6) * np.pi / 12) if daytime else -0.3
+
+        params = self.registry.params
+        n = len(params["base_temp"])
+        u = self.rng.random((n, UNIFORMS_PER_TICK))
+
+        # Temperatura con variación diurna
+        temp_variation = time_factor * 8 + (u[:, 0] * 4 - 2)
+        air_temp = params["base_temp"] + temp_variation
+        feels_like = air_temp - (1 + u[:, 1] * 2)
+        soil_temp = air_temp + (u[:, 2] * 4 - 2)
+
+        # Humedad (inversamente relacionada con temperatura)
+        humidity = np.clip(params["base_humidity"] - temp_variation * 2 + (u[:, 3] * 10 - 5), 40, 95)
+        dew_point = air_temp - (100 - humidity) / 5
+
+        # Viento (más fuerte durante el día)
+        wind_speed = np.clip(12 + time_factor * 8 + (u[:, 5] * 6 - 3), 5, 30)
+        wind_direction = np.floor(u[:, 6] * 361).astype(np.int64)
+
+        # Precipitación (probabilidad baja durante el día)
+        precip_prob = u[:, 10] * (30 if daytime else 50)
+        current_precip = np.where(precip_prob > 20, u[:, 11] * 3, 0.0)
+
+        # Radiación solar (solo durante el día)
+        if daytime:
+            solar = np.maximum(0, 1000 * (1 - abs(hour - 12) / 6) + (u[:, 13] * 200 - 100))
+            uv_index = np.clip(np.floor((solar / 100) * 0.8), 0, 11).astype(np.int64)
+            solar_max = np.full(n, 1000.0)
+        else:
+            solar = np.zeros(n)
+            uv_index = np.zeros(n, dtype=np.int64)
+            solar_max = np.full(n, 950.0)
+
+        self.current = {
+            "air": np.round(air_temp, 1),
+            "feelsLike": np.round(feels_like, 1),
+            "soil": np.round(soil_temp, 1),
+            "change24h": np.round(u[:, 20] * 4 - 1, 1),
+            "relative": np.round(humidity, 1),
+            "dewPoint": np.round(dew_point, 1),
+            "soilHumidity": np.round(40 + u[:, 4] * 10, 1),
+            "speed": np.round(wind_speed, 1),
+            "direction": wind_direction,
+            "gust": np.round(wind_speed * (1.3 + u[:, 7] * 0.5), 1),
+            "pressure": np.round(1013 + (u[:, 8] * 10 - 5), 1),
+            "pressureTrend": np.floor(u[:, 9] * 3).astype(np.int64),
+            "precipCurrent": np.round(current_precip, 1),
+            "precipLast24h": np.round(5 + u[:, 12] * 10, 1),
+            "precipProbability": np.round(precip_prob, 1),
+            "radiation": np.round(solar, 0),
+            "maxToday": solar_max,
+            "uvIndex": uv_index,
+            "visibility": np.round(8 + u[:, 21] * 4, 1),
+            "aqi": 30 + np.floor(u[:, 14] * 31).astype(np.int64),
+            "pm25": np.round(10 + u[:, 15] * 15, 1),
+            "pm10": np.round(20 + u[:, 16] * 15, 1),
+            "co2": 400 + np.floor(u[:, 17] * 51).astype(np.int64),
+            "o3": np.round(40 + u[:, 18] * 20, 1),
+            "cloudCover": np.round(20 + u[:, 19] * 40, 1)
+        }
+        self.updated_at = now
+
+    def current_weather(self, location_id: str) -> Dict:
+        """Condiciones actuales de una estación con el formato de generate_current_weather"""
+        row = self.registry.row(location_id)
+        c = {name: values[row].item() for name, values in self.current.items()}
+
+        change = c["change24h"]
+        uv = c["uvIndex"]
+        aqi = c["aqi"]
+        cloud_cover = c["cloudCover"]
+        if cloud_cover < 30:
+            icon, description = "sun", "Soleado"
+        elif cloud_cover < 60:
+            icon, description = "partly-cloudy", "Parcialmente nublado"
+        else:
+            icon, description = "cloud", "Nublado"
+
+        return {
+            "temperature": {
+                "air": c["air"],
+                "feelsLike": c["feelsLike"],
+                "soil": c["soil"],
+                "trend": "up" if change > 1 else "down" if change < -1 else "stable",
+                "change24h": change
+            },
+            "humidity": {
+                "relative": c["relative"],
+                "dewPoint": c["dewPoint"],
+                "soil": c["soilHumidity"]
+            },
+            "wind": {
+                "speed": c["speed"],
+                "direction": c["direction"],
+                "gust": c["gust"],
+                "directionName": str(DIRECTION_NAMES[c["direction"] // 45 % 8])
+            },
+            "pressure": {
+                "value": c["pressure"],
+                "trend": str(PRESSURE_TRENDS[c["pressureTrend"]])
+            },
+            "precipitation": {
+                "current": c["precipCurrent"],
+                "last24h": c["precipLast24h"],
+                "probability": c["precipProbability"]
+            },
+            "solar": {
+                "radiation": c["radiation"],
+                "maxToday": c["maxToday"],
+                "uvIndex": uv,
+                "uvLevel": "low" if uv < 3 else "moderate" if uv < 6 else "high" if uv < 8 else "very_high" if uv < 10 else "extreme"
+            },
+            "visibility": c["visibility"],
+            "airQuality": {
+                "aqi": aqi,
+                "pm25": c["pm25"],
+                "pm10": c["pm10"],
+                "co2": c["co2"],
+                "o3": c["o3"],
+                "level": "good" if aqi < 50 else "moderate" if aqi < 100 else "unhealthy"
+            },
+            "conditions": {
+                "icon": icon,
+                "description": description,
+                "cloudCover": cloud_cover
+            }
+        }
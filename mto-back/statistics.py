@@ -4,21 +4,43 @@ Para análisis de datos meteorológicos simulados
 """
 
 import numpy as np
-from typing import Dict, List, Optional, Tuple
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 from datetime import datetime, timedelta
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import r2_score, mean_squared_error, mean_absolute_error
 from scipy import stats
+from scipy.signal import lfilter
 import math
+import random
+
+from histograms import FixedPointHistogram, declared_decimals, on_grid
+from timeseries import TimeSeriesFrame
+
+
+# Variables incluidas en las estadísticas descriptivas
+STATISTICS_VARIABLES = [
+    "temperature", "humidity", "windSpeed", "pressure", "precipitation",
+    "solarRadiation", "uvIndex", "pm25", "pm10"
+]
+
+# Variables incluidas en la matriz de correlación
+CORRELATION_VARIABLES = ["temperature", "humidity", "windSpeed", "pressure", "precipitation"]
+
+# Cuantiles del resumen: p10, q1, mediana, q3, p90, p95 y p99
+QUANTILE_LEVELS = [0.10, 0.25, 0.50, 0.75, 0.90, 0.95, 0.99]
+
+# Syy mínimo de una ventana no constante en SlidingRegression
+SLIDING_REGRESSION_TOLERANCE = 1e-6
+
+HistoricalData = Union[List[Dict], TimeSeriesFrame]
 
 
 class DescriptiveStatistics:
     """Clase para calcular estadísticas descriptivas de datos meteorológicos"""
     
     @staticmethod
-    def calculate_basic_stats(data: List[float]) -> Dict[str, float]:
+    def calculate_basic_stats(data: Union[List[float], np.ndarray]) -> Dict[str, float]:
         """Calcula estadísticas básicas: media, mediana, moda, etc."""
-        if not data or len(data) == 0:
+        if data is None or len(data) == 0:
             return {}
         
         data_array = np.array(data)
@@ -78,9 +100,9 @@ class DescriptiveStatistics:
         }
     
     @staticmethod
-    def calculate_advanced_stats(data: List[float]) -> Dict[str, float]:
+    def calculate_advanced_stats(data: Union[List[float], np.ndarray]) -> Dict[str, float]:
         """Calcula estadísticas avanzadas: asimetría, curtosis, etc."""
-        if not data or len(data) < 3:
+        if data is None or len(data) < 3:
             return {}
         
         data_array = np.array(data)
@@ -124,73 +146,773 @@ class DescriptiveStatistics:
         }
     
     @staticmethod
-    def calculate_weather_statistics(historical_data: List[Dict]) -> Dict[str, Dict]:
+    def calculate_batch_stats(matrix: np.ndarray, decimals: Optional[List[Optional[int]]] = None) -> List[Dict]:
+        """
+        Estadísticas básicas y avanzadas de varias series de igual longitud (una por
+        fila) en una sola pasada: los cuantiles salen de un único np.quantile por eje
+        y la varianza, asimetría y curtosis de los mismos momentos centrales.
+        Cada fila da el mismo resultado que calculate_basic_stats + calculate_advanced_stats.
+        
+        Las filas con resolución declarada en `decimals` cuyos valores caen sobre esa
+        grilla obtienen cuantiles y moda de un histograma de punto fijo (np.bincount),
+        sin ordenar; la interpolación es la de np.quantile, así que el redondeo coincide.
+        """
+        matrix = np.asarray(matrix, dtype=np.float64)
+        rows, n = matrix.shape
+        if n == 0:
+            return [{} for _ in range(rows)]
+        
+        mean = matrix.mean(axis=1)
+        minimum = matrix.min(axis=1)
+        maximum = matrix.max(axis=1)
+        
+        # Cuantiles y moda: histograma exacto para las filas sobre su grilla, orden para el resto
+        quantiles = np.empty((len(QUANTILE_LEVELS), rows))
+        mode = np.empty(rows)
+        grid = [
+            r for r in range(rows)
+            if decimals is not None and decimals[r] is not None and on_grid(matrix[r], decimals[r])
+        ]
+        if grid:
+            histogram = FixedPointHistogram([decimals[r] for r in grid])
+            histogram.update(matrix[grid].T)
+            quantiles[:, grid] = histogram.quantiles(QUANTILE_LEVELS)
+            mode[grid] = histogram.mode()
+        rest = [r for r in range(rows) if r not in grid]
+        if rest:
+            quantiles[:, rest] = np.quantile(matrix[rest], QUANTILE_LEVELS, axis=1)
+            mode[rest] = _sorted_mode(matrix[rest])
+        p10, q1, q2, q3, p90, p95, p99 = quantiles
+        
+        # Momentos centrales compartidos
+        centered = matrix - mean[:, None]
+        squared = centered * centered
+        m2 = squared.sum(axis=1)
+        m3 = (squared * centered).sum(axis=1)
+        m4 = (squared * squared).sum(axis=1)
+        variance = m2 / (n - 1) if n > 1 else np.full(rows, np.nan)
+        std_dev = np.sqrt(variance)
+        
+        # Intervalo de confianza al 95% (t crítico común: todas las filas tienen n datos)
+        t_critical = stats.t.ppf(1 - 0.05 / 2, df=n - 1) if n > 1 else 1.96
+        sem = std_dev / math.sqrt(n)
+        
+        results = []
+        for r in range(rows):
+            cv = (std_dev[r] / mean[r] * 100) if mean[r] != 0 else 0
+            result = {
+                "count": n,
+                "mean": round(float(mean[r]), 2),
+                "median": round(float(q2[r]), 2),
+                "mode": round(float(mode[r]), 2),
+                "stdDev": round(float(std_dev[r]), 2),
+                "variance": round(float(variance[r]), 2),
+                "min": round(float(minimum[r]), 2),
+                "max": round(float(maximum[r]), 2),
+                "range": round(float(maximum[r] - minimum[r]), 2),
+                "q1": round(float(q1[r]), 2),
+                "q2": round(float(q2[r]), 2),
+                "q3": round(float(q3[r]), 2),
+                "iqr": round(float(q3[r] - q1[r]), 2),
+                "p10": round(float(p10[r]), 2),
+                "p90": round(float(p90[r]), 2),
+                "p95": round(float(p95[r]), 2),
+                "p99": round(float(p99[r]), 2),
+                "coefficientOfVariation": round(float(cv), 2)
+            }
+            
+            if n >= 3:
+                if std_dev[r] == 0:
+                    skewness = kurtosis = 0.0
+                else:
+                    skewness = (n / ((n - 1) * (n - 2))) * m3[r] / std_dev[r] ** 3
+                    kurtosis = (n * (n + 1) / ((n - 1) * (n - 2) * (n - 3))) * m4[r] / std_dev[r] ** 4 - 3 * (n - 1) ** 2 / ((n - 2) * (n - 3)) if n > 3 else 0.0
+                margin_error = t_critical * sem[r]
+                result.update({
+                    "skewness": round(float(skewness), 3),
+                    "kurtosis": round(float(kurtosis), 3),
+                    "standardError": round(float(sem[r]), 3),
+                    "confidenceInterval95": {
+                        "lower": round(float(mean[r] - margin_error), 2),
+                        "upper": round(float(mean[r] + margin_error), 2),
+                        "margin": round(float(margin_error), 2)
+                    }
+                })
+            results.append(result)
+        
+        return results
+    
+    @staticmethod
+    def calculate_sketch_stats(moments: "MomentAccumulator", sketch, names: List[str]) -> Dict[str, Dict]:
+        """
+        Estadísticas completas desde agregados, sin recorrer las lecturas: momentos,
+        mínimo y máximo exactos del acumulador; cuantiles y moda del histograma de
+        punto fijo (exactos) o del sketch KLL (exactos mientras no haya compactado).
+        """
+        results = moments.summary(names)
+        if not results:
+            return {}
+        
+        p10, q1, q2, q3, p90, p95, p99 = sketch.quantiles(QUANTILE_LEVELS)
+        mode = sketch.mode()
+        for i, name in enumerate(names):
+            results[name].update({
+                "median": round(float(q2[i]), 2),
+                "mode": round(float(mode[i]), 2),
+                "q1": round(float(q1[i]), 2),
+                "q2": round(float(q2[i]), 2),
+                "q3": round(float(q3[i]), 2),
+                "iqr": round(float(q3[i] - q1[i]), 2),
+                "p10": round(float(p10[i]), 2),
+                "p90": round(float(p90[i]), 2),
+                "p95": round(float(p95[i]), 2),
+                "p99": round(float(p99[i]), 2)
+            })
+        return results
+    
+    @staticmethod
+    def calculate_weather_statistics(historical_data: HistoricalData) -> Dict[str, Dict]:
         """Calcula estadísticas descriptivas para todas las variables meteorológicas"""
-        if not historical_data:
+        if historical_data is None or len(historical_data) == 0:
             return {}
         
-        # Extraer variables
-        temperatures = [d.get("temperature", 0) for d in historical_data]
-        humidity = [d.get("humidity", 0) for d in historical_data]
-        wind_speed = [d.get("windSpeed", 0) for d in historical_data]
-        pressure = [d.get("pressure", 0) for d in historical_data]
-        precipitation = [d.get("precipitation", 0) for d in historical_data]
-        solar_radiation = [d.get("solarRadiation", 0) for d in historical_data if d.get("solarRadiation") is not None]
-        uv_index = [d.get("uvIndex", 0) for d in historical_data if d.get("uvIndex") is not None]
-        pm25 = [d.get("pm25", 0) for d in historical_data if d.get("pm25") is not None]
-        pm10 = [d.get("pm10", 0) for d in historical_data if d.get("pm10") is not None]
+        # Extraer variables (las columnas de un TimeSeriesFrame se usan directamente)
+        if isinstance(historical_data, TimeSeriesFrame):
+            variables = {name: historical_data.values(name) for name in STATISTICS_VARIABLES}
+        else:
+            variables = {
+                "temperature": [d.get("temperature", 0) for d in historical_data],
+                "humidity": [d.get("humidity", 0) for d in historical_data],
+                "windSpeed": [d.get("windSpeed", 0) for d in historical_data],
+                "pressure": [d.get("pressure", 0) for d in historical_data],
+                "precipitation": [d.get("precipitation", 0) for d in historical_data],
+            }
+            for name in ["solarRadiation", "uvIndex", "pm25", "pm10"]:
+                variables[name] = [d.get(name, 0) for d in historical_data if d.get(name) is not None]
         
-        stats = {}
+        # Las variables con la misma cantidad de datos se calculan juntas como una matriz
+        groups: Dict[int, List[str]] = {}
+        for name, values in variables.items():
+            if len(values) > 0:
+                groups.setdefault(len(values), []).append(name)
         
-        # Calcular estadísticas para cada variable
-        if temperatures:
-            stats["temperature"] = DescriptiveStatistics.calculate_basic_stats(temperatures)
-            stats["temperature"].update(DescriptiveStatistics.calculate_advanced_stats(temperatures))
+        results = {}
+        for names in groups.values():
+            matrix = np.array([variables[name] for name in names], dtype=np.float64)
+            batch = DescriptiveStatistics.calculate_batch_stats(matrix, declared_decimals(names))
+            for name, result in zip(names, batch):
+                results[name] = result
         
-        if humidity:
-            stats["humidity"] = DescriptiveStatistics.calculate_basic_stats(humidity)
-            stats["humidity"].update(DescriptiveStatistics.calculate_advanced_stats(humidity))
+        return {name: results[name] for name in variables if name in results}
+
+
+def _sorted_mode(matrix: np.ndarray) -> np.ndarray:
+    """Moda de cada fila (la menor en caso de empate), desde las filas ordenadas"""
+    rows, n = matrix.shape
+    ordered = np.sort(matrix, axis=1)
+    starts = np.ones((rows, n), dtype=bool)
+    starts[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    run_id = np.cumsum(starts, axis=1) - 1
+    run_length = np.zeros((rows, n), dtype=np.int64)
+    np.add.at(run_length, (np.arange(rows)[:, None], run_id), 1)
+    first_max = np.argmax(run_length, axis=1)
+    return np.array([ordered[r][starts[r]][first_max[r]] for r in range(rows)])
+
+
+class MomentAccumulator:
+    """
+    Momentos centrales en línea (Welford/Terriberry) de varias variables a la vez:
+    n, media, M2, M3, M4, mínimo y máximo, con un arreglo por momento.
+
+    `update` incorpora una lectura en O(1) y `merge` combina dos acumuladores
+    (fórmulas de Chan/Pébay), de modo que los acumuladores diarios se unen en ventanas.
+    """
+    
+    __slots__ = ("n", "mean", "m2", "m3", "m4", "min", "max")
+    
+    def __init__(self, variables: int):
+        self.n = 0
+        self.mean = np.zeros(variables)
+        self.m2 = np.zeros(variables)
+        self.m3 = np.zeros(variables)
+        self.m4 = np.zeros(variables)
+        self.min = np.full(variables, np.inf)
+        self.max = np.full(variables, -np.inf)
+    
+    @classmethod
+    def from_values(cls, matrix: np.ndarray) -> "MomentAccumulator":
+        """Acumulador de un bloque de lecturas (filas) calculado en forma directa"""
+        accumulator = cls(matrix.shape[1])
+        if len(matrix) == 0:
+            return accumulator
+        accumulator.n = len(matrix)
+        accumulator.mean = matrix.mean(axis=0)
+        centered = matrix - accumulator.mean
+        squared = centered * centered
+        accumulator.m2 = squared.sum(axis=0)
+        accumulator.m3 = (squared * centered).sum(axis=0)
+        accumulator.m4 = (squared * squared).sum(axis=0)
+        accumulator.min = matrix.min(axis=0)
+        accumulator.max = matrix.max(axis=0)
+        return accumulator
+    
+    def update(self, x: np.ndarray) -> None:
+        """Incorpora una lectura (un valor por variable)"""
+        n1 = self.n
+        self.n += 1
+        n = self.n
+        delta = x - self.mean
+        delta_n = delta / n
+        delta_n2 = delta_n * delta_n
+        term1 = delta * delta_n * n1
+        self.mean = self.mean + delta_n
+        self.m4 = self.m4 + term1 * delta_n2 * (n * n - 3 * n + 3) + 6 * delta_n2 * self.m2 - 4 * delta_n * self.m3
+        self.m3 = self.m3 + term1 * delta_n * (n - 2) - 3 * delta_n * self.m2
+        self.m2 = self.m2 + term1
+        self.min = np.minimum(self.min, x)
+        self.max = np.maximum(self.max, x)
+    
+    def merge(self, other: "MomentAccumulator") -> None:
+        """Combina otro acumulador en este"""
+        if other.n == 0:
+            return
+        if self.n == 0:
+            for name in self.__slots__:
+                setattr(self, name, getattr(other, name))
+            return
         
-        if wind_speed:
-            stats["windSpeed"] = DescriptiveStatistics.calculate_basic_stats(wind_speed)
-            stats["windSpeed"].update(DescriptiveStatistics.calculate_advanced_stats(wind_speed))
+        na, nb = self.n, other.n
+        n = na + nb
+        delta = other.mean - self.mean
+        delta_n = delta / n
+        delta_n2 = delta_n * delta_n
+        m4 = (self.m4 + other.m4 + delta * delta_n * delta_n2 * na * nb * (na * na - na * nb + nb * nb)
+              + 6 * delta_n2 * (na * na * other.m2 + nb * nb * self.m2)
+              + 4 * delta_n * (na * other.m3 - nb * self.m3))
+        m3 = (self.m3 + other.m3 + delta * delta_n2 * na * nb * (na - nb)
+              + 3 * delta_n * (na * other.m2 - nb * self.m2))
+        self.m2 = self.m2 + other.m2 + delta * delta_n * na * nb
+        self.m3, self.m4 = m3, m4
+        self.mean = self.mean + nb * delta_n
+        self.n = n
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+    
+    @classmethod
+    def combine(cls, accumulators: List["MomentAccumulator"], variables: int) -> "MomentAccumulator":
+        """
+        Combina muchos acumuladores de una vez: los momentos de cada uno se trasladan
+        a la media global con arreglos apilados, sin fusionarlos de a pares.
+        """
+        accumulators = [accumulator for accumulator in accumulators if accumulator.n > 0]
+        result = cls(variables)
+        if not accumulators:
+            return result
         
-        if pressure:
-            stats["pressure"] = DescriptiveStatistics.calculate_basic_stats(pressure)
-            stats["pressure"].update(DescriptiveStatistics.calculate_advanced_stats(pressure))
+        n = np.array([accumulator.n for accumulator in accumulators], dtype=np.float64)[:, None]
+        means = np.array([accumulator.mean for accumulator in accumulators])
+        m2 = np.array([accumulator.m2 for accumulator in accumulators])
+        m3 = np.array([accumulator.m3 for accumulator in accumulators])
+        m4 = np.array([accumulator.m4 for accumulator in accumulators])
         
-        if precipitation:
-            stats["precipitation"] = DescriptiveStatistics.calculate_basic_stats(precipitation)
-            stats["precipitation"].update(DescriptiveStatistics.calculate_advanced_stats(precipitation))
+        result.n = int(n.sum())
+        result.mean = (n * means).sum(axis=0) / result.n
+        d = means - result.mean
+        d2 = d * d
+        result.m2 = (m2 + n * d2).sum(axis=0)
+        result.m3 = (m3 + 3 * d * m2 + n * d2 * d).sum(axis=0)
+        result.m4 = (m4 + 4 * d * m3 + 6 * d2 * m2 + n * d2 * d2).sum(axis=0)
+        result.min = np.min([accumulator.min for accumulator in accumulators], axis=0)
+        result.max = np.max([accumulator.max for accumulator in accumulators], axis=0)
+        return result
+    
+    def summary(self, names: List[str]) -> Dict[str, Dict]:
+        """Campos basados en momentos, con el redondeo de calculate_basic_stats/advanced_stats"""
+        n = self.n
+        if n < 2:
+            return {}
         
-        if solar_radiation:
-            stats["solarRadiation"] = DescriptiveStatistics.calculate_basic_stats(solar_radiation)
-            stats["solarRadiation"].update(DescriptiveStatistics.calculate_advanced_stats(solar_radiation))
+        variance = self.m2 / (n - 1)
+        std_dev = np.sqrt(variance)
+        sem = std_dev / math.sqrt(n)
+        margin = stats.t.ppf(1 - 0.05 / 2, df=n - 1) * sem
         
-        if uv_index:
-            stats["uvIndex"] = DescriptiveStatistics.calculate_basic_stats(uv_index)
-            stats["uvIndex"].update(DescriptiveStatistics.calculate_advanced_stats(uv_index))
+        results = {}
+        for i, name in enumerate(names):
+            mean, std = float(self.mean[i]), float(std_dev[i])
+            result = {
+                "count": n,
+                "mean": round(mean, 2),
+                "stdDev": round(std, 2),
+                "variance": round(float(variance[i]), 2),
+                "min": round(float(self.min[i]), 2),
+                "max": round(float(self.max[i]), 2),
+                "range": round(float(self.max[i] - self.min[i]), 2),
+                "coefficientOfVariation": round(std / mean * 100, 2) if mean != 0 else 0,
+                "standardError": round(float(sem[i]), 3),
+                "confidenceInterval95": {
+                    "lower": round(mean - float(margin[i]), 2),
+                    "upper": round(mean + float(margin[i]), 2),
+                    "margin": round(float(margin[i]), 2)
+                }
+            }
+            skewness = kurtosis = 0.0
+            if std > 0 and n >= 3:
+                skewness = n / ((n - 1) * (n - 2)) * float(self.m3[i]) / std ** 3
+            if std > 0 and n >= 4:
+                kurtosis = (n * (n + 1) / ((n - 1) * (n - 2) * (n - 3)) * float(self.m4[i]) / std ** 4
+                            - 3 * (n - 1) ** 2 / ((n - 2) * (n - 3)))
+            result["skewness"] = round(skewness, 3)
+            result["kurtosis"] = round(kurtosis, 3)
+            results[name] = result
         
-        if pm25:
-            stats["pm25"] = DescriptiveStatistics.calculate_basic_stats(pm25)
-            stats["pm25"].update(DescriptiveStatistics.calculate_advanced_stats(pm25))
+        return results
+
+
+class OnlineStatistics:
+    """
+    Estadísticas en línea de una estación: un acumulador total (todo lo cargado o
+    completado desde el arranque) y uno por día para las ventanas de N días.
+    El cálculo por lotes de DescriptiveStatistics queda como implementación de referencia.
+    """
+    
+    def __init__(self, variables: Optional[List[str]] = None):
+        self.variables = variables or STATISTICS_VARIABLES
+        self.total = MomentAccumulator(len(self.variables))
+        self.daily: Dict[np.datetime64, MomentAccumulator] = {}
+    
+    def add(self, frame: TimeSeriesFrame) -> None:
+        """Incorpora lecturas horarias: O(1) por lectura, por lotes diarios al sembrar"""
+        if len(frame) == 0:
+            return
+        values = np.column_stack([frame.values(name) for name in self.variables])
+        days = frame.index.astype("datetime64[D]")
+        for start, stop in _runs(days):
+            day = self.daily.setdefault(days[start], MomentAccumulator(len(self.variables)))
+            if stop - start == 1:
+                self.total.update(values[start])
+                day.update(values[start])
+            else:
+                block = MomentAccumulator.from_values(values[start:stop])
+                self.total.merge(block)
+                day.merge(block)
+    
+    def rebuild(self, frame: TimeSeriesFrame) -> None:
+        """Recalcula los días que toca el frame (con todas sus horas) y el total"""
+        values = np.column_stack([frame.values(name) for name in self.variables])
+        days = frame.index.astype("datetime64[D]")
+        for start, stop in _runs(days):
+            self.daily[days[start]] = MomentAccumulator.from_values(values[start:stop])
         
-        if pm10:
-            stats["pm10"] = DescriptiveStatistics.calculate_basic_stats(pm10)
-            stats["pm10"].update(DescriptiveStatistics.calculate_advanced_stats(pm10))
+        self.total = MomentAccumulator.combine(list(self.daily.values()), len(self.variables))
+    
+    def window(self, days: int, today: np.datetime64) -> MomentAccumulator:
+        """Acumulador de los últimos `days` días calendario (incluido el actual)"""
+        today = np.datetime64(today, "D")
+        return self.between(today - (days - 1), today)
+    
+    def between(self, first: np.datetime64, last: np.datetime64) -> MomentAccumulator:
+        """Acumulador de los días [first, last]"""
+        days = np.arange(np.datetime64(first, "D"), np.datetime64(last, "D") + 1)
+        return MomentAccumulator.combine(
+            [self.daily[day] for day in days if day in self.daily], len(self.variables)
+        )
+
+
+class SlidingRegression:
+    """
+    Recta de mínimos cuadrados (y = a + b·x, con x en horas) de varias variables
+    sobre una ventana deslizante de `window` lecturas.
+
+    Guarda los estadísticos suficientes en forma centrada: n, medias de x e y y
+    los co-momentos Sxx, Sxy y Syy (equivalentes a Σx, Σy, Σxy, Σx², Σy² pero sin
+    cancelación numérica). Una lectura que entra o sale de la ventana actualiza el
+    ajuste en O(1) (Welford con downdating), sin reajustar la ventana completa.
+    El MAE no se deriva de los estadísticos: `mean_absolute_error` lo calcula con
+    los residuos de la ventana, O(window), cuando se lo necesita.
+    """
+    
+    __slots__ = ("window", "n", "mean_x", "mean_y", "sxx", "sxy", "syy", "last", "last_values")
+    
+    def __init__(self, window: int, variables: int):
+        self.window = window
+        self.n = 0
+        self.mean_x = 0.0
+        self.mean_y = np.zeros(variables)
+        self.sxx = 0.0
+        self.sxy = np.zeros(variables)
+        self.syy = np.zeros(variables)
+        self.last: Optional[np.datetime64] = None
+        self.last_values: Optional[np.ndarray] = None
+    
+    @classmethod
+    def from_values(cls, window: int, first_x: float, matrix: np.ndarray) -> "SlidingRegression":
+        """Ajuste inicial de lecturas consecutivas (n × variables) con sumas vectorizadas"""
+        model = cls(window, matrix.shape[1])
+        n = len(matrix)
+        if n == 0:
+            return model
+        dx = np.arange(n, dtype=np.float64) - (n - 1) / 2
+        model.n = n
+        model.mean_x = first_x + (n - 1) / 2
+        model.mean_y = matrix.mean(axis=0)
+        dy = matrix - model.mean_y
+        model.sxx = float(dx @ dx)
+        model.sxy = dx @ dy
+        model.syy = np.einsum("ij,ij->j", dy, dy)
+        return model
+    
+    def add(self, x: float, y: np.ndarray) -> None:
+        """Incorpora la lectura (x, y) con un valor por variable"""
+        self.n += 1
+        dx = x - self.mean_x
+        dy = y - self.mean_y
+        self.mean_x += dx / self.n
+        self.mean_y = self.mean_y + dy / self.n
+        self.sxx += dx * (x - self.mean_x)
+        self.sxy = self.sxy + dx * (y - self.mean_y)
+        self.syy = self.syy + dy * (y - self.mean_y)
+    
+    def remove(self, x: float, y: np.ndarray) -> None:
+        """Quita una lectura incorporada antes (inversa exacta de `add`)"""
+        if self.n <= 1:
+            self.__init__(self.window, len(self.mean_y))
+            return
+        mean_x = (self.n * self.mean_x - x) / (self.n - 1)
+        mean_y = (self.n * self.mean_y - y) / (self.n - 1)
+        self.sxx -= (x - mean_x) * (x - self.mean_x)
+        self.sxy = self.sxy - (x - mean_x) * (y - self.mean_y)
+        self.syy = self.syy - (y - mean_y) * (y - self.mean_y)
+        self.mean_x, self.mean_y = mean_x, mean_y
+        self.n -= 1
+    
+    def replace(self, x: float, old: np.ndarray, new: np.ndarray) -> None:
+        """Actualiza el valor de una lectura ya incorporada (la hora en curso)"""
+        if not np.array_equal(old, new):
+            self.remove(x, old)
+            self.add(x, new)
+    
+    @property
+    def first_x(self) -> float:
+        """x de la lectura más antigua (la ventana es de horas consecutivas)"""
+        return self.mean_x if self.n == 0 else float(hour_number(self.last)) - (self.n - 1)
+    
+    @staticmethod
+    def mean_absolute_error(fit: Dict[str, np.ndarray], matrix: np.ndarray) -> np.ndarray:
+        """MAE de un ajuste sobre las lecturas de su ventana (n × variables, la más antigua primero)"""
+        x = np.arange(len(matrix), dtype=np.float64)[:, None]
+        return np.abs(matrix - (x * fit["coefficient"] + fit["intercept"])).mean(axis=0)
+    
+    def fit(self) -> Dict[str, np.ndarray]:
+        """
+        Coeficientes y métricas en el formato de LinearRegressionPredictor.fit_batch,
+        con x = 0 en la lectura más antigua de la ventana. Sin "mae": se agrega con
+        `mean_absolute_error` antes de usar el ajuste en predict_from_fit.
+        """
+        # El downdating deja un residuo de redondeo en las series constantes. Con la
+        # resolución de los sensores (0.1 o mayor) una ventana no constante tiene
+        # Syy >= 0.005, así que por debajo de SLIDING_REGRESSION_TOLERANCE Syy es 0
+        syy = np.where(self.syy > SLIDING_REGRESSION_TOLERANCE, self.syy, 0.0)
+        sxy = np.where(syy > 0, self.sxy, 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            coefficient = np.where(self.sxx > 0, sxy / self.sxx, 0.0)
+            ss_res = np.maximum(syy - coefficient * sxy, 0.0)
+            r2 = np.where(syy != 0, 1 - ss_res / syy, np.where(ss_res != 0, 0.0, 1.0))
+        intercept = self.mean_y - coefficient * (self.mean_x - self.first_x)
+        mse = ss_res / max(self.n, 1)
+        return {
+            "coefficient": coefficient,
+            "intercept": intercept,
+            "r2": r2,
+            "mse": mse,
+            "rmse": np.sqrt(mse),
+            "std_residuals": np.sqrt(mse),
+            "last_index": float(self.n - 1)
+        }
+
+
+def _finite_values(values: np.ndarray) -> list:
+    """Arreglo como lista de Python, con los valores no finitos como None"""
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    if finite.all():
+        return values.tolist()
+    result = values.astype(object)
+    result[~finite] = None
+    return result.tolist()
+
+
+def hour_number(timestamp: np.datetime64) -> int:
+    """Horas desde la época (coordenada x de las regresiones deslizantes)"""
+    return int(np.datetime64(timestamp, "h").astype(np.int64))
+
+
+def _runs(keys: np.ndarray) -> List[Tuple[int, int]]:
+    """Tramos [start, stop) de claves iguales consecutivas"""
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    stops = np.r_[starts[1:], len(keys)]
+    return list(zip(starts.tolist(), stops.tolist()))
+
+
+class _SkiplistEnd:
+    """Centinela final del skiplist: mayor que cualquier valor"""
+    
+    def __lt__(self, other):
+        return False
+    
+    def __le__(self, other):
+        return False
+
+
+class _SkiplistNode:
+    __slots__ = ("value", "next", "width")
+    
+    def __init__(self, value, next: list, width: List[int]):
+        self.value = value
+        self.next = next
+        self.width = width
+
+
+_SKIPLIST_NIL = _SkiplistNode(_SkiplistEnd(), [], [])
+
+
+class IndexableSkiplist:
+    """
+    Lista ordenada con inserción, borrado y acceso por posición en O(log n) esperado.
+    Cada enlace guarda cuántos elementos salta (su ancho), lo que permite llegar al
+    k-ésimo elemento bajando por los niveles.
+    """
+    
+    def __init__(self, expected_size: int = 100, seed: int = 0):
+        self.size = 0
+        self.maxlevels = int(1 + math.log2(max(expected_size, 2)))
+        self.head = _SkiplistNode(None, [_SKIPLIST_NIL] * self.maxlevels, [1] * self.maxlevels)
+        self._random = random.Random(seed)
+    
+    def __len__(self) -> int:
+        return self.size
+    
+    def __getitem__(self, i: int) -> float:
+        return self._node(i).value
+    
+    def _node(self, i: int) -> _SkiplistNode:
+        if not 0 <= i < self.size:
+            raise IndexError(i)
+        node = self.head
+        i += 1
+        for level in reversed(range(self.maxlevels)):
+            while node.width[level] <= i:
+                i -= node.width[level]
+                node = node.next[level]
+        return node
+    
+    def pair(self, i: int) -> Tuple[float, float]:
+        """Elementos i e i+1 (el siguiente sale del enlace del nivel 0, sin otra búsqueda)"""
+        node = self._node(i)
+        following = node.next[0]
+        return node.value, (node.value if following is _SKIPLIST_NIL else following.value)
+    
+    def insert(self, value: float) -> None:
+        """Inserta un valor manteniendo el orden"""
+        chain = [None] * self.maxlevels
+        steps_at_level = [0] * self.maxlevels
+        node = self.head
+        for level in reversed(range(self.maxlevels)):
+            while node.next[level].value <= value:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+        
+        # Altura geométrica: la mitad de los nodos sube a cada nivel siguiente
+        height = min(self.maxlevels, 1 - int(math.log2(1.0 - self._random.random())))
+        new = _SkiplistNode(value, [None] * height, [0] * height)
+        steps = 0
+        for level in range(height):
+            previous = chain[level]
+            new.next[level] = previous.next[level]
+            previous.next[level] = new
+            new.width[level] = previous.width[level] - steps
+            previous.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(height, self.maxlevels):
+            chain[level].width[level] += 1
+        self.size += 1
+    
+    def remove(self, value: float) -> None:
+        """Elimina una ocurrencia del valor (KeyError si no está)"""
+        chain = [None] * self.maxlevels
+        node = self.head
+        for level in reversed(range(self.maxlevels)):
+            while node.next[level].value < value:
+                node = node.next[level]
+            chain[level] = node
+        
+        target = chain[0].next[0]
+        if target is _SKIPLIST_NIL or target.value != value:
+            raise KeyError(value)
+        for level in range(len(target.next)):
+            previous = chain[level]
+            previous.width[level] += target.width[level] - 1
+            previous.next[level] = target.next[level]
+        for level in range(len(target.next), self.maxlevels):
+            chain[level].width[level] -= 1
+        self.size -= 1
+
+
+class RollingQuantiles:
+    """
+    Cuantiles de una ventana deslizante de tamaño fijo: cada lectura nueva se
+    inserta y la que sale de la ventana se borra del skiplist, O(log w) por paso,
+    en lugar de reordenar la ventana completa en cada posición.
+    """
+    
+    def __init__(self, window: int, levels: Sequence[float] = (0.5,)):
+        self.window = window
+        self.levels = list(levels)
+        self._values: deque = deque()
+        self._sorted = IndexableSkiplist(window)
+    
+    def __len__(self) -> int:
+        return len(self._values)
+    
+    def push(self, value: float) -> None:
+        """Agrega una lectura y descarta la más antigua si la ventana está llena"""
+        self._values.append(value)
+        self._sorted.insert(value)
+        if len(self._values) > self.window:
+            self._sorted.remove(self._values.popleft())
+    
+    def quantiles(self) -> List[float]:
+        """Cuantiles de la ventana actual (interpolación lineal, como np.quantile)"""
+        n = len(self._sorted)
+        result = []
+        for q in self.levels:
+            rank = q * (n - 1)
+            low = int(rank)
+            value, following = self._sorted.pair(low)
+            if rank > low:
+                value += (following - value) * (rank - low)
+            result.append(value)
+        return result
+    
+    @staticmethod
+    def series(values: np.ndarray, window: int, step: int, levels: Sequence[float]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Cuantiles móviles de una serie: posiciones finales de cada ventana completa
+        (cada `step` lecturas) y una fila de cuantiles por posición.
+        """
+        ends = np.arange(window - 1, len(values), step)
+        result = np.empty((len(ends), len(levels)))
+        rolling = RollingQuantiles(window, levels)
+        row = 0
+        for i, value in enumerate(values.tolist()):
+            rolling.push(value)
+            if row < len(ends) and i == ends[row]:
+                result[row] = rolling.quantiles()
+                row += 1
+        return ends, result
+
+
+ROLLING_AGGREGATES = ("mean", "sum", "min", "max", "std", "ewma")
+
+
+class RollingAggregates:
+    """
+    Agregados móviles de una serie en O(n) sin importar el tamaño de la ventana:
+    - suma, media y desviación estándar desde sumas acumuladas (de la serie centrada,
+      para no perder precisión en x²);
+    - mínimo y máximo con el algoritmo de van Herk/Gil-Werman: extremos acumulados hacia
+      adelante y hacia atrás dentro de bloques de `window` lecturas, de modo que el
+      extremo de cualquier ventana combina dos valores precalculados;
+    - EWMA con α = 2 / (window + 1), como un filtro recursivo de primer orden.
+    """
+    
+    @staticmethod
+    def window_sums(values: np.ndarray, window: int, ends: np.ndarray) -> np.ndarray:
+        """Suma de cada ventana que termina en `ends`"""
+        cumulative = np.concatenate([[0.0], np.cumsum(values)])
+        return cumulative[ends + 1] - cumulative[ends + 1 - window]
+    
+    @staticmethod
+    def window_extreme(values: np.ndarray, window: int, ends: np.ndarray, ufunc: np.ufunc) -> np.ndarray:
+        """Mínimo (np.minimum) o máximo (np.maximum) de cada ventana que termina en `ends`"""
+        n = len(values)
+        blocks = -(-n // window)
+        fill = np.inf if ufunc is np.minimum else -np.inf
+        padded = np.full(blocks * window, fill)
+        padded[:n] = values
+        grid = padded.reshape(blocks, window)
+        forward = ufunc.accumulate(grid, axis=1).ravel()
+        backward = ufunc.accumulate(grid[:, ::-1], axis=1)[:, ::-1].ravel()
+        # La ventana [e - w + 1, e] cruza a lo sumo un borde de bloque
+        return ufunc(backward[ends + 1 - window], forward[ends])
+    
+    @staticmethod
+    def ewma(values: np.ndarray, window: int) -> np.ndarray:
+        """Media móvil exponencial (arranca en la primera lectura)"""
+        alpha = 2 / (window + 1)
+        smoothed, _ = lfilter([alpha], [1, alpha - 1], values, zi=[(1 - alpha) * values[0]])
+        return smoothed
+    
+    @staticmethod
+    def series(
+        values: np.ndarray,
+        window: int,
+        step: int,
+        aggregates: Sequence[str]
+    ) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """
+        Agregados móviles de una serie: posiciones finales de cada ventana completa
+        (cada `step` lecturas) y un arreglo por agregado.
+        """
+        ends = np.arange(window - 1, len(values), step)
+        result: Dict[str, np.ndarray] = {}
+        if len(ends) == 0:
+            return ends, {name: np.empty(0) for name in aggregates}
         
-        return stats
+        if {"sum", "mean", "std"} & set(aggregates):
+            offset = values.mean()
+            centered = values - offset
+            sums = RollingAggregates.window_sums(centered, window, ends)
+            if "sum" in aggregates:
+                result["sum"] = sums + offset * window
+            if "mean" in aggregates:
+                result["mean"] = sums / window + offset
+            if "std" in aggregates:
+                # Muestral (ddof=1), como stdDev en /statistics
+                squares = RollingAggregates.window_sums(centered ** 2, window, ends)
+                if window > 1:
+                    variance = np.maximum(squares - sums ** 2 / window, 0) / (window - 1)
+                    result["std"] = np.sqrt(variance)
+                else:
+                    result["std"] = np.zeros(len(ends))
+        if "min" in aggregates:
+            result["min"] = RollingAggregates.window_extreme(values, window, ends, np.minimum)
+        if "max" in aggregates:
+            result["max"] = RollingAggregates.window_extreme(values, window, ends, np.maximum)
+        if "ewma" in aggregates:
+            result["ewma"] = RollingAggregates.ewma(values, window)[ends]
+        return ends, {name: result[name] for name in aggregates}
+
+
+# Etiquetas "HH:MM" de cada minuto del día (horizontes de predicción)
+_CLOCK_LABELS = np.array([f"{minute // 60:02d}:{minute % 60:02d}" for minute in range(24 * 60)])
 
 
 class LinearRegressionPredictor:
     """Clase para realizar predicciones usando regresión lineal"""
     
     @staticmethod
-    def prepare_time_series_data(historical_data: List[Dict], variable: str) -> Tuple[np.ndarray, np.ndarray]:
+    def prepare_time_series_data(historical_data: HistoricalData, variable: str) -> Tuple[np.ndarray, np.ndarray]:
         """Prepara datos de serie temporal para regresión"""
-        if not historical_data:
+        if historical_data is None or len(historical_data) == 0:
             return np.array([]), np.array([])
         
+        # Un TimeSeriesFrame ya trae la columna como arreglo
+        if isinstance(historical_data, TimeSeriesFrame):
+            y = historical_data.values(variable)
+            return np.arange(len(y)).reshape(-1, 1), y
+        
         # Extraer timestamps y valores
         timestamps = []
         values = []
@@ -218,142 +940,263 @@ class LinearRegressionPredictor:
         return X, y
     
     @staticmethod
-    def predict_future(
-        historical_data: List[Dict],
-        variable: str,
-        hours_ahead: int = 24
-    ) -> Dict:
-        """Predice valores futuros usando regresión lineal"""
-        if not historical_data or len(historical_data) < 2:
-            return {
-                "error": "Datos insuficientes para realizar predicción",
-                "predictions": []
-            }
-        
-        # Preparar datos
-        X, y = LinearRegressionPredictor.prepare_time_series_data(historical_data, variable)
+    def fit_batch(X: np.ndarray, Y: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Ajusta una recta por columna de Y (n × k) sobre el mismo X con un único lstsq
+        y calcula todas las métricas vectorizadas. Reproduce LinearRegression de
+        scikit-learn (datos centrados) y sus métricas r2, mse y mae.
+        """
+        x = np.asarray(X, dtype=np.float64).reshape(-1)
+        Y = np.asarray(Y, dtype=np.float64).reshape(len(x), -1)
+        x_mean = x.mean()
+        y_mean = Y.mean(axis=0)
         
-        if len(X) == 0 or len(y) == 0:
-            return {
-                "error": "No se pudieron extraer datos válidos",
-                "predictions": []
-            }
+        coefficient = np.linalg.lstsq((x - x_mean)[:, None], Y - y_mean, rcond=None)[0][0]
+        intercept = y_mean - x_mean * coefficient
+        fitted = x[:, None] * coefficient + intercept
+        residuals = Y - fitted
         
-        # Entrenar modelo de regresión lineal
-        model = LinearRegression()
-        model.fit(X, y)
+        # r2 como r2_score: 1 si la serie es constante y el ajuste perfecto, 0 si no lo es
+        ss_res = (residuals ** 2).sum(axis=0)
+        ss_tot = ((Y - y_mean) ** 2).sum(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r2 = np.where(ss_tot != 0, 1 - ss_res / ss_tot, np.where(ss_res != 0, 0.0, 1.0))
+        mse = (residuals ** 2).mean(axis=0)
         
-        # Calcular métricas del modelo
-        y_pred = model.predict(X)
-        r2 = r2_score(y, y_pred)
-        mse = mean_squared_error(y, y_pred)
-        rmse = math.sqrt(mse)
-        mae = mean_absolute_error(y, y_pred)
+        return {
+            "coefficient": coefficient,
+            "intercept": intercept,
+            "r2": r2,
+            "mse": mse,
+            "rmse": np.sqrt(mse),
+            "mae": np.abs(residuals).mean(axis=0),
+            "std_residuals": residuals.std(axis=0),
+            "last_index": x[-1]
+        }
+    
+    @staticmethod
+    def horizon(hours_ahead: int, base_time: Optional[datetime] = None) -> Dict[str, np.ndarray]:
+        """
+        Columnas de tiempo del horizonte de predicción, calculadas una vez con
+        aritmética de datetime64 y compartidas por todas las variables: timestamp ISO
+        (con Z), hora "HH:MM" y fecha-hora "YYYY-MM-DD HH:MM:SS".
+        """
+        base = np.datetime64(base_time or datetime.now(), "us")
+        times = base + np.arange(1, hours_ahead + 1) * np.timedelta64(1, "h")
+        minutes = (times - times.astype("datetime64[D]")) // np.timedelta64(1, "m")
+        return {
+            "timestamp": np.char.add(np.datetime_as_string(times, unit="us"), "Z"),
+            "time": _CLOCK_LABELS[minutes],
+            "datetime": np.char.replace(np.datetime_as_string(times, unit="s"), "T", " ")
+        }
+    
+    @staticmethod
+    def _prediction_result(
+        variable: str,
+        fit: Dict[str, np.ndarray],
+        j: int,
+        data_points: int,
+        horizon: Dict[str, np.ndarray]
+    ) -> Dict:
+        """
+        Resultado de una variable (columna j del ajuste por lotes). Las predicciones
+        van en columnas ("forecast"): el horizonte compartido más las predicciones y
+        los límites del intervalo como arreglos.
+        """
+        coefficient = float(fit["coefficient"][j])
+        intercept = float(fit["intercept"][j])
+        hours_ahead = len(horizon["timestamp"])
         
         # Generar predicciones futuras
-        last_index = len(X) - 1
-        future_indices = np.array(range(last_index + 1, last_index + 1 + hours_ahead)).reshape(-1, 1)
-        future_predictions = model.predict(future_indices)
+        future_indices = fit["last_index"] + np.arange(1, hours_ahead + 1)
+        future_predictions = future_indices * coefficient + intercept
         
-        # Calcular intervalos de confianza (simplificado)
-        residuals = y - y_pred
-        std_residuals = np.std(residuals)
-        
-        predictions = []
-        base_time = datetime.now()
-        
-        for i, pred_value in enumerate(future_predictions):
-            prediction_time = base_time + timedelta(hours=i + 1)
-            
-            # Intervalo de confianza al 95% (aproximado)
-            confidence_interval = 1.96 * std_residuals
-            
-            predictions.append({
-                "timestamp": prediction_time.isoformat() + "Z",
-                "time": prediction_time.strftime("%H:%M"),
-                "datetime": prediction_time.strftime("%Y-%m-%d %H:%M:%S"),
-                "predicted": round(float(pred_value), 2),
-                "lowerBound": round(float(pred_value - confidence_interval), 2),
-                "upperBound": round(float(pred_value + confidence_interval), 2),
-                "confidence": 95
-            })
+        # Intervalo de confianza al 95% (aproximado)
+        confidence_interval = 1.96 * float(fit["std_residuals"][j])
         
         return {
             "variable": variable,
             "model": {
                 "type": "linear_regression",
-                "coefficient": round(float(model.coef_[0]), 4),
-                "intercept": round(float(model.intercept_), 2),
-                "r2": round(float(r2), 4),
-                "rmse": round(float(rmse), 2),
-                "mae": round(float(mae), 2),
-                "mse": round(float(mse), 2)
+                "coefficient": round(coefficient, 4),
+                "intercept": round(intercept, 2),
+                "r2": round(float(fit["r2"][j]), 4),
+                "rmse": round(float(fit["rmse"][j]), 2),
+                "mae": round(float(fit["mae"][j]), 2),
+                "mse": round(float(fit["mse"][j]), 2)
+            },
+            "forecast": {
+                **horizon,
+                "predicted": np.round(future_predictions, 2),
+                "lowerBound": np.round(future_predictions - confidence_interval, 2),
+                "upperBound": np.round(future_predictions + confidence_interval, 2)
             },
-            "predictions": predictions,
-            "dataPoints": len(X),
+            "dataPoints": data_points,
             "hoursAhead": hours_ahead
         }
     
+    @staticmethod
+    def prediction_rows(forecast: Dict[str, np.ndarray]) -> List[Dict]:
+        """
+        Columnas de un "forecast" como lista de puntos (formato de RegressionPrediction).
+        Los valores no finitos (NaN, inf) quedan como None (null en JSON).
+        """
+        labels = ("timestamp", "time", "datetime")
+        values = ("predicted", "lowerBound", "upperBound")
+        columns = [forecast[key].tolist() for key in labels] + [_finite_values(forecast[key]) for key in values]
+        return [
+            {**dict(zip(labels + values, row)), "confidence": 95}
+            for row in zip(*columns)
+        ]
+    
+    @staticmethod
+    def predict_from_fit(
+        fit: Dict[str, np.ndarray],
+        names: List[str],
+        variables: List[str],
+        data_points: int,
+        hours_ahead: int = 24
+    ) -> Dict:
+        """
+        Predicciones desde un ajuste ya calculado (columnas `names`), p. ej. una
+        SlidingRegression. Devuelve las predicciones en columnas ("forecast").
+        """
+        if data_points < 2:
+            return {
+                variable: {"error": "Datos insuficientes para realizar predicción", "predictions": []}
+                for variable in variables
+            }
+        horizon = LinearRegressionPredictor.horizon(hours_ahead)
+        return {
+            variable: LinearRegressionPredictor._prediction_result(
+                variable, fit, names.index(variable), data_points, horizon
+            )
+            for variable in variables
+        }
+    
     @staticmethod
     def predict_multiple_variables(
-        historical_data: List[Dict],
+        historical_data: HistoricalData,
         variables: List[str],
         hours_ahead: int = 24
     ) -> Dict:
-        """Predice múltiples variables meteorológicas"""
-        results = {}
+        """
+        Predice múltiples variables meteorológicas. Las variables que comparten X
+        (todas, con un TimeSeriesFrame) se ajustan juntas con un solo lstsq.
+        """
+        if historical_data is None or len(historical_data) < 2:
+            return {
+                variable: {"error": "Datos insuficientes para realizar predicción", "predictions": []}
+                for variable in variables
+            }
         
+        results = {}
+        groups: Dict[bytes, Tuple[np.ndarray, List[str], List[np.ndarray]]] = {}
         for variable in variables:
-            prediction = LinearRegressionPredictor.predict_future(
-                historical_data,
-                variable,
-                hours_ahead
-            )
-            results[variable] = prediction
+            X, y = LinearRegressionPredictor.prepare_time_series_data(historical_data, variable)
+            if len(X) == 0 or len(y) == 0:
+                results[variable] = {"error": "No se pudieron extraer datos válidos", "predictions": []}
+                continue
+            group = groups.setdefault(X.tobytes(), (X, [], []))
+            group[1].append(variable)
+            group[2].append(y)
         
-        return results
+        horizon = LinearRegressionPredictor.horizon(hours_ahead)
+        for X, names, columns in groups.values():
+            fit = LinearRegressionPredictor.fit_batch(X, np.column_stack(columns))
+            for j, variable in enumerate(names):
+                result = LinearRegressionPredictor._prediction_result(variable, fit, j, len(X), horizon)
+                result["predictions"] = LinearRegressionPredictor.prediction_rows(result.pop("forecast"))
+                results[variable] = result
+        
+        return {variable: results[variable] for variable in variables}
 
 
 class CorrelationAnalysis:
     """Análisis de correlación entre variables meteorológicas"""
     
     @staticmethod
-    def calculate_correlation_matrix(historical_data: List[Dict]) -> Dict:
-        """Calcula matriz de correlación entre variables"""
-        if not historical_data or len(historical_data) < 2:
+    def _standardize(matrix: np.ndarray) -> np.ndarray:
+        """Columnas estandarizadas (media 0, varianza 1); las constantes quedan en 0"""
+        std = matrix.std(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(std > 0, (matrix - matrix.mean(axis=0)) / std, 0.0)
+    
+    @staticmethod
+    def lagged_correlation(z: np.ndarray, max_lag: int) -> np.ndarray:
+        """
+        Correlación cruzada de todas las columnas estandarizadas para los desfases
+        -max_lag..max_lag, vía FFT: O(n log n) por par en lugar de O(n · lags).
+        El resultado [lag, i, j] es la media de z_i[t] · z_j[t + lag] sobre el solapamiento.
+        """
+        n = len(z)
+        size = 1 << (2 * n - 1).bit_length()
+        spectrum = np.fft.rfft(z, size, axis=0)
+        
+        lags = np.arange(-max_lag, max_lag + 1)
+        overlap = (n - np.abs(lags)).astype(np.float64)
+        
+        # Espectro cruzado conj(Z_i) · Z_j de una fila de pares por vez (acota la memoria)
+        result = np.empty((len(lags), z.shape[1], z.shape[1]))
+        for i in range(z.shape[1]):
+            cross = np.fft.irfft(spectrum[:, i, None].conj() * spectrum, size, axis=0)
+            result[:, i, :] = cross[lags % size] / overlap[:, None]
+        return result
+    
+    @staticmethod
+    def calculate_correlation_matrix(
+        historical_data: HistoricalData,
+        variables: Optional[List[str]] = None,
+        method: str = "pearson",
+        max_lag: int = 0
+    ) -> Dict:
+        """
+        Calcula la matriz de correlación entre variables con un único producto de la
+        matriz estandarizada (Zᵀ·Z / n). Con method="spearman" se correlacionan los
+        rangos (empates promediados). Con max_lag > 0 agrega la correlación cruzada
+        desfasada de cada par, de -max_lag a max_lag horas.
+        """
+        if historical_data is None or len(historical_data) < 2:
             return {}
         
+        names = variables or CORRELATION_VARIABLES
+        
         # Extraer variables
-        variables = {
-            "temperature": [d.get("temperature", 0) for d in historical_data],
-            "humidity": [d.get("humidity", 0) for d in historical_data],
-            "windSpeed": [d.get("windSpeed", 0) for d in historical_data],
-            "pressure": [d.get("pressure", 0) for d in historical_data],
-            "precipitation": [d.get("precipitation", 0) for d in historical_data],
-        }
+        if isinstance(historical_data, TimeSeriesFrame):
+            columns = {name: historical_data.values(name) for name in names}
+        else:
+            columns = {name: [d.get(name, 0) for d in historical_data] for name in names}
         
         # Filtrar variables con datos válidos
-        valid_vars = {k: v for k, v in variables.items() if len(v) > 0}
+        var_names = [name for name, values in columns.items() if len(values) > 0]
         
-        if len(valid_vars) < 2:
+        if len(var_names) < 2:
             return {}
         
-        # Calcular matriz de correlación
-        correlation_matrix = {}
+        matrix = np.column_stack([np.asarray(columns[name], dtype=np.float64) for name in var_names])
+        if method == "spearman":
+            matrix = stats.rankdata(matrix, axis=0)
         
-        var_names = list(valid_vars.keys())
-        for i, var1 in enumerate(var_names):
-            correlation_matrix[var1] = {}
-            for var2 in var_names:
-                if var1 == var2:
-                    correlation_matrix[var1][var2] = 1.0
-                else:
-                    corr = np.corrcoef(valid_vars[var1], valid_vars[var2])[0, 1]
-                    correlation_matrix[var1][var2] = round(float(corr), 3) if not np.isnan(corr) else 0.0
+        z = CorrelationAnalysis._standardize(matrix)
+        n = len(z)
+        correlation = np.clip(np.round(z.T @ z / n, 3), -1.0, 1.0)
+        np.fill_diagonal(correlation, 1.0)
         
-        return {
-            "matrix": correlation_matrix,
+        rows = correlation.tolist()
+        result = {
+            "matrix": {name: dict(zip(var_names, row)) for name, row in zip(var_names, rows)},
             "variables": var_names,
-            "dataPoints": len(historical_data)
+            "dataPoints": len(historical_data),
+            "method": method
         }
-
+        
+        if max_lag > 0:
+            max_lag = min(max_lag, n - 1)
+            lagged = np.clip(np.round(CorrelationAnalysis.lagged_correlation(z, max_lag), 3), -1.0, 1.0)
+            result["lags"] = list(range(-max_lag, max_lag + 1))
+            result["lagged"] = {
+                var1: {var2: lagged[:, i, j].tolist() for j, var2 in enumerate(var_names) if j > i}
+                for i, var1 in enumerate(var_names[:-1])
+            }
+        
+        return result
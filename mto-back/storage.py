@@ -0,0 +1,417 @@
+"""
+Almacenamiento de Series Temporales
+Historial horario persistente por ubicación sobre arreglos NumPy preasignados
+"""
+
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+from archive import StationArchive
+from rollups import RollupPyramid
+from sketches import DEFAULT_ERROR, QuantileSummary, SketchPyramid, k_for_error
+from statistics import STATISTICS_VARIABLES, MomentAccumulator, OnlineStatistics, SlidingRegression, hour_number
+from sensors import WeatherSimulator
+from timeseries import FIELD_SPECS, INDEX_DTYPE, TimeSeriesFrame
+
+
+# Capacidad por defecto: 30 días de lecturas horarias
+DEFAULT_CAPACITY_HOURS = 720
+
+ONE_HOUR = np.timedelta64(1, "h")
+
+
+class TimeSeriesRingBuffer:
+    """
+    Buffer circular de lecturas horarias con una columna por campo de HistoricalDataPoint.
+
+    Cada fila se escribe dos veces (posición i e i + capacity), de modo que cualquier
+    ventana de hasta `capacity` filas es un slice contiguo y se devuelve sin copiar.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY_HOURS):
+        self.capacity = capacity
+        self.size = 0
+        self._head = 0  # Posición (módulo capacity) de la próxima fila a escribir
+        self._index = np.empty(2 * capacity, dtype=INDEX_DTYPE)
+        self._columns: Dict[str, np.ndarray] = {
+            name: np.empty(2 * capacity, dtype=dtype) for name, (dtype, _) in FIELD_SPECS.items()
+        }
+
+    @property
+    def last_timestamp(self) -> Optional[np.datetime64]:
+        """Timestamp de la lectura más reciente (None si está vacío)"""
+        if self.size == 0:
+            return None
+        return self._index[(self._head - 1) % self.capacity]
+
+    def write(self, frame: TimeSeriesFrame) -> None:
+        """
+        Agrega lecturas ordenadas por tiempo.
+
+        Si la primera lectura tiene el mismo timestamp que la última almacenada,
+        la reemplaza (la hora en curso se actualiza en cada tick).
+        """
+        timestamps = frame.index
+        n = len(timestamps)
+        if n == 0:
+            return
+
+        head = self._head
+        offset = 0
+        if self.size > 0 and timestamps[0] == self.last_timestamp:
+            head -= 1
+            offset = 1
+
+        # Si llegan más filas que la capacidad, solo se conservan las últimas
+        skip = max(0, n - self.capacity)
+        positions = (head + np.arange(skip, n)) % self.capacity
+        mirrored = positions + self.capacity
+        self._index[positions] = timestamps[skip:]
+        self._index[mirrored] = timestamps[skip:]
+        for name, column in self._columns.items():
+            values = frame[name][skip:]
+            column[positions] = values
+            column[mirrored] = values
+
+        self._head = (head + n) % self.capacity
+        self.size = min(self.capacity, self.size + n - offset)
+
+    def assign(self, frame: TimeSeriesFrame) -> int:
+        """
+        Sobrescribe en su lugar las filas del buffer con los mismos timestamps que el
+        frame (el buffer guarda horas contiguas). Devuelve el número de filas escritas.
+        """
+        last = self.last_timestamp
+        if last is None or len(frame) == 0:
+            return 0
+
+        offsets = ((last - frame.index) // ONE_HOUR).astype(np.int64)
+        inside = (offsets >= 0) & (offsets < self.size)
+        positions = (self._head - 1 - offsets[inside]) % self.capacity
+        matches = self._index[positions] == frame.index[inside]
+        rows = np.nonzero(inside)[0][matches]
+        positions = positions[matches]
+
+        mirrored = positions + self.capacity
+        for name, column in self._columns.items():
+            values = frame[name][rows]
+            column[positions] = values
+            column[mirrored] = values
+        return len(rows)
+
+    def window(self, hours: int) -> TimeSeriesFrame:
+        """Devuelve las últimas `hours` lecturas como vistas (sin copia) de las columnas"""
+        n = max(0, min(hours, self.size))
+        end = (self._head - 1) % self.capacity + self.capacity + 1
+        return TimeSeriesFrame(
+            self._index[end - n:end],
+            {name: column[end - n:end] for name, column in self._columns.items()}
+        )
+
+
+class HistoryStore:
+    """
+    Historial horario por ubicación, actualizado en cada tick.
+
+    El buffer de una ubicación se siembra la primera vez que se actualiza o se
+    consulta, usando el simulador que entrega `simulator_for(location_id)`.
+    Con un archivo en disco, las horas completas se archivan, la siembra reutiliza
+    lo ya archivado y las ventanas más largas que el buffer se leen del archivo.
+    Cada hora completa también se acumula en los rollups diarios y mensuales y en
+    las estadísticas en línea.
+    """
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_CAPACITY_HOURS,
+        simulator_for: Optional[Callable[[str], WeatherSimulator]] = None,
+        archive: Optional[StationArchive] = None,
+        backfill_hours: int = 0,
+        sketch_k: int = k_for_error(DEFAULT_ERROR)
+    ):
+        self.capacity = capacity
+        self.simulator_for = simulator_for
+        self.archive = archive
+        self.backfill_hours = backfill_hours
+        self.sketch_k = sketch_k
+        self._buffers: Dict[str, TimeSeriesRingBuffer] = {}
+        self._rollups: Dict[str, RollupPyramid] = {}
+        self._moments: Dict[str, OnlineStatistics] = {}
+        self._sketches: Dict[str, SketchPyramid] = {}
+        self._regressions: Dict[Tuple[str, int], SlidingRegression] = {}
+        self._completed_until: Dict[str, np.datetime64] = {}
+
+    def __contains__(self, location_id: str) -> bool:
+        return location_id in self._buffers
+
+    def location_ids(self) -> List[str]:
+        """Ubicaciones con historial en memoria"""
+        return list(self._buffers)
+
+    def _buffer(self, location_id: str) -> TimeSeriesRingBuffer:
+        """Buffer de la ubicación, sembrándolo si aún no existe"""
+        if location_id not in self._buffers:
+            self.update(location_id)
+        return self._buffers[location_id]
+
+    def update(
+        self,
+        location_id: str,
+        simulator: Optional[WeatherSimulator] = None,
+        now: Optional[datetime] = None
+    ) -> None:
+        """
+        Registra la lectura de la hora en curso.
+
+        La primera llamada siembra el buffer con `capacity` horas completas; las
+        siguientes regeneran la hora en curso y rellenan las horas que falten.
+        """
+        simulator = simulator or self.simulator_for(location_id)
+        buffer = self._buffers.get(location_id)
+        if buffer is None:
+            buffer = TimeSeriesRingBuffer(self.capacity)
+            self._buffers[location_id] = buffer
+
+        current = np.datetime64(now or datetime.now(), "h")
+        start = current - (self.capacity - 1) * ONE_HOUR
+        last = buffer.last_timestamp
+        if last is not None:
+            start = max(start, min(last.astype("datetime64[h]") + ONE_HOUR, current))
+
+        hours = np.arange(start, current + ONE_HOUR, ONE_HOUR).astype(INDEX_DTYPE)
+        if last is None:
+            self._seed_aggregates(location_id, simulator, hours[0])
+        if last is None and self.archive is not None:
+            buffer.write(self._seed_frame(location_id, simulator, hours))
+        else:
+            buffer.write(simulator.generate_frame_at(hours))
+
+        self._complete_hours(location_id, buffer, current)
+
+    def _seed_frame(self, location_id: str, simulator: WeatherSimulator, hours: np.ndarray) -> TimeSeriesFrame:
+        """Horas de la siembra: las archivadas se reutilizan y solo se generan las que faltan"""
+        archived = self.archive.read(location_id, hours[0], hours[-1])
+        missing = np.setdiff1d(hours, archived.index, assume_unique=True)
+        return TimeSeriesFrame.concat([archived, simulator.generate_frame_at(missing)])
+
+    def _seed_aggregates(self, location_id: str, simulator: WeatherSimulator, before: np.datetime64) -> None:
+        """
+        Rollups y estadísticas en línea de una estación recién cargada, reconstruidos
+        desde el archivo. Si no hay nada archivado antes del buffer, se generan
+        `backfill_hours` horas previas.
+        """
+        self._rollups[location_id] = RollupPyramid()
+        self._moments[location_id] = OnlineStatistics()
+        self._sketches[location_id] = SketchPyramid(self.sketch_k)
+        first = self.archive.first_hour(location_id) if self.archive is not None else None
+        if first is not None and first < before:
+            older = self.archive.read(location_id, first, before)
+        elif self.backfill_hours > 0:
+            older = simulator.generate_hour_range(before - self.backfill_hours * ONE_HOUR, before)
+            if self.archive is not None:
+                self.archive.append(location_id, older)
+        else:
+            return
+
+        self._accumulate(location_id, older)
+
+    def _accumulate(self, location_id: str, frame: TimeSeriesFrame) -> None:
+        """Incorpora horas completas a los rollups, las estadísticas en línea y los sketches"""
+        self._rollups[location_id].add(frame)
+        self._moments[location_id].add(frame)
+        self._sketches[location_id].add(frame)
+
+    def _complete_hours(self, location_id: str, buffer: TimeSeriesRingBuffer, current: np.datetime64) -> None:
+        """Archiva y acumula en los agregados las horas completadas desde el último tick"""
+        since = self._completed_until.get(location_id)
+        if since == current:
+            return
+        frame = buffer.window(self.capacity)
+        start = since.astype(INDEX_DTYPE) if since is not None else frame.index[0]
+        frame = frame.between(start, current.astype(INDEX_DTYPE))
+
+        if self.archive is not None:
+            self.archive.append(location_id, frame)
+        self._accumulate(location_id, frame)
+        self._completed_until[location_id] = current
+
+    def ingest(self, location_id: str, frame: TimeSeriesFrame) -> int:
+        """
+        Reemplaza las horas completas del frame (lecturas reales ingeridas) en el
+        buffer y el archivo, y recalcula los agregados de los días afectados (los
+        meses se recombinan desde sus días). Sin archivo solo se conservan las horas
+        que caen dentro del buffer, y no se reemplazan las de un día que ya empezó a
+        salir del buffer: sus agregados no podrían recalcularse completos.
+        Devuelve el número de horas almacenadas.
+        """
+        buffer = self._buffer(location_id)
+        completed = self._completed_until[location_id].astype(INDEX_DTYPE)
+        frame = frame.between(frame.index[0], completed) if len(frame) else frame
+        if len(frame) > 0 and self.archive is None:
+            frame = self._rebuildable(location_id, buffer, frame, completed)
+        if len(frame) == 0:
+            return 0
+
+        written = buffer.assign(frame)
+        if self.archive is not None:
+            written = self.archive.append(location_id, frame, overwrite=True)
+
+        # Los días afectados se vuelven a acumular desde lo almacenado
+        days = frame.index.astype("datetime64[D]")
+        start = days[0].astype(INDEX_DTYPE)
+        end = min((days[-1] + 1).astype(INDEX_DTYPE), completed)
+        stored = self.range(location_id, start, end)
+        touched = np.isin(stored.index.astype("datetime64[D]"), np.unique(days))
+        if not touched.all():
+            stored = TimeSeriesFrame(stored.index[touched], {name: column[touched] for name, column in stored.columns.items()})
+        self._rollups[location_id].rebuild(stored)
+        self._moments[location_id].rebuild(stored)
+        self._sketches[location_id].rebuild(stored)
+        for key in [key for key in self._regressions if key[0] == location_id]:
+            del self._regressions[key]
+        return written
+
+    def _rebuildable(
+        self,
+        location_id: str,
+        buffer: TimeSeriesRingBuffer,
+        frame: TimeSeriesFrame,
+        completed: np.datetime64
+    ) -> TimeSeriesFrame:
+        """
+        Horas del frame cuyos días pueden recalcularse desde el buffer: todas las horas
+        completas que el día tiene acumuladas en los rollups siguen almacenadas.
+        """
+        index = buffer.window(self.capacity).index
+        stored = index[index < completed].astype("datetime64[D]")
+        days = frame.index.astype("datetime64[D]")
+        candidates, stored_hours = np.unique(stored, return_counts=True)
+        complete = candidates[self._rollups[location_id].daily.counts(candidates) == stored_hours]
+        keep = np.isin(days, complete)
+        if keep.all():
+            return frame
+        return TimeSeriesFrame(frame.index[keep], {name: column[keep] for name, column in frame.columns.items()})
+
+    def rollups(self, location_id: str) -> RollupPyramid:
+        """Rollups diarios y mensuales de las horas completas de una ubicación"""
+        self._buffer(location_id)
+        return self._rollups[location_id]
+
+    def moments(self, location_id: str) -> OnlineStatistics:
+        """Estadísticas en línea de las horas completas de una ubicación"""
+        self._buffer(location_id)
+        return self._moments[location_id]
+
+    def regression(self, location_id: str, hours: int) -> SlidingRegression:
+        """
+        Regresión lineal de STATISTICS_VARIABLES sobre las últimas `hours` lecturas,
+        mantenida entre consultas. Solo se leen las lecturas que cambiaron desde la
+        última: la hora en curso actualizada, las horas nuevas y las que estas
+        desplazan de la ventana, O(1) por lectura sin importar `hours`. El primer
+        ajuste (o tras una pausa más larga que la ventana) se calcula de una vez.
+        El MAE no se mantiene aquí (ver SlidingRegression.mean_absolute_error).
+        """
+        buffer = self._buffer(location_id)
+        last = buffer.last_timestamp
+        model = self._regressions.get((location_id, hours))
+        elapsed = (last - model.last) // ONE_HOUR if model is not None and model.last is not None else None
+
+        if elapsed is None or not 0 <= elapsed < hours or buffer.size < model.n + elapsed:
+            # Primera consulta o pausa más larga que la ventana: se ajusta desde cero
+            frame = buffer.window(hours)
+            matrix = self._rows(frame)
+            model = SlidingRegression.from_values(hours, float(hour_number(frame.index[0])), matrix)
+            self._regressions[(location_id, hours)] = model
+            latest = matrix[-1]
+        else:
+            # Vistas sin copia; solo se convierten las filas que entran y salen
+            frame = buffer.window(model.n + elapsed)
+            start = hour_number(frame.index[0])
+            excess = max(0, model.n + elapsed - hours)
+            changed = self._rows(frame.slice(len(frame) - 1 - elapsed, len(frame)))
+            leaving = self._rows(frame.slice(0, excess))
+
+            previous = len(frame) - 1 - elapsed
+            model.replace(float(start + previous), model.last_values, changed[0])
+            for i, row in enumerate(changed[1:], start=previous + 1):
+                model.add(float(start + i), row)
+            for i, row in enumerate(leaving):
+                model.remove(float(start + i), row)
+            latest = changed[-1]
+
+        model.last = last
+        model.last_values = latest.copy()
+        return model
+
+    @staticmethod
+    def _rows(frame: TimeSeriesFrame) -> np.ndarray:
+        """Filas del frame con las columnas de STATISTICS_VARIABLES"""
+        return np.column_stack([frame.values(name) for name in STATISTICS_VARIABLES])
+
+    def aggregate_window(self, location_id: str, hours: int) -> Tuple[MomentAccumulator, QuantileSummary]:
+        """
+        Momentos y sketch de cuantiles de las últimas `hours` lecturas sin recorrerlas:
+        los días completos salen de los acumuladores diarios y de los sketches
+        diarios/mensuales, y solo las horas de los días de los extremos se leen.
+        """
+        buffer = self._buffer(location_id)
+        moments, sketches = self._moments[location_id], self._sketches[location_id]
+        end = buffer.last_timestamp.astype("datetime64[h]") + ONE_HOUR
+        start = end - hours * ONE_HOUR
+
+        # Días completos del rango ya acumulados: [first_day, last_day]
+        first_day = (start + 23 * ONE_HOUR).astype("datetime64[D]")
+        last_day = self._completed_until[location_id].astype("datetime64[D]") - 1
+        accumulator = MomentAccumulator(len(moments.variables))
+        if first_day > last_day:
+            sketch = sketches.new()
+            edges = [self.range(location_id, start.astype(INDEX_DTYPE), end.astype(INDEX_DTYPE))]
+        else:
+            accumulator.merge(moments.between(first_day, last_day))
+            sketch = sketches.days(first_day, last_day)
+            edges = [
+                self.range(location_id, start.astype(INDEX_DTYPE), first_day.astype(INDEX_DTYPE)),
+                self.range(location_id, (last_day + 1).astype(INDEX_DTYPE), end.astype(INDEX_DTYPE))
+            ]
+
+        raw = TimeSeriesFrame.concat(edges)
+        if len(raw) > 0:
+            values = np.column_stack([raw.values(name) for name in moments.variables])
+            accumulator.merge(MomentAccumulator.from_values(values))
+            sketch = sketches.update(sketch, values)
+        return accumulator, sketch
+
+    def window(self, location_id: str, hours: int) -> TimeSeriesFrame:
+        """
+        Últimas `hours` lecturas de una ubicación. Hasta `capacity` son vistas sin
+        copia del buffer; más allá se completan con el archivo en disco.
+        """
+        buffer = self._buffer(location_id)
+        if hours <= self.capacity or self.archive is None:
+            return buffer.window(hours)
+
+        recent = buffer.window(self.capacity)
+        start = recent.index[-1].astype("datetime64[h]") - (hours - 1) * ONE_HOUR
+        older = self.archive.read(location_id, start, recent.index[0])
+        return TimeSeriesFrame.concat([older, recent])
+
+    def range(self, location_id: str, start: np.datetime64, end: np.datetime64) -> TimeSeriesFrame:
+        """Lecturas almacenadas con timestamp en [start, end), del buffer y del archivo"""
+        recent = self._buffer(location_id).window(self.capacity)
+        frame = recent.between(start, end)
+        if self.archive is None or (len(recent) > 0 and recent.index[0] <= start):
+            return frame
+
+        older = self.archive.read(location_id, start, min(end, recent.index[0]))
+        return TimeSeriesFrame.concat([older, frame])
+
+    def covers(self, location_id: str, start: np.datetime64) -> bool:
+        """Indica si el historial (buffer o archivo) contiene la hora `start`"""
+        index = self._buffer(location_id).window(self.capacity).index
+        if len(index) > 0 and index[0] <= start:
+            return True
+        if self.archive is None:
+            return False
+        hour = np.datetime64(start, "h")
+        return len(self.archive.read(location_id, hour, hour + ONE_HOUR)) > 0
@@ -0,0 +1,117 @@
+"""Validación por bloques e interrupción de la carga masiva"""
+
+import io
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from ingest import IngestError, ingest_chunks, read_csv_chunks, validate_chunk
+from timeseries import INDEX_DTYPE
+
+BEFORE = np.datetime64("2026-10-18T03:00").astype(INDEX_DTYPE)
+HEADER = "timestamp,temperature,humidity,windSpeed,windDirection,pressure,precipitation"
+
+
+def chunk(lines: list) -> dict:
+    source = io.BytesIO("\n".join([HEADER] + lines).encode())
+    return next(read_csv_chunks(source))
+
+
+def test_missing_required_columns_are_rejected():
+    with pytest.raises(IngestError, match="timestamp"):
+        validate_chunk({"temperature": np.zeros(1)}, first_row=1, before=BEFORE)
+    with pytest.raises(IngestError, match="humidity, windSpeed"):
+        validate_chunk({"timestamp": np.array(["2026-10-17T00:00"]), "temperature": np.zeros(1)}, first_row=1, before=BEFORE)
+
+
+def test_invalid_rows_are_reported_and_dropped():
+    result = validate_chunk(chunk([
+        "2026-10-17T00:00:00Z,20,50,10,180,1013,0",
+        "no-es-fecha,20,50,10,180,1013,0",
+        "2026-10-17T01:00:00Z,20,150,10,180,1013,0",
+        "2026-10-17T02:00:00Z,20,50,10,,1013,0",
+        "2026-10-18T05:00:00Z,20,50,10,180,1013,0",
+    ]), first_row=1, before=BEFORE)
+
+    assert result["rejected"] == 4
+    assert result["errors"] == [
+        "Fila 2: timestamp inválido",
+        "Fila 3: humidity faltante o fuera de rango",
+        "Fila 4: windDirection faltante o fuera de rango",
+        "Fila 5: timestamp no anterior a la hora en curso",
+    ]
+    assert list(result["frame"].index) == [np.datetime64("2026-10-17T00:00")]
+
+
+def test_last_reading_of_each_hour_is_kept():
+    result = validate_chunk(chunk([
+        "2026-10-17T01:05:00,21,50,10,180,1013,0",
+        "2026-10-17T00:10:00,20,50,10,180,1013,0",
+        "2026-10-17T01:40:00,22,50,10,180,1013,0",
+    ]), first_row=1, before=BEFORE)
+
+    frame = result["frame"]
+    assert list(frame.index.astype("datetime64[h]").astype(str)) == ["2026-10-17T00", "2026-10-17T01"]
+    assert list(frame.columns["temperature"]) == [20, 22]
+
+
+def test_stop_ends_the_load_before_the_next_chunk():
+    lines = [f"2026-10-{day:02d}T{hour:02d}:00:00,20,50,10,180,1013,0" for day in (14, 15, 16) for hour in range(24)]
+    source = io.BytesIO("\n".join([HEADER] + lines).encode())
+    stop = threading.Event()
+    written = []
+
+    def write(frame):
+        written.append(len(frame))
+        stop.set()
+        return len(frame)
+
+    report = ingest_chunks(read_csv_chunks(source, chunk_rows=24), write, now=datetime(2026, 10, 18, 3), stop=stop)
+
+    assert written == [23]  # La hora retenida tampoco se escribe
+    assert report["received"] == 24
+
+
+def test_endpoint_timeout_stops_writes_and_invalidates_cache(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import main
+    from executors import AnalyticsExecutor
+
+    location_id = "loc_001"
+    main.history.update(location_id)
+    completed = main.history.window(location_id, 1).index[0]
+    hours = [completed - (48 - i) * np.timedelta64(1, "h") for i in range(48)]
+    chunks_read = []
+
+    def slow_chunks(source, format):
+        for hour in hours:
+            time.sleep(0.05)
+            chunks_read.append(hour)
+            yield {
+                "timestamp": np.array([hour]),
+                **{name: np.array([0.0]) for name in ("humidity", "windSpeed", "windDirection", "precipitation")},
+                "temperature": np.array([20.0]),
+                "pressure": np.array([1013.0]),
+            }
+
+    writes = []
+    ingest = main.history.ingest
+    monkeypatch.setattr(main, "read_chunks", slow_chunks)
+    monkeypatch.setattr(main, "analytics", AnalyticsExecutor(process_workers=0, timeout=0.3))
+    monkeypatch.setattr(main.history, "ingest", lambda *args: writes.append(args) or ingest(*args))
+
+    with TestClient(main.app) as client:
+        epoch = main.forecast_cache.epoch
+        response = client.post(f"/api/v1/locations/{location_id}/readings:bulk", files={"file": ("l.csv", b"")})
+
+        assert response.status_code == 504
+        assert main.forecast_cache.epoch == epoch + 1
+        time.sleep(0.3)
+        assert len(chunks_read) < len(hours)
+        written = len(writes)
+        time.sleep(0.2)
+        assert len(writes) == written
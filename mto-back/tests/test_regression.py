@@ -0,0 +1,45 @@
+"""Regresión deslizante del historial frente a un ajuste completo de la ventana"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from sensors import WeatherSimulator
+from statistics import STATISTICS_VARIABLES, LinearRegressionPredictor, SlidingRegression
+from storage import HistoryStore
+
+LOCATION = "loc_001"
+WINDOW = 48
+
+
+def assert_matches_full_fit(store: HistoryStore) -> SlidingRegression:
+    model = store.regression(LOCATION, WINDOW)
+    frame = store.window(LOCATION, WINDOW)
+    matrix = np.column_stack([frame.values(name) for name in STATISTICS_VARIABLES])
+    expected = LinearRegressionPredictor.fit_batch(np.arange(len(matrix), dtype=np.float64), matrix)
+    fit = model.fit()
+
+    assert model.n == len(matrix)
+    for key in ("coefficient", "intercept", "r2", "mse"):
+        np.testing.assert_allclose(fit[key], expected[key], rtol=1e-9, atol=1e-9)
+    np.testing.assert_allclose(SlidingRegression.mean_absolute_error(fit, matrix), expected["mae"], rtol=1e-9)
+    return model
+
+
+def test_sliding_fit_tracks_the_window():
+    simulator = WeatherSimulator(seed=11, location_id=LOCATION)
+    store = HistoryStore(capacity=720, simulator_for=lambda _: simulator, backfill_hours=24 * 10)
+    now = datetime(2026, 10, 18, 3, 10)
+    store.update(LOCATION, now=now)
+    model = assert_matches_full_fit(store)
+
+    # Lecturas dentro de la misma hora y horas nuevas que desplazan a las más antiguas
+    for minutes in (20, 20, 40, 60, 180, 5, 600):
+        now += timedelta(minutes=minutes)
+        store.update(LOCATION, now=now)
+        assert assert_matches_full_fit(store) is model
+
+    # Una pausa más larga que la ventana vuelve a ajustar desde cero
+    now += timedelta(hours=WINDOW + 5)
+    store.update(LOCATION, now=now)
+    assert_matches_full_fit(store)
@@ -0,0 +1,53 @@
+"""Cuantiles de la pirámide de sketches frente al cálculo exacto"""
+
+from datetime import datetime
+
+import numpy as np
+
+from histograms import FixedPointHistogram
+from sensors import WeatherSimulator
+from sketches import KLLSketch, SketchPyramid
+from statistics import QUANTILE_LEVELS, STATISTICS_VARIABLES, DescriptiveStatistics
+from storage import HistoryStore
+from timeseries import INDEX_DTYPE, TimeSeriesFrame
+
+LOCATION = "loc_001"
+QUANTILE_KEYS = ("median", "mode", "q1", "q3", "iqr", "p10", "p90", "p95", "p99", "min", "max", "mean")
+
+
+def test_long_window_stats_match_exact_stats():
+    simulator = WeatherSimulator(seed=3, location_id=LOCATION)
+    store = HistoryStore(capacity=720, simulator_for=lambda _: simulator, backfill_hours=24 * 60)
+    store.update(LOCATION, now=datetime(2026, 10, 18, 15, 30))
+
+    for hours in (100, 500, 720):
+        moments, sketch = store.aggregate_window(LOCATION, hours)
+        approximate = DescriptiveStatistics.calculate_sketch_stats(moments, sketch, STATISTICS_VARIABLES)
+        exact = DescriptiveStatistics.calculate_weather_statistics(store.window(LOCATION, hours))
+        for name in STATISTICS_VARIABLES:
+            assert {key: approximate[name][key] for key in QUANTILE_KEYS} == {key: exact[name][key] for key in QUANTILE_KEYS}
+
+
+def hours_frame(start: str, temperature: np.ndarray) -> TimeSeriesFrame:
+    n = len(temperature)
+    index = np.datetime64(start).astype(INDEX_DTYPE) + np.arange(n) * np.timedelta64(1, "h")
+    return TimeSeriesFrame(index, {"temperature": temperature, "humidity": np.full(n, 60.0)})
+
+
+def test_off_grid_readings_switch_the_bucket_to_kll():
+    pyramid = SketchPyramid(variables=["temperature", "humidity"])
+    rng = np.random.default_rng(0)
+    on_grid = np.round(rng.normal(20, 5, 24), 1)
+    off_grid = rng.normal(20, 5, 24)
+    pyramid.add(hours_frame("2026-10-01T00", on_grid))
+    second = np.datetime64("2026-10-02")
+    pyramid.daily[second] = pyramid.update(pyramid.new(), np.column_stack([off_grid, np.full(24, 60.0)]))
+
+    assert isinstance(pyramid.daily[np.datetime64("2026-10-01")], FixedPointHistogram)
+    assert isinstance(pyramid.daily[second], KLLSketch)
+
+    # Sin compactación el KLL guarda las lecturas exactas: nada se redondeó a la grilla
+    combined = pyramid.days(np.datetime64("2026-10-01"), second)
+    assert isinstance(combined, KLLSketch)
+    expected = np.quantile(np.r_[on_grid, off_grid], QUANTILE_LEVELS)
+    np.testing.assert_array_equal(combined.quantiles(QUANTILE_LEVELS)[:, 0], expected)
@@ -0,0 +1,25 @@
+"""Estadísticas por lote frente al cálculo serie por serie"""
+
+import numpy as np
+import pytest
+
+from statistics import DescriptiveStatistics
+
+
+@pytest.mark.parametrize("decimals", [[1, 1, None], [0, 2, 3]])
+def test_batch_stats_match_per_series_stats(decimals):
+    rng = np.random.default_rng(1)
+    for _ in range(50):
+        n = int(rng.integers(5, 400))
+        matrix = np.vstack([
+            np.round(rng.normal(20, 8, n), decimals[0]),
+            np.round(rng.normal(1000, 8, n), decimals[1] if decimals[1] is not None else 2),
+            np.round(rng.normal(5, 3, n), 3),
+        ])
+        batch = DescriptiveStatistics.calculate_batch_stats(matrix, decimals)
+        for row, result in zip(matrix, batch):
+            expected = {
+                **DescriptiveStatistics.calculate_basic_stats(row),
+                **DescriptiveStatistics.calculate_advanced_stats(row)
+            }
+            assert result == expected
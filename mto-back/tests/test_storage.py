@@ -0,0 +1,67 @@
+"""Ingesta de lecturas sobre el historial sin archivo en disco"""
+
+from datetime import datetime
+
+import numpy as np
+
+from rollups import RollupPyramid
+from sensors import WeatherSimulator
+from storage import HistoryStore, ONE_HOUR
+from timeseries import INDEX_DTYPE, TimeSeriesFrame
+
+NOW = datetime(2026, 10, 18, 3, 30)
+LOCATION = "loc_001"
+
+
+def make_store() -> HistoryStore:
+    simulator = WeatherSimulator(seed=7, location_id=LOCATION)
+    store = HistoryStore(capacity=720, simulator_for=lambda _: simulator, backfill_hours=24 * 60)
+    store.update(LOCATION, now=NOW)
+    return store
+
+
+def readings(store: HistoryStore, start: str, hours: int, precipitation: float) -> TimeSeriesFrame:
+    """Copia de horas almacenadas con la precipitación reemplazada"""
+    begin = np.datetime64(start).astype(INDEX_DTYPE)
+    frame = store.range(LOCATION, begin, begin + hours * ONE_HOUR).copy()
+    frame.columns["precipitation"][:] = precipitation
+    return frame
+
+
+def month_row(store: HistoryStore, month: str) -> dict:
+    rows = store.rollups(LOCATION).monthly.rows(np.datetime64(month), np.datetime64(month))
+    column = RollupPyramid.variable("precipitation")
+    return {"count": int(rows["count"][0]), "rain": float(rows["sum"][0, column])}
+
+
+def test_ingest_keeps_month_hours_outside_buffer():
+    store = make_store()
+    oldest = store.window(LOCATION, 720).index[0]
+    assert oldest == np.datetime64("2026-09-18T04:00")
+    before = month_row(store, "2026-09")
+
+    # El 18 de septiembre empezó antes del buffer: sus horas no pueden recalcularse
+    written = store.ingest(LOCATION, readings(store, "2026-09-18T04:00", 5, 50.0))
+    assert written == 0
+    assert month_row(store, "2026-09") == before
+    assert store.range(LOCATION, oldest, oldest + ONE_HOUR)["precipitation"][0] != 50.0
+
+
+def test_ingest_rebuilds_complete_days_and_their_month():
+    store = make_store()
+    before = month_row(store, "2026-09")
+    moments = store.moments(LOCATION).total.n
+    start = np.datetime64("2026-09-20T00:00").astype(INDEX_DTYPE)
+    old_rain = float(store.range(LOCATION, start, start + 5 * ONE_HOUR).values("precipitation").sum())
+    replaced = readings(store, "2026-09-20T00:00", 5, 10.0)
+
+    assert store.ingest(LOCATION, replaced) == 5
+    after = month_row(store, "2026-09")
+    assert after["count"] == before["count"]
+    assert np.isclose(after["rain"], before["rain"] - old_rain + 50.0, atol=1e-3)
+    assert store.moments(LOCATION).total.n == moments
+
+    day = store.rollups(LOCATION).daily.rows(np.datetime64("2026-09-20"), np.datetime64("2026-09-20"))
+    stored = store.range(LOCATION, np.datetime64("2026-09-20T00:00"), np.datetime64("2026-09-21T00:00"))
+    assert day["count"][0] == 24
+    assert np.isclose(day["sum"][0, RollupPyramid.variable("precipitation")], stored.values("precipitation").sum())
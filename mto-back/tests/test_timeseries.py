@@ -0,0 +1,43 @@
+"""Remuestreo de /historical por bucket"""
+
+import numpy as np
+
+from timeseries import FIELD_SPECS, INDEX_DTYPE, RESAMPLE_INTERVALS, TimeSeriesFrame
+
+
+def frame(start: str, hours: int, **columns) -> TimeSeriesFrame:
+    index = np.datetime64(start).astype(INDEX_DTYPE) + np.arange(hours) * np.timedelta64(1, "h")
+    return TimeSeriesFrame.from_arrays(index, {name: columns.get(name, np.zeros(hours)) for name in FIELD_SPECS})
+
+
+def test_wind_direction_is_the_vector_mean():
+    directions = np.r_[np.full(12, 350), np.full(12, 10), np.full(12, 80), np.full(12, 100), np.full(24, 180)]
+    daily = frame("2026-10-01T00", 72, windDirection=directions).resample(1440)
+    assert daily.to_records()[0]["windDirection"] == 0
+    assert daily.to_records()[1]["windDirection"] == 90
+    assert daily.to_records()[2]["windDirection"] == 180
+
+    # La media aritmética de 350° y 20° daría 185°
+    mixed = frame("2026-10-01T00", 2, windDirection=np.array([350, 20])).resample(1440)
+    assert mixed.to_records()[0]["windDirection"] == 5
+
+
+def test_daily_buckets_sum_precipitation_and_keep_point_fields():
+    hours = 48
+    temperature = np.r_[np.arange(24.0), np.full(24, 10.0)]
+    data = frame("2026-10-01T00", hours, temperature=temperature, precipitation=np.full(hours, 0.5))
+    hourly = data.to_records()
+    daily = data.resample(RESAMPLE_INTERVALS["daily"]).to_records()
+
+    assert [record["timestamp"] for record in daily] == ["2026-10-01T00:00:00.000000Z", "2026-10-02T00:00:00.000000Z"]
+    assert set(hourly[0]) <= set(daily[0])
+    assert (daily[0]["time"], daily[0]["hour"], daily[0]["count"]) == ("00:00", "00h", 24)
+    assert daily[0]["precipitation"] == 12.0
+    assert daily[0]["temperature"] == 11.5
+    assert (daily[0]["min"]["temperature"], daily[0]["max"]["temperature"]) == (0.0, 23.0)
+
+
+def test_weeks_start_on_monday():
+    weekly = frame("2026-10-14T00", 24 * 7, temperature=np.full(24 * 7, 20.0)).resample(RESAMPLE_INTERVALS["weekly"])
+    assert [record["timestamp"][:10] for record in weekly.to_records()] == ["2026-10-12", "2026-10-19"]
+    assert weekly.count.tolist() == [24 * 5, 24 * 2]
@@ -0,0 +1,260 @@
+"""
+Series Temporales Columnares
+Contenedor compacto que viaja del simulador a las estadísticas y a la serialización
+"""
+
+from typing import Dict, Iterator, List
+import numpy as np
+
+
+# Campos numéricos de HistoricalDataPoint: (tipo de almacenamiento, decimales)
+FIELD_SPECS: Dict[str, tuple] = {
+    "temperature": (np.float32, 1),
+    "humidity": (np.float32, 1),
+    "windSpeed": (np.float32, 1),
+    "windDirection": (np.int16, 0),
+    "pressure": (np.float32, 1),
+    "precipitation": (np.float32, 1),
+    "solarRadiation": (np.float32, 0),
+    "uvIndex": (np.int16, 0),
+    "pm25": (np.float32, 1),
+    "pm10": (np.float32, 1),
+    "co2": (np.int16, 0),
+    "o3": (np.float32, 1),
+    "feels": (np.float32, 1),
+    "soil": (np.float32, 1),
+    "soilHumidity": (np.float32, 1),
+    "gust": (np.float32, 1),
+}
+
+HISTORICAL_FIELDS = tuple(FIELD_SPECS)
+
+INDEX_DTYPE = "datetime64[us]"
+
+# Intervalos de remuestreo de /historical: ancho del bucket en minutos (el historial
+# es horario, así que no hay intervalos menores a una hora)
+RESAMPLE_INTERVALS: Dict[str, int] = {"hourly": 60, "daily": 1440, "weekly": 10080}
+
+# Campos que se suman por bucket (el resto se promedia; la dirección del viento, como vector)
+SUM_FIELDS = ("precipitation",)
+
+# Origen de los buckets: el lunes 1970-01-05, para que las semanas empiecen en lunes
+# (los demás anchos dividen a este desplazamiento, así que no los afecta)
+RESAMPLE_ORIGIN_MINUTES = 4 * 1440
+
+
+class TimeSeriesFrame:
+    """
+    Serie temporal columnar: un índice datetime64 y una columna NumPy por variable.
+
+    No guarda diccionarios por fila; la vista lista-de-diccionarios solo se construye
+    con `to_records()` al serializar.
+    """
+
+    __slots__ = ("index", "columns")
+
+    def __init__(self, index: np.ndarray, columns: Dict[str, np.ndarray]):
+        self.index = index
+        self.columns = columns
+
+    @classmethod
+    def from_arrays(cls, index: np.ndarray, columns: Dict[str, np.ndarray]) -> "TimeSeriesFrame":
+        """Crea un frame convirtiendo cada columna a su tipo de almacenamiento"""
+        return cls(
+            np.asarray(index, dtype=INDEX_DTYPE),
+            {name: np.asarray(columns[name], dtype=FIELD_SPECS[name][0]) for name in FIELD_SPECS}
+        )
+
+    @classmethod
+    def empty(cls) -> "TimeSeriesFrame":
+        """Frame sin filas"""
+        return cls.from_arrays(np.array([], dtype=INDEX_DTYPE), {name: [] for name in FIELD_SPECS})
+
+    @classmethod
+    def concat(cls, frames: List["TimeSeriesFrame"]) -> "TimeSeriesFrame":
+        """Une frames y ordena el resultado por timestamp"""
+        frames = [frame for frame in frames if len(frame) > 0]
+        if not frames:
+            return cls.empty()
+        if len(frames) == 1:
+            return frames[0]
+
+        index = np.concatenate([frame.index for frame in frames])
+        order = np.argsort(index, kind="stable")
+        return cls(
+            index[order],
+            {name: np.concatenate([frame[name] for frame in frames])[order] for name in frames[0]}
+        )
+
+    @classmethod
+    def from_records(cls, records: List[Dict]) -> "TimeSeriesFrame":
+        """Crea un frame a partir de la vista lista-de-diccionarios"""
+        index = np.array([r["timestamp"].rstrip("Z") for r in records], dtype=INDEX_DTYPE)
+        columns = {
+            name: np.array([r.get(name) or 0 for r in records]) for name in FIELD_SPECS
+        }
+        return cls.from_arrays(index, columns)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.columns)
+
+    def values(self, name: str) -> np.ndarray:
+        """
+        Columna como float64 (tipo usado en los cálculos estadísticos), redondeada a
+        su resolución para no arrastrar el error de representación de float32.
+        """
+        column = self.columns[name]
+        if np.issubdtype(column.dtype, np.integer):
+            return column.astype(np.float64)
+        return np.round(column.astype(np.float64), FIELD_SPECS[name][1])
+
+    def to_python(self, name: str) -> list:
+        """Columna como lista de valores de Python redondeados a su resolución"""
+        return _python_values(name, self.columns[name])
+
+    def slice(self, start: int, stop: int) -> "TimeSeriesFrame":
+        """Filas [start, stop) como vistas sin copia"""
+        return TimeSeriesFrame(
+            self.index[start:stop],
+            {name: column[start:stop] for name, column in self.columns.items()}
+        )
+
+    def between(self, start: np.datetime64, end: np.datetime64) -> "TimeSeriesFrame":
+        """Filas con timestamp en [start, end) como vistas sin copia"""
+        lo, hi = np.searchsorted(self.index, [start, end])
+        return self.slice(int(lo), int(hi))
+
+    def resample(self, minutes: int) -> "ResampledFrame":
+        """
+        Agrega las filas en buckets de `minutes` minutos (group-by vectorizado: el índice
+        está ordenado, así que cada bucket es un tramo contiguo que se reduce con
+        ufunc.reduceat). Por bucket: media, mínimo y máximo de cada variable, suma de la
+        precipitación y media vectorial de la dirección del viento.
+        """
+        stamps = self.index.astype("datetime64[m]").astype(np.int64) - RESAMPLE_ORIGIN_MINUTES
+        keys = stamps // minutes * minutes + RESAMPLE_ORIGIN_MINUTES
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        if len(keys) == 0:
+            starts = starts[:0]
+        count = np.diff(np.r_[starts, len(keys)])
+
+        values: Dict[str, np.ndarray] = {}
+        minimum: Dict[str, np.ndarray] = {}
+        maximum: Dict[str, np.ndarray] = {}
+        for name in self.columns:
+            column = self.values(name)
+            if name == "windDirection":
+                # Media de los vectores unitarios: 350° y 10° promedian 0°, no 180°
+                radians = np.radians(column)
+                east = np.add.reduceat(np.sin(radians), starts)
+                north = np.add.reduceat(np.cos(radians), starts)
+                values[name] = np.rint(np.degrees(np.arctan2(east, north))) % 360
+                continue
+            sums = np.add.reduceat(column, starts)
+            values[name] = sums if name in SUM_FIELDS else sums / count
+            minimum[name] = np.minimum.reduceat(column, starts)
+            maximum[name] = np.maximum.reduceat(column, starts)
+
+        index = keys[starts].astype("datetime64[m]").astype(INDEX_DTYPE)
+        return ResampledFrame(index, count, values, minimum, maximum)
+
+    def copy(self) -> "TimeSeriesFrame":
+        """Copia independiente de los datos (p. ej. para guardarla en caché)"""
+        return TimeSeriesFrame(
+            self.index.copy(),
+            {name: column.copy() for name, column in self.columns.items()}
+        )
+
+    def to_records(self) -> List[Dict]:
+        """Vista lista-de-diccionarios con el formato de HistoricalDataPoint"""
+        stamps = np.datetime_as_string(self.index, unit="us").tolist()
+        names = list(self.columns)
+        rows = zip(*(self.to_python(name) for name in names))
+
+        records = []
+        for stamp, row in zip(stamps, rows):
+            record = {
+                "timestamp": stamp + "Z",
+                "time": stamp[11:16],
+                "hour": stamp[11:13] + "h"
+            }
+            record.update(zip(names, row))
+            records.append(record)
+
+        return records
+
+
+class ResampledFrame:
+    """Resultado de TimeSeriesFrame.resample: inicio, cantidad de horas y agregados por bucket"""
+
+    __slots__ = ("index", "count", "columns", "minimum", "maximum")
+
+    def __init__(
+        self,
+        index: np.ndarray,
+        count: np.ndarray,
+        columns: Dict[str, np.ndarray],
+        minimum: Dict[str, np.ndarray],
+        maximum: Dict[str, np.ndarray]
+    ):
+        self.index = index
+        self.count = count
+        self.columns = columns
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def to_records(self) -> List[Dict]:
+        """
+        Vista lista-de-diccionarios con el formato de HistoricalDataPoint: `time` y
+        `hour` del inicio del bucket, cada variable con su agregado, más `count`, `min`
+        y `max`. Las medias de campos enteros llevan un decimal.
+        """
+        stamps = np.datetime_as_string(self.index, unit="us").tolist()
+        names = list(self.columns)
+        rows = zip(*(self._rounded(name, self.columns[name], mean=True) for name in names))
+        extremes = list(self.minimum)
+        minimums = zip(*(self._rounded(name, self.minimum[name]) for name in extremes))
+        maximums = zip(*(self._rounded(name, self.maximum[name]) for name in extremes))
+
+        records = []
+        for stamp, count, row, low, high in zip(stamps, self.count.tolist(), rows, minimums, maximums):
+            record = {
+                "timestamp": stamp + "Z",
+                "time": stamp[11:16],
+                "hour": stamp[11:13] + "h",
+                "count": count
+            }
+            record.update(zip(names, row))
+            record["min"] = dict(zip(extremes, low))
+            record["max"] = dict(zip(extremes, high))
+            records.append(record)
+
+        return records
+
+    @staticmethod
+    def _rounded(name: str, values: np.ndarray, mean: bool = False) -> list:
+        decimals = FIELD_SPECS[name][1]
+        if name == "windDirection":
+            return values.astype(np.int64).tolist()
+        if mean and name not in SUM_FIELDS:
+            decimals = max(decimals, 1)
+        return np.round(values, decimals).tolist()
+
+
+def _python_values(name: str, column: np.ndarray) -> list:
+    """Valores de una columna como tipos de Python, redondeados a su resolución"""
+    if np.issubdtype(column.dtype, np.integer):
+        return column.tolist()
+    return np.round(column.astype(np.float64), FIELD_SPECS[name][1]).tolist()